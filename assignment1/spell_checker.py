@@ -1,10 +1,103 @@
+import os
+import pickle
 from string import ascii_lowercase
 
 
+class DictionaryRegistry(object):
+    """
+    Lazily loaded mapping of languages to dictionary word lists.
+
+    Nothing is read until a language is first looked up, so importing the
+    module is free and does not depend on the current working directory. The
+    first lookup of a language parses its dictionary file into a sorted list
+    of distinct, lowercased words and pickles that list next to the file (or
+    into `cache_dir`). Later processes load the pickle instead, as long as it
+    is newer than the dictionary file. Loaded lists are kept in memory, so
+    every lookup after the first returns the same list object.
+    """
+
+    CACHE_SUFFIX = '.words.pickle'
+
+    def __init__(self, paths: dict, cache_dir: str = None):
+        """
+        :param paths: Key:Value pairs of languages and paths to their dictionary
+                files (one word per line); relative paths are tried in the current
+                working directory first and then next to this module
+        :param cache_dir: the directory for the compiled word lists; if None, they
+                are written next to the dictionary files
+        """
+        self.paths = dict(paths)
+        self.cache_dir = cache_dir
+        self._loaded = {}
+
+    def register(self, lang: str, path: str) -> None:
+        """Sets (or replaces) the dictionary file of a language."""
+        self.paths[lang] = path
+        self._loaded.pop(lang, None)
+
+    def __getitem__(self, lang: str) -> list:
+        try:
+            return self._loaded[lang]
+        except KeyError:
+            words = self._load(self._resolve(self.paths[lang]))
+            self._loaded[lang] = words
+            return words
+
+    def __contains__(self, lang: str) -> bool:
+        return lang in self.paths
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def keys(self):
+        return self.paths.keys()
+
+    def _resolve(self, path: str) -> str:
+        """Returns `path` if it exists, else the same path relative to this module."""
+        if os.path.isabs(path) or os.path.exists(path):
+            return path
+        module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        return module_path if os.path.exists(module_path) else path
+
+    def _cache_path(self, path: str) -> str:
+        if self.cache_dir is None:
+            return path + DictionaryRegistry.CACHE_SUFFIX
+        return os.path.join(self.cache_dir, os.path.basename(path) + DictionaryRegistry.CACHE_SUFFIX)
+
+    def _load(self, path: str) -> list:
+        """
+        Loads the compiled word list of a dictionary file, compiling (and caching)
+        it first if there is no up-to-date cache.
+
+        :param path: path to the dictionary file
+        :return: a sorted list of distinct, lowercased words
+        """
+        cache_path = self._cache_path(path)
+        try:
+            if os.path.getmtime(cache_path) >= os.path.getmtime(path):
+                with open(cache_path, 'rb') as f:
+                    return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+        with open(path, 'r', encoding='utf-8') as f:
+            words = sorted(set(line.strip().lower() for line in f if line.strip()))
+
+        # Failing to write the cache only costs the next process the parse
+        try:
+            with open(cache_path, 'wb') as f:
+                pickle.dump(words, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass
+
+        return words
+
+
 class SpellChecker(object):
 
-    DEFAULT_DICTIONARIES = {'english': open('englishdic.sec', 'r').read().splitlines(),
-            'german': open('germandic-utf8.sec', 'r').read().splitlines()}
+    # Dictionaries are only read on first use, see `DictionaryRegistry`
+    DEFAULT_DICTIONARIES = DictionaryRegistry({'english': 'englishdic.sec',
+            'german': 'germandic-utf8.sec'})
 
     def __init__(self, lang_vocab: list, fdist: dict = None, max_edit_distance: int = 2):
         alphabet = 'aäbcdefghijklmnoöpqrsßtuüvwxyz'
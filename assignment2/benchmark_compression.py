@@ -0,0 +1,54 @@
+"""
+Benchmark for the compressed postings lists of `TwitterIR`.
+
+Builds postings lists from the tweets in tweets.csv (see
+`benchmark_intersect.load_postings`), compresses them with
+`CompressedPostings` and reports how much smaller they get and how much
+slower intersecting them becomes, for pairs of rare and common terms.
+
+    python benchmark_compression.py [path/to/tweets.csv]
+"""
+import sys
+
+from benchmark_intersect import best_of, load_postings
+from postings import CompressedPostings
+from twitterir import TwitterIR
+
+
+def main(path):
+    postings = load_postings(path)
+    compressed = {t: CompressedPostings(p) for t, p in postings.items()}
+
+    arrayBytes = sum(p.itemsize * len(p) for p in postings.values())
+    # a list of ints takes a pointer per entry plus the int objects themselves
+    listBytes = sum(len(p) * (8 + 32) for p in postings.values())
+    compressedBytes = sum(c.nbytes() for c in compressed.values())
+    numPostings = sum(len(p) for p in postings.values())
+    print(f'{len(postings)} terms, {numPostings} postings')
+    print(f'list of ints:       {listBytes / 2**20:8.1f} MiB')
+    print(f"array('q'):         {arrayBytes / 2**20:8.1f} MiB")
+    print(f'compressed:         {compressedBytes / 2**20:8.1f} MiB '
+          f'({arrayBytes / compressedBytes:.1f}x smaller than the arrays, '
+          f'{8 * compressedBytes / numPostings:.1f} bits per posting)')
+
+    bySize = sorted(postings, key=lambda t: len(postings[t]))
+    common = bySize[-3:]
+    pairs = []
+    for size in (1, 10, 100, 1000):
+        t = next((t for t in bySize if len(postings[t]) >= size), None)
+        if t is not None:
+            pairs += [(t, c) for c in common]
+    pairs += [(bySize[-1], bySize[-2])]
+
+    print(f'{"short":>7} {"long":>7} {"array us":>10} {"compressed us":>14} {"slowdown":>9}')
+    for t1, t2 in pairs:
+        assert TwitterIR.intersect(postings[t1], postings[t2]) == \
+            TwitterIR.intersect(compressed[t1], compressed[t2])
+        plain = best_of(TwitterIR.intersect, postings[t1], postings[t2])
+        packed = best_of(TwitterIR.intersect, compressed[t1], compressed[t2])
+        print(f'{len(postings[t1]):>7} {len(postings[t2]):>7} {plain:>10.1f} '
+              f'{packed:>14.1f} {packed / plain:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'tweets.csv')
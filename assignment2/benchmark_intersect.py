@@ -0,0 +1,65 @@
+"""
+Micro-benchmark for the postings list intersection of `TwitterIR`.
+
+Builds postings lists from the tweets in tweets.csv (lowercased, whitespace
+tokenized, so no spell checking is needed), pairs rare terms with the most
+common ones and times the linear merge against the galloping intersection
+and the adaptive choice `TwitterIR.intersect` makes between them.
+
+    python benchmark_intersect.py [path/to/tweets.csv]
+"""
+import csv
+import sys
+import timeit
+from array import array
+
+from twitterir import TwitterIR
+
+
+def load_postings(path):
+    """
+    Reads the tweets and maps every token to a sorted array of the
+    (dense) numbers of the tweets it occurs in.
+    """
+    tokens2docNums = {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for docNum, line in enumerate(csv.reader(f, delimiter='\t')):
+            for t in set(line[4].lower().split()):
+                tokens2docNums.setdefault(t, []).append(docNum)
+    return {t: array('q', docNums) for t, docNums in tokens2docNums.items()}
+
+
+def best_of(function, *args, repeat=5):
+    """Returns the fastest time of `repeat` runs in microseconds."""
+    number = 10
+    return min(timeit.repeat(lambda: function(*args), number=number, repeat=repeat)) / number * 1e6
+
+
+def main(path):
+    postings = load_postings(path)
+    bySize = sorted(postings.values(), key=len)
+    common = bySize[-5:]
+    # one list each of roughly 2, 8, 32, ... postings, up to the common ones
+    rare = []
+    for size in (2, 8, 32, 128, 512, 2048):
+        p = next((p for p in bySize if len(p) >= size), None)
+        if p is not None and len(p) < len(common[0]):
+            rare.append(p)
+    balanced = [(bySize[-i], bySize[-i - 1]) for i in range(1, 6)]
+
+    print(f'{len(postings)} terms, longest postings list: {len(bySize[-1])}')
+    print(f'{"short":>7} {"long":>7} {"ratio":>7} {"merge us":>10} '
+          f'{"gallop us":>10} {"adaptive us":>12} {"speedup":>8}')
+    for short, long in [(r, c) for r in rare for c in common] + balanced:
+        if len(short) > len(long):
+            short, long = long, short
+        assert TwitterIR._mergeIntersect(short, long) == TwitterIR._gallopIntersect(short, long)
+        merge = best_of(TwitterIR._mergeIntersect, short, long)
+        gallop = best_of(TwitterIR._gallopIntersect, short, long)
+        adaptive = best_of(TwitterIR.intersect, short, long)
+        print(f'{len(short):>7} {len(long):>7} {len(long) / len(short):>7.1f} {merge:>10.1f} '
+              f'{gallop:>10.1f} {adaptive:>12.1f} {merge / adaptive:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'tweets.csv')
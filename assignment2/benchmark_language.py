@@ -0,0 +1,59 @@
+"""
+Latency benchmark for the language detection of `TwitterIR`.
+
+Detects the language of the tweets in tweets.csv, both cleaned (as when
+indexing) and raw, with the detection `TwitterIR._detectLanguage` used to do
+(loading the NLTK stop word lists for every token) and with
+`LanguageDetector.detect_many`, checks that the decisions are the same and
+prints the time per tweet. The detector's memo is cleared before each run.
+
+    python benchmark_language.py [path/to/tweets.csv] [number of tweets]
+"""
+import sys
+import time
+
+from nltk.corpus import stopwords
+
+from benchmark_normalizer import load_tweets
+from twitterir import TwitterIR
+
+
+def legacy_detect(ir, context):
+    """The language detection `TwitterIR._detectLanguage` did before `language`."""
+    tokens = ir.tokenizer.tokenize(context)
+    stopsEN = [token for token in tokens if token in stopwords.words('english')]
+    stopsDE = [token for token in tokens if token in stopwords.words('german')]
+    if len(stopsEN) != len(stopsDE):
+        return 'english' if len(stopsEN) > len(stopsDE) else 'german'
+    cleaned = ir.clean(context)
+    wordsEN = [token for token in cleaned if ir.engSpellCheck.in_dictionary(token)]
+    wordsDE = [token for token in cleaned if ir.gerSpellCheck.in_dictionary(token)]
+    return 'german' if len(wordsDE) > len(wordsEN) else 'english'
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main(path, n):
+    ir = TwitterIR()
+    detector = ir.languageDetector
+    raw = load_tweets(path, n)
+    cleaned = [' '.join(tokens) for tokens in ir.normalizer.clean_many(raw)]
+
+    print(f'{len(raw)} tweets')
+    print(f'{"":<10} {"legacy us":>10} {"new us":>10} {"speedup":>8} {"german":>7}')
+    for name, contexts in (('cleaned', cleaned), ('raw', raw)):
+        expected, legacy = timed(lambda: [legacy_detect(ir, c) for c in contexts])
+        detector.clear()
+        result, new = timed(detector.detect_many, contexts)
+        assert result == expected, name
+        print(f'{name:<10} {legacy / len(contexts) * 1e6:>10.1f} {new / len(contexts) * 1e6:>10.1f} '
+              f'{legacy / new:>7.0f}x {result.count("german"):>7}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'tweets.csv',
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
@@ -0,0 +1,80 @@
+"""
+Throughput benchmark for the tweet normalization of `TwitterIR`.
+
+Cleans the tweets in tweets.csv with the per-tweet cleaning `TwitterIR.clean`
+used to do (building the translation table for every tweet), with
+`TweetNormalizer.clean` and with `TweetNormalizer.clean_many`, checks that
+all of them give the same tokens and prints the tweets per second. The
+normalization without the tokenization is timed separately, since the
+tokenizer is the same for all of them.
+
+    python benchmark_normalizer.py [path/to/tweets.csv] [number of tweets]
+"""
+import csv
+import string
+import sys
+import time
+from itertools import islice
+
+from nltk.corpus import stopwords
+from nltk.tokenize import TweetTokenizer
+
+from normalizer import EMOJIS, PUNCTUATION, URL_REGEX, TweetNormalizer
+
+
+def load_tweets(path, n):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [line[4] for line in islice(csv.reader(f, delimiter='\t'), n)]
+
+
+def legacy_normalize(s):
+    """The normalization `TwitterIR.clean` did before `normalizer`."""
+    s = ' '.join(s.replace('[NEWLINE]', '').split())
+    s = ' '.join(s.replace('…', '...').split())
+    s = URL_REGEX.sub('', s).strip()
+    s = s.translate(str.maketrans('', '', PUNCTUATION + string.digits + EMOJIS)).strip()
+    s = ' '.join(s.split())
+    return s.lower()
+
+
+def throughput(function, tweets):
+    """Returns the result of `function(tweets)` and the tweets per second."""
+    start = time.perf_counter()
+    result = function(tweets)
+    return result, len(tweets) / (time.perf_counter() - start)
+
+
+def main(path, n):
+    tweets = load_tweets(path, n)
+    tokenizer = TweetTokenizer()
+    stop_words = set(stopwords.words('english') + stopwords.words('german'))
+    normalizer = TweetNormalizer(tokenizer, stop_words)
+
+    def legacy(tweets):
+        return [[w for w in tokenizer.tokenize(legacy_normalize(s)) if w not in stop_words]
+                for s in tweets]
+
+    print(f'{len(tweets)} tweets')
+    print(f'{"":<28} {"tweets/s":>10}')
+    expected, legacyRate = throughput(legacy, tweets)
+    for name, function in [('legacy clean', None),
+                           ('TweetNormalizer.clean', lambda ts: [normalizer.clean(s) for s in ts]),
+                           ('TweetNormalizer.clean_many', normalizer.clean_many)]:
+        if function is None:
+            rate = legacyRate
+        else:
+            result, rate = throughput(function, tweets)
+            assert result == expected, name
+        print(f'{name:<28} {rate:>10.0f} {rate / legacyRate:>6.1f}x')
+
+    print('without tokenization:')
+    expected, legacyRate = throughput(lambda ts: [legacy_normalize(s) for s in ts], tweets)
+    result, rate = throughput(lambda ts: [normalizer.normalize(s) for s in ts], tweets)
+    assert result == expected
+    print(f'{"legacy normalization":<28} {legacyRate:>10.0f} {1:>6.1f}x')
+    print(f'{"TweetNormalizer.normalize":<28} {rate:>10.0f} {rate / legacyRate:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'tweets.csv',
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
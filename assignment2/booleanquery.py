@@ -0,0 +1,479 @@
+"""
+Boolean queries over the postings lists of `TwitterIR`.
+
+A query is an expression of terms combined with AND, OR and NOT (the
+operators are written in upper case) and parentheses, e.g.
+
+    trump AND (wall OR mauer) AND NOT mexico
+
+Adjacent terms without an operator are combined with AND, so a plain list of
+terms means the same as for `TwitterIR.query`. NOT binds tightest, then AND,
+then OR.
+
+If the index has positions (see `positions`), a quoted phrase such as
+"campaign finance" matches the terms next to each other in that order, and
+`a NEAR/k b` matches both terms at most k tokens apart. Both are an AND of
+their terms whose positions are only read for the documents containing all
+of them.
+
+A parsed query is evaluated as a tree of cursors, each of which walks a
+sorted stream of document numbers and can skip ahead to a given document
+number. Nothing is materialized: terms walk their postings lists (galloping
+on skips), AND leapfrogs its operands, OR is a k-way merge of them and NOT is
+a difference against the AND it is part of, or against all live documents
+on its own. The plan is cost based: every cursor knows an upper bound of the
+number of documents it yields (the size of a term's postings list, the
+smallest operand of an AND, the sum of the operands of an OR), the operands
+of an AND are walked from the smallest to the largest, and an AND with an
+empty operand yields nothing without looking at the others.
+"""
+import heapq
+import re
+from bisect import bisect_left
+
+from positions import nearMatch, phraseMatch
+from postings import BLOCK_SIZE, CompressedPostings
+
+OPERATORS = ('AND', 'OR', 'NOT')
+TOKEN = re.compile(r'"[^"]*"?|[()]|[^\s()"]+')
+NEAR = re.compile(r'NEAR/(\d+)$')
+
+
+class PostingsCursor(object):
+    """Walks a postings list (any sorted sequence of document numbers)."""
+
+    def __init__(self, postings):
+        self.postings = postings
+        self.estimate = len(postings)
+        self.pos = 0
+        self.docNum = postings[0] if postings else None
+
+    def next(self):
+        self.pos += 1
+        self.docNum = self.postings[self.pos] if self.pos < len(self.postings) else None
+        return self.docNum
+
+    def advance(self, target: int):
+        """Moves to the first document number >= target by galloping."""
+        if self.docNum is None or self.docNum >= target:
+            return self.docNum
+        postings = self.postings
+        end = len(postings)
+        lo = hi = self.pos
+        step = 1
+        while hi < end and postings[hi] < target:
+            lo = hi + 1
+            hi += step
+            step *= 2
+        self.pos = bisect_left(postings, target, lo, min(hi + 1, end))
+        self.docNum = postings[self.pos] if self.pos < end else None
+        return self.docNum
+
+    def offset(self) -> int:
+        """The index of the current document number in the postings list."""
+        return self.pos
+
+
+class CompressedCursor(object):
+    """
+    Walks a `CompressedPostings` list one decoded block at a time, using its
+    skip table to jump over blocks when skipping ahead.
+    """
+
+    def __init__(self, postings: CompressedPostings):
+        self.postings = postings
+        self.estimate = len(postings)
+        self.blockLast = postings.blockLast
+        self.numBlocks = 1 if self.blockLast is None else len(self.blockLast)
+        self.blockNum = 0
+        self.block = postings.block(0) if len(postings) else None
+        self.pos = 0
+        self.docNum = self.block[0] if self.block else None
+
+    def _load(self, blockNum: int):
+        self.blockNum = blockNum
+        self.pos = 0
+        if blockNum < self.numBlocks:
+            self.block = self.postings.block(blockNum)
+            self.docNum = self.block[0]
+        else:
+            self.block = self.docNum = None
+        return self.docNum
+
+    def next(self):
+        self.pos += 1
+        if self.pos == len(self.block):
+            return self._load(self.blockNum + 1)
+        self.docNum = self.block[self.pos]
+        return self.docNum
+
+    def advance(self, target: int):
+        if self.docNum is None or self.docNum >= target:
+            return self.docNum
+        if target > self.block[-1]:
+            if self.blockLast is None:
+                return self._load(self.numBlocks)
+            self._load(bisect_left(self.blockLast, target, self.blockNum + 1))
+            if self.docNum is None or self.docNum >= target:
+                return self.docNum
+        self.pos = bisect_left(self.block, target, self.pos)
+        self.docNum = self.block[self.pos]
+        return self.docNum
+
+    def offset(self) -> int:
+        """The index of the current document number in the postings list."""
+        return self.blockNum * BLOCK_SIZE + self.pos
+
+
+class AndCursor(object):
+    """
+    The intersection of its operands minus the union of the excluded ones.
+    The smallest operand proposes candidates, which the others skip to.
+    """
+
+    def __init__(self, cursors: list, excluded: list):
+        self.cursors = sorted(cursors, key=lambda c: c.estimate)
+        # the largest excluded operands are the most likely to reject a candidate
+        self.excluded = sorted(excluded, key=lambda c: c.estimate, reverse=True)
+        self.estimate = self.cursors[0].estimate
+        self.docNum = self._match(self.cursors[0].docNum)
+
+    def _match(self, candidate):
+        """Returns the first matching document number >= candidate."""
+        lead = self.cursors[0]
+        while candidate is not None:
+            for cursor in self.cursors[1:]:
+                docNum = cursor.advance(candidate)
+                if docNum is None:
+                    return None
+                if docNum != candidate:
+                    # all operands have to catch up with the new candidate
+                    candidate = lead.advance(docNum)
+                    break
+            else:
+                if not any(cursor.advance(candidate) == candidate for cursor in self.excluded):
+                    return candidate
+                candidate = lead.next()
+        return None
+
+    def next(self):
+        self.docNum = self._match(self.cursors[0].next())
+        return self.docNum
+
+    def advance(self, target: int):
+        if self.docNum is None or self.docNum >= target:
+            return self.docNum
+        self.docNum = self._match(self.cursors[0].advance(target))
+        return self.docNum
+
+
+class PositionalCursor(object):
+    """
+    The documents containing all of the given terms at positions for which
+    `match` holds. The positions of a document are only read once all terms'
+    postings lists have been advanced to it.
+    """
+
+    def __init__(self, cursors: list, positions: list, match):
+        """
+        :param cursors: the cursors over the postings lists of the terms
+        :param positions: the `Positions` of the terms, in the same order
+        :param match: a function called with the list of the terms' positions
+                in a document, telling whether the document matches
+        """
+        self.cursors = cursors
+        self.positions = positions
+        self.match = match
+        self.conjunction = AndCursor(cursors, [])
+        self.estimate = self.conjunction.estimate
+        self.docNum = self._match(self.conjunction.docNum)
+
+    def _match(self, docNum):
+        while docNum is not None and not self.match(
+                [positions[cursor.offset()] for cursor, positions in zip(self.cursors, self.positions)]):
+            docNum = self.conjunction.next()
+        return docNum
+
+    def next(self):
+        self.docNum = self._match(self.conjunction.next())
+        return self.docNum
+
+    def advance(self, target: int):
+        if self.docNum is None or self.docNum >= target:
+            return self.docNum
+        self.docNum = self._match(self.conjunction.advance(target))
+        return self.docNum
+
+
+class OrCursor(object):
+    """The union of its operands, as a k-way merge over a heap of them."""
+
+    def __init__(self, cursors: list, numDocs: int):
+        self.estimate = min(sum(c.estimate for c in cursors), numDocs)
+        self.heap = [(c.docNum, i, c) for i, c in enumerate(cursors) if c.docNum is not None]
+        heapq.heapify(self.heap)
+        self.docNum = self.heap[0][0] if self.heap else None
+
+    def next(self):
+        heap = self.heap
+        current = self.docNum
+        # move every operand which is at the current document number
+        while heap and heap[0][0] == current:
+            _, i, cursor = heap[0]
+            docNum = cursor.next()
+            if docNum is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (docNum, i, cursor))
+        self.docNum = heap[0][0] if heap else None
+        return self.docNum
+
+    def advance(self, target: int):
+        heap = self.heap
+        while heap and heap[0][0] < target:
+            _, i, cursor = heap[0]
+            docNum = cursor.advance(target)
+            if docNum is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (docNum, i, cursor))
+        self.docNum = heap[0][0] if heap else None
+        return self.docNum
+
+
+class Term(object):
+    def __init__(self, term: str):
+        self.term = term
+
+    def plan(self, lookup, docs):
+        index = lookup(self.term)
+        if index is None:
+            return None
+        return _cursor(index.postings)
+
+    def __repr__(self):
+        return self.term
+
+
+class Not(object):
+    def __init__(self, operand):
+        self.operand = operand
+
+    def plan(self, lookup, docs):
+        # a NOT on its own is the difference to all documents
+        return And([self]).plan(lookup, docs)
+
+    def __repr__(self):
+        return f'NOT {self.operand!r}'
+
+
+class And(object):
+    def __init__(self, operands: list):
+        self.operands = operands
+
+    def plan(self, lookup, docs):
+        cursors = []
+        excluded = []
+        for operand in self.operands:
+            if isinstance(operand, Not):
+                cursor = operand.operand.plan(lookup, docs)
+                if cursor is not None:
+                    excluded.append(cursor)
+                continue
+            cursor = operand.plan(lookup, docs)
+            if cursor is None:
+                continue
+            if cursor.docNum is None:
+                # short-circuit: nothing can match, the rest is not looked at
+                return PostingsCursor(())
+            cursors.append(cursor)
+        if not cursors:
+            if not excluded:
+                return None
+            cursors.append(PostingsCursor(docs))
+        if len(cursors) == 1 and not excluded:
+            return cursors[0]
+        return AndCursor(cursors, excluded)
+
+    def __repr__(self):
+        return '(' + ' AND '.join(map(repr, self.operands)) + ')'
+
+
+class Or(object):
+    def __init__(self, operands: list):
+        self.operands = operands
+
+    def plan(self, lookup, docs):
+        cursors = [c for c in (operand.plan(lookup, docs) for operand in self.operands)
+                   if c is not None]
+        if not cursors:
+            return None
+        if len(cursors) == 1:
+            return cursors[0]
+        return OrCursor(cursors, len(docs))
+
+    def __repr__(self):
+        return '(' + ' OR '.join(map(repr, self.operands)) + ')'
+
+
+class Phrase(object):
+    def __init__(self, terms: list):
+        self.terms = terms
+
+    def plan(self, lookup, docs):
+        return _planPositional(self.terms, lookup, phraseMatch)
+
+    def __repr__(self):
+        return '"' + ' '.join(self.terms) + '"'
+
+
+class Near(object):
+    def __init__(self, term1: str, term2: str, k: int):
+        self.terms = [term1, term2]
+        self.k = k
+
+    def plan(self, lookup, docs):
+        return _planPositional(self.terms, lookup,
+                               lambda positions: nearMatch(*positions, self.k))
+
+    def __repr__(self):
+        return f'({self.terms[0]} NEAR/{self.k} {self.terms[1]})'
+
+
+def _cursor(postings):
+    if isinstance(postings, CompressedPostings):
+        return CompressedCursor(postings)
+    return PostingsCursor(postings)
+
+
+def _planPositional(terms: list, lookup, match):
+    """
+    Plans a phrase or NEAR query. Ignored terms are left out (they are not
+    counted in the positions either), and like for an AND, a term which
+    occurs nowhere makes the result empty without looking at the others.
+    """
+    indices = []
+    for t in terms:
+        index = lookup(t)
+        if index is None:
+            continue
+        if not index.size:
+            return PostingsCursor(())
+        if index.positions is None:
+            raise ValueError(f'There are no positions for {t!r}, phrase and NEAR '
+                             f'queries need a positional index.')
+        indices.append(index)
+    if not indices:
+        return None
+    if len(indices) == 1:
+        return _cursor(indices[0].postings)
+    return PositionalCursor([_cursor(index.postings) for index in indices],
+                            [index.positions for index in indices], match)
+
+
+def parse(query: str):
+    """
+    Parses a boolean query into a tree of `Term`, `Phrase`, `Near`, `And`,
+    `Or` and `Not`.
+    :param query: the query string (see the module docstring)
+    :return: returns the root of the tree
+    """
+    tokens = TOKEN.findall(query)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parseOr():
+        operands = [parseAnd()]
+        while peek() == 'OR':
+            take()
+            operands.append(parseAnd())
+        return operands[0] if len(operands) == 1 else Or(operands)
+
+    def parseAnd():
+        operands = [parseNot()]
+        while peek() is not None and peek() not in ('OR', ')'):
+            if peek() == 'AND':
+                take()
+            operands.append(parseNot())
+        return operands[0] if len(operands) == 1 else And(operands)
+
+    def parseNot():
+        if peek() == 'NOT':
+            take()
+            return Not(parseNot())
+        return parseAtom()
+
+    def parseAtom():
+        token = peek()
+        if token is None:
+            raise ValueError(f'Unexpected end of query: {query!r}')
+        if token in OPERATORS or token == ')' or NEAR.match(token):
+            raise ValueError(f'Unexpected {token!r} in query: {query!r}')
+        take()
+        if token.startswith('"'):
+            if len(token) < 2 or not token.endswith('"'):
+                raise ValueError(f'Missing \'"\' in query: {query!r}')
+            if not token[1:-1].split():
+                raise ValueError(f'Empty phrase in query: {query!r}')
+            return Phrase(token[1:-1].split())
+        if token != '(':
+            near = NEAR.match(peek() or '')
+            if near is None:
+                return Term(token)
+            take()
+            other = peek()
+            if other is None or other in OPERATORS or other in '()' or other.startswith('"') \
+                    or NEAR.match(other):
+                raise ValueError(f'NEAR/k needs a term on both sides in query: {query!r}')
+            take()
+            if NEAR.match(peek() or ''):
+                raise ValueError(f'NEAR/k cannot be chained in query: {query!r}')
+            return Near(token, other, int(near.group(1)))
+        node = parseOr()
+        if peek() != ')':
+            raise ValueError(f'Missing ")" in query: {query!r}')
+        take()
+        return node
+
+    node = parseOr()
+    if peek() is not None:
+        raise ValueError(f'Unexpected {peek()!r} in query: {query!r}')
+    return node
+
+
+def terms(node) -> list:
+    """Returns the terms of a parsed query, in order."""
+    if isinstance(node, Term):
+        return [node.term]
+    if isinstance(node, (Phrase, Near)):
+        return list(node.terms)
+    if isinstance(node, Not):
+        return terms(node.operand)
+    return [t for operand in node.operands for t in terms(operand)]
+
+
+def evaluate(node, lookup, docs):
+    """
+    Generator over the document numbers matching a parsed query, in
+    ascending order.
+    :param node: the root of the parsed query
+    :param lookup: a function returning the `Index` of a term (its `size`,
+            `postings` and, for phrase and NEAR queries, `positions`), or None
+            if the term is to be ignored (e.g. a stop word)
+    :param docs: the sorted document numbers of all (live) documents, the
+            complement of a NOT is taken against, e.g. a range
+    """
+    cursor = node.plan(lookup, docs)
+    if cursor is None:
+        return
+    docNum = cursor.docNum
+    while docNum is not None:
+        yield docNum
+        docNum = cursor.next()
@@ -0,0 +1,302 @@
+"""
+Binary, memory-mapped file format for the inverted index of `TwitterIR` (and
+of `TwitterIQ` in assignment3).
+
+A saved index can be opened by any number of query processes without
+re-reading tweets.csv or rebuilding anything: the file is memory-mapped, so
+opening it only reads the header, and the pages holding the term dictionary
+and the postings are loaded (and shared between processes) by the operating
+system as they are touched.
+
+All integers are stored in the byte order of the machine that wrote the file
+(recorded in the header) and the sections are 8-byte aligned, so they can be
+viewed as arrays directly. The file consists of:
+
+    header        magic b'TWIRIDX2', then the little/big endian flag and ten
+                  unsigned 64-bit integers: the number of terms, the number of
+                  documents, the number of live (not deleted) documents, the
+                  total number of postings and the offsets of the term table,
+                  the term strings, the postings, the document table, the live
+                  documents and the document strings
+    term table    one entry of four signed 64-bit integers per term, sorted by
+                  the (UTF-8 encoded) term: offset and length of the term in the
+                  term strings, the document frequency and the offset (in
+                  postings, not bytes) of its postings list
+    term strings  the UTF-8 encoded terms, back to back
+    postings      the postings lists of all terms as one contiguous array of
+                  signed 64-bit document numbers, each list sorted ascending
+    doc table     one entry of three signed 64-bit integers per document
+                  number: offset and length of its tweetID in the document
+                  strings and the byte offset of the tweet in the tweets file
+                  (-1 if unknown)
+    live docs     a bitmap with one bit per document number, set if the
+                  document is live; bit k of byte n is document 8 * n + k
+    doc strings   the path of the tweets file followed by the tweetIDs, UTF-8
+                  encoded and back to back; the path is addressed by the
+                  header of the doc table section (its first 16 bytes)
+
+The postings lists of a saved index may still contain deleted documents
+(see `TwitterIR.deleteDocuments`); the live docs tell them apart.
+
+Since the term table has fixed-size entries, a term is found by binary
+search over the mapped file without decoding the whole dictionary.
+
+The postings lists looked up in an open `IndexFile` are views into the
+mapped file, not copies. `close` releases them together with the map, so
+they must not be used afterwards (they raise a ValueError); copy a postings
+list, e.g. with `array('q', index.postings)`, to keep it beyond that.
+"""
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import weakref
+from array import array
+
+MAGIC = b'TWIRIDX2'
+# magic, byte order flag (+ padding), counts and section offsets
+HEADER = struct.Struct('=8s8s10Q')
+TERM_ENTRY = 4
+DOC_ENTRY = 3
+
+
+class IndexFile(object):
+    """
+    Read-only, memory-mapped inverted index. It behaves like the `indices`
+    dictionary of `TwitterIR`: looking up a term returns an `Index` (or an
+    object of another `indexClass`) whose postings list is a view into the
+    mapped file.
+    """
+
+    def __init__(self, path: str, indexClass=None):
+        """
+        Memory-maps an index file written by `IndexFile.save`.
+
+        :param path: the path to the index file
+        :param indexClass: the class of the objects returned for a term, called
+                with the size of the postings list and the postings list, the
+                `Index` of `TwitterIR` by default
+        """
+        if indexClass is None:
+            # imported here since twitterir imports this module
+            from twitterir import Index as indexClass
+        self.path = path
+        self.indexClass = indexClass
+        # weak references to the postings lists handed out by __getitem__,
+        # which have to be released before the map can be closed
+        self._exported = {}
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, byteorder, self.numTerms, self.numDocs, self.numLive, numPostings, termTable, \
+            termStrings, postings, docTable, liveDocs, docStrings = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an index file.')
+        if byteorder.rstrip(b'\0').decode() != sys.byteorder:
+            raise ValueError(f'{path} was written on a machine with a different byte order.')
+
+        view = memoryview(self._mmap)
+        self._termTable = view[termTable:termStrings].cast('q')
+        self._termStrings = view[termStrings:postings]
+        self._postings = view[postings:postings + 8 * numPostings].cast('q')
+        self._docTable = view[docTable + 16:liveDocs].cast('q')
+        self._liveDocs = view[liveDocs:docStrings]
+        self._docStrings = view[docStrings:]
+
+        pathLength, = struct.unpack_from('=q', self._mmap, docTable)
+        self.tweetsPath = bytes(self._docStrings[:pathLength]).decode('utf-8') or None
+
+    @staticmethod
+    def save(path: str, indices: dict, docIds: list, docOffsets=None, tweetsPath: str = None,
+             deleted=()):
+        """
+        Writes an inverted index to a file in the format described above.
+
+        :param path: the path of the index file to write
+        :param indices: the dictionary of terms and their `Index` objects
+        :param docIds: the tweetIDs, indexed by document number
+        :param docOffsets: optionally the byte offsets of the tweets in the
+                tweets file, indexed by document number
+        :param tweetsPath: optionally the path of the tweets file
+        :param deleted: the document numbers of the deleted documents
+        """
+        # sorting str by code point is the same as sorting their UTF-8 encoding
+        items = ((t, indices[t].postings) for t in sorted(indices))
+        IndexFile.write(path, items, docIds, docOffsets, tweetsPath, deleted)
+
+    @staticmethod
+    def write(path: str, items, docIds: list, docOffsets=None, tweetsPath: str = None,
+              deleted=()):
+        """
+        Writes an inverted index given as a stream of (term, postings list)
+        pairs to a file in the format described above. The postings lists are
+        spooled to a temporary file as they come in, so only the term table
+        and the doc table are held in memory.
+
+        :param path: the path of the index file to write
+        :param items: the (term, postings list) pairs, sorted by term
+        :param docIds: the tweetIDs, indexed by document number
+        :param docOffsets: optionally the byte offsets of the tweets in the
+                tweets file, indexed by document number
+        :param tweetsPath: optionally the path of the tweets file
+        :param deleted: the document numbers of the deleted documents
+        """
+        termTable = array('q')
+        termStrings = bytearray()
+        numPostings = 0
+        with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path))) as postings:
+            for t, termPostings in items:
+                encoded = t.encode('utf-8')
+                termPostings = array('q', termPostings)
+                termTable.extend((len(termStrings), len(encoded), len(termPostings), numPostings))
+                termStrings += encoded
+                termPostings.tofile(postings)
+                numPostings += len(termPostings)
+
+            docTable = array('q')
+            docStrings = bytearray((tweetsPath or '').encode('utf-8'))
+            pathLength = len(docStrings)
+            for docNum, id in enumerate(docIds):
+                encoded = id.encode('utf-8')
+                offset = docOffsets[docNum] if docOffsets is not None else -1
+                docTable.extend((len(docStrings), len(encoded), offset))
+                docStrings += encoded
+
+            numDocs = len(docTable) // DOC_ENTRY
+            liveDocs = bytearray(b'\xff') * ((numDocs + 7) // 8)
+            numLive = numDocs
+            for docNum in set(deleted):
+                if docNum < numDocs:
+                    liveDocs[docNum >> 3] &= ~(1 << (docNum & 7))
+                    numLive -= 1
+
+            sections = [termTable.tobytes(), _pad(termStrings), None,
+                        struct.pack('=qq', pathLength, 0) + docTable.tobytes(), _pad(liveDocs),
+                        bytes(docStrings)]
+            offsets = []
+            position = HEADER.size
+            for section in sections:
+                offsets.append(position)
+                position += 8 * numPostings if section is None else len(section)
+
+            with open(path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, sys.byteorder.encode(), len(termTable) // TERM_ENTRY,
+                                    numDocs, numLive, numPostings, *offsets))
+                for section in sections:
+                    if section is None:
+                        postings.seek(0)
+                        shutil.copyfileobj(postings, f)
+                    else:
+                        f.write(section)
+
+    @classmethod
+    def open(cls, path: str, indexClass=None):
+        """Memory-maps an index file, same as `IndexFile(path, indexClass)`."""
+        return cls(path, indexClass)
+
+    def close(self):
+        """
+        Releases the memory map. The postings lists looked up before are
+        released as well, using them afterwards raises a ValueError. Closing
+        a closed index file does nothing.
+        """
+        if self._mmap.closed:
+            return
+        for ref in list(self._exported.values()):
+            postings = ref()
+            if postings is not None:
+                postings.release()
+        self._exported.clear()
+        for view in (self._termTable, self._termStrings, self._postings,
+                     self._docTable, self._liveDocs, self._docStrings):
+            view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _term(self, i: int) -> bytes:
+        start, length = self._termTable[TERM_ENTRY * i], self._termTable[TERM_ENTRY * i + 1]
+        return bytes(self._termStrings[start:start + length])
+
+    def _find(self, term: str) -> int:
+        """Binary searches the term table, returning the entry of the term or -1."""
+        encoded = term.encode('utf-8')
+        lo, hi = 0, self.numTerms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.numTerms and self._term(lo) == encoded:
+            return lo
+        return -1
+
+    def __getitem__(self, term: str):
+        i = self._find(term)
+        if i < 0:
+            raise KeyError(term)
+        df, start = self._termTable[TERM_ENTRY * i + 2], self._termTable[TERM_ENTRY * i + 3]
+        postings = self._postings[start:start + df]
+        key = id(postings)
+        self._exported[key] = weakref.ref(
+            postings, lambda ref, exported=self._exported, key=key: exported.pop(key, None))
+        return self.indexClass(df, postings)
+
+    def get(self, term: str, default=None):
+        try:
+            return self[term]
+        except KeyError:
+            return default
+
+    def __contains__(self, term: str) -> bool:
+        return self._find(term) >= 0
+
+    def __iter__(self):
+        for i in range(self.numTerms):
+            yield self._term(i).decode('utf-8')
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        for t in self:
+            yield t, self[t]
+
+    def __len__(self) -> int:
+        return self.numTerms
+
+    def docId(self, docNum: int) -> str:
+        """Returns the tweetID of a document number."""
+        start, length = self._docTable[DOC_ENTRY * docNum], self._docTable[DOC_ENTRY * docNum + 1]
+        return bytes(self._docStrings[start:start + length]).decode('utf-8')
+
+    def docIds(self) -> list:
+        """Returns the tweetIDs of all documents, indexed by document number."""
+        return [self.docId(docNum) for docNum in range(self.numDocs)]
+
+    def docOffset(self, docNum: int) -> int:
+        """Returns the byte offset of a document in the tweets file, -1 if unknown."""
+        return self._docTable[DOC_ENTRY * docNum + 2]
+
+    def isLive(self, docNum: int) -> bool:
+        """Returns whether a document number belongs to a document which was not deleted."""
+        return bool(self._liveDocs[docNum >> 3] & (1 << (docNum & 7)))
+
+    def deletedDocNums(self) -> list:
+        """Returns the sorted document numbers of the deleted documents."""
+        if self.numLive == self.numDocs:
+            return []
+        return [8 * n + k for n, byte in enumerate(self._liveDocs[:(self.numDocs + 7) // 8])
+                if byte != 0xff for k in range(8) if not byte & (1 << k) and 8 * n + k < self.numDocs]
+
+
+def _pad(data: bytes) -> bytes:
+    """Pads data with zero bytes to a multiple of 8 bytes."""
+    return bytes(data) + b'\0' * (-len(data) % 8)
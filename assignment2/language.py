@@ -0,0 +1,98 @@
+"""
+Language detection for `TwitterIR`, deciding between English and German.
+
+A text is assigned the language with
+1. the most stop words in it, or if that is a tie,
+2. the most words of its dictionary in the cleaned text, or if that is a
+   tie as well,
+3. English, the more common language.
+
+The stop word lists are turned into sets once instead of being loaded from
+NLTK for every token, the cleaning for the second criterion reuses the
+tokens of the first when the text is already clean (as it is when indexing),
+and the decisions are memoized, since tweets (e.g. retweets) and queries
+repeat.
+"""
+from collections import OrderedDict
+
+from nltk.corpus import stopwords
+
+LANGUAGES = ('english', 'german')
+# the language chosen when the criteria cannot decide
+DEFAULT_LANGUAGE = 'english'
+
+
+class LanguageDetector(object):
+
+    def __init__(self, tokenizer, normalizer, spellCheckers: dict, cacheSize: int = 100000):
+        """
+        :param tokenizer: the tokenizer used for counting the stop words
+        :param normalizer: the `TweetNormalizer` cleaning the text for
+                counting the dictionary words
+        :param spellCheckers: the `SpellChecker` of each language, whose
+                dictionaries are used for the second criterion
+        :param cacheSize: the maximum number of texts whose language is remembered
+        """
+        self.tokenizer = tokenizer
+        self.normalizer = normalizer
+        self.spellCheckers = spellCheckers
+        self.stopWords = {lang: frozenset(stopwords.words(lang)) for lang in LANGUAGES}
+        self.cacheSize = cacheSize
+        # least recently used first
+        self._cache = OrderedDict()
+
+    def detect(self, context: str) -> str:
+        """
+        Detects the language of a text (see the module docstring).
+        :param context: the text, e.g. a cleaned tweet or the terms of a query
+        :return: the determined language of the text
+        """
+        try:
+            language = self._cache[context]
+        except KeyError:
+            language = self._cache[context] = self._detect(context)
+            if len(self._cache) > self.cacheSize:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(context)
+        return language
+
+    def _detect(self, context: str) -> str:
+        tokens = self.tokenizer.tokenize(context)
+        language = self._decide({lang: sum(1 for t in tokens if t in stops)
+                                 for lang, stops in self.stopWords.items()})
+        if language is not None:
+            return language
+
+        # cleaning a text which is already clean only removes the stop words,
+        # so the tokens can be reused
+        normalized = self.normalizer.normalize(context)
+        if normalized != context:
+            tokens = self.tokenizer.tokenize(normalized)
+        stopWords = self.normalizer.stop_words
+        if stopWords is not None:
+            tokens = [t for t in tokens if t not in stopWords]
+
+        language = self._decide({lang: sum(1 for t in tokens if spellChecker.in_dictionary(t))
+                                 for lang, spellChecker in self.spellCheckers.items()})
+        return language if language is not None else DEFAULT_LANGUAGE
+
+    @staticmethod
+    def _decide(counts: dict):
+        """Returns the language with the highest count, None if there is a tie."""
+        best = max(counts.values())
+        languages = [lang for lang, count in counts.items() if count == best]
+        return languages[0] if len(languages) == 1 else None
+
+    def detect_many(self, contexts) -> list:
+        """
+        Detects the language of every text of a batch.
+        :param contexts: an iterable of texts
+        :return: the determined language of each text
+        """
+        detect = self.detect
+        return [detect(context) for context in contexts]
+
+    def clear(self):
+        """Forgets the remembered decisions, e.g. after a dictionary was extended."""
+        self._cache.clear()
@@ -0,0 +1,105 @@
+"""
+Precompiled normalization of tweets, shared by `TwitterIR` and the notebooks
+(assignment3 imports this module through its `shared` module).
+
+The translation table deleting punctuation, digits and emojis is built once
+when the module is imported, instead of once per tweet, and the url regex is
+compiled once. A tweet then takes a few passes, all but the tokenization in
+C: removing the [NEWLINE] markers, removing the urls, deleting characters,
+collapsing whitespace and lowercasing.
+
+`TweetNormalizer.clean_many` cleans a batch of tweets, running these passes
+over all of them at once.
+"""
+import re
+import string
+
+import emoji
+from nltk.tokenize import TweetTokenizer
+
+# bunch of punctuation unicodes which are not in 'string.punctuation'
+UNICODES_TO_REMOVE = [
+    # all kinds of quotes
+    u'\u2018', u'\u2019', u'\u201a', u'\u201b', u'\u201c', \
+    u'\u201d', u'\u201e', u'\u201f', u'\u2014',
+    # all kinds of hyphens
+    u'\u002d', u'\u058a', u'\u05be', u'\u1400', u'\u1806', \
+    u'\u2010', u'\u2011', u'\u2012', u'\u2013',
+    u'\u2014', u'\u2015', u'\u2e17', u'\u2e1a', u'\u2e3a', \
+    u'\u2e3b', u'\u2e40', u'\u301c', u'\u3030',
+    u'\u30a0', u'\ufe31', u'\ufe32', u'\ufe58', u'\ufe63', \
+    u'\uff0d', u'\u00b4'
+]
+# keep @ to be able to recognize usernames, and # for hashtags
+PUNCTUATION = string.punctuation.replace('@', '').replace('#', '') + ''.join(UNICODES_TO_REMOVE)
+# a bunch of emoji unicodes
+EMOJIS = ''.join(emoji.UNICODE_EMOJI).replace('#', '')
+# regex to match urls (taken from the web). '…' used to be replaced with '...'
+# before removing urls, so it counts as part of a url like '.' does
+URL_REGEX = re.compile('http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+…]|[!*\\(\\),]'
+                       '|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+# deletes punctuation, digits, emojis and '…' (which was only ever
+# replaced by dots, which are deleted as punctuation) in one pass
+DELETE_TABLE = str.maketrans('', '', PUNCTUATION + string.digits + EMOJIS + '…')
+# joins a batch of tweets; it is not matched by the url regex, not deleted
+# and is whitespace, so it cannot change how a tweet is cleaned
+SEPARATOR = '\n'
+
+
+class TweetNormalizer(object):
+    """
+    Normalizes tweets by removing the urls, punctuation, digits and emojis,
+    putting everything to lowercase, tokenizing and optionally removing the
+    stop words.
+    """
+
+    def __init__(self, tokenizer=None, stop_words=None):
+        """
+        :param tokenizer: the tokenizer to use, a `TweetTokenizer` by default
+        :param stop_words: a set of stop words to remove, None to keep all words
+        """
+        self.tokenizer = tokenizer if tokenizer is not None else TweetTokenizer()
+        self.stop_words = stop_words
+
+    def normalize(self, s):
+        """
+        Normalizes a string (tweet) without tokenizing it.
+        :param s: the string (tweet) to normalize
+        :return: returns the normalized string, with single spaces between words
+        """
+        s = URL_REGEX.sub('', s.replace('[NEWLINE]', ''))
+        return ' '.join(s.translate(DELETE_TABLE).split()).lower()
+
+    def clean(self, s):
+        """
+        Normalizes and tokenizes a string (tweet).
+        :param s: the string (tweet) to clean
+        :return: returns a list of cleaned tokens
+        """
+        tokens = self.tokenizer.tokenize(self.normalize(s))
+        if self.stop_words is None:
+            return tokens
+        return [w for w in tokens if w not in self.stop_words]
+
+    def clean_many(self, tweets):
+        """
+        Cleans a batch of tweets. The tweets are joined into one string, so
+        every pass except the tokenization runs once for the whole batch.
+        :param tweets: an iterable of strings (tweets)
+        :return: returns a list with the list of cleaned tokens of every tweet
+        """
+        tweets = list(tweets)
+        if any(SEPARATOR in s for s in tweets):
+            return [self.clean(s) for s in tweets]
+
+        s = URL_REGEX.sub('', SEPARATOR.join(tweets).replace('[NEWLINE]', ''))
+        s = s.translate(DELETE_TABLE).lower()
+        tokenize = self.tokenizer.tokenize
+        stop_words = self.stop_words
+        rval = []
+        for tweet in s.split(SEPARATOR) if tweets else ():
+            tokens = tokenize(' '.join(tweet.split()))
+            if stop_words is not None:
+                tokens = [w for w in tokens if w not in stop_words]
+            rval.append(tokens)
+        return rval
@@ -0,0 +1,76 @@
+"""
+Positional postings for phrase and proximity queries in `TwitterIR`.
+
+For every document of a term's postings list, the positions of the term in
+the (cleaned) tokens of the tweet are kept in one flat array shared by all
+documents of the term, with a second array marking where each document's
+positions start. The positions of the k-th document of the postings list are
+found without searching, so a query only reads the positions of the
+documents which already contain all of its terms.
+"""
+from array import array
+
+
+class Positions(object):
+    """
+    The positions of a term in each document of its postings list, in the
+    same order as the postings list.
+    """
+
+    __slots__ = 'starts', 'positions'
+
+    def __init__(self, positionLists):
+        """
+        :param positionLists: the sorted positions of the term in every
+                document of its postings list, in postings list order
+        """
+        self.starts = array('q', [0])
+        self.positions = array('I')
+        for positions in positionLists:
+            self.positions.extend(positions)
+            self.starts.append(len(self.positions))
+
+    def __getitem__(self, k: int) -> array:
+        """Returns the positions of the term in the k-th document of its postings list."""
+        return self.positions[self.starts[k]:self.starts[k + 1]]
+
+    def __len__(self) -> int:
+        return len(self.starts) - 1
+
+    def nbytes(self) -> int:
+        return self.starts.itemsize * len(self.starts) + \
+            self.positions.itemsize * len(self.positions)
+
+
+def phraseMatch(positionLists: list) -> bool:
+    """
+    Checks whether terms occur next to each other in the given order.
+    :param positionLists: the positions of each term of the phrase in a document
+    :return: whether there is a position p with the i-th term at p + i
+    """
+    starts = set(positionLists[0])
+    for i, positions in enumerate(positionLists[1:], 1):
+        starts.intersection_update(p - i for p in positions)
+        if not starts:
+            return False
+    return True
+
+
+def nearMatch(positions1, positions2, k: int) -> bool:
+    """
+    Checks whether two terms occur at most k positions apart (in any order)
+    by walking both sorted position lists in parallel.
+    :param positions1: the positions of the first term in a document
+    :param positions2: the positions of the second term in the document
+    :param k: the maximum distance
+    """
+    i = j = 0
+    while i < len(positions1) and j < len(positions2):
+        if abs(positions1[i] - positions2[j]) <= k:
+            return True
+        # only moving past the smaller position can bring them closer
+        if positions1[i] < positions2[j]:
+            i += 1
+        else:
+            j += 1
+    return False
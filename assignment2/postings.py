@@ -0,0 +1,171 @@
+"""
+Compressed postings lists for `TwitterIR`.
+
+A postings list of sorted document numbers is cut into blocks of
+`BLOCK_SIZE` postings. Within a block only the gaps between consecutive
+document numbers are stored, variable-byte encoded: 7 bits per byte, with
+the high bit marking the last byte of a number (so gaps below 128 take a
+single byte instead of the 8 of an array('q') entry). For every block a
+skip table keeps its last document number and where its bytes start, so a
+block can be decoded on its own and blocks that cannot contain a searched
+document number are skipped without decoding them.
+"""
+from array import array
+from bisect import bisect_left
+
+BLOCK_SIZE = 128
+
+
+def encodeVByte(numbers, out: bytearray) -> None:
+    """
+    Appends the variable-byte encoding of non-negative integers to `out`.
+    :param numbers: the numbers to encode
+    :param out: the bytearray to append to
+    """
+    for n in numbers:
+        while n >= 128:
+            out.append(n & 127)
+            n >>= 7
+        out.append(n | 128)
+
+
+def decodeVByte(data, start: int, count: int, value: int = 0) -> array:
+    """
+    Decodes `count` variable-byte encoded gaps starting at `data[start]` and
+    adds them up, starting from `value`.
+    :param data: the encoded bytes
+    :param start: the offset of the first encoded gap
+    :param count: the number of gaps to decode
+    :param value: the document number the first gap is relative to
+    :return: the decoded document numbers
+    """
+    rval = array('q')
+    n = shift = 0
+    i = start
+    while len(rval) < count:
+        byte = data[i]
+        i += 1
+        if byte < 128:
+            n |= byte << shift
+            shift += 7
+        else:
+            value += n | ((byte - 128) << shift)
+            rval.append(value)
+            n = shift = 0
+    return rval
+
+
+class CompressedPostings(object):
+    """
+    A postings list stored as variable-byte encoded gaps in blocks with a
+    skip table. It supports `len`, iteration and indexing, so it can be used
+    wherever an array postings list is read, but decodes blocks on demand.
+
+    The first gap of a block is relative to the last document number of the
+    previous block (or 0), so the skip table only needs the last document
+    number and the byte offset of every block. Lists which fit into a single
+    block, which is most of them, have no skip table at all.
+    """
+
+    __slots__ = 'size', 'data', 'blockLast', 'blockStart'
+
+    def __init__(self, postings):
+        """
+        :param postings: a sorted sequence of document numbers
+        """
+        self.size = len(postings)
+        data = bytearray()
+        # the skip table
+        self.blockLast = array('q')
+        self.blockStart = array('q')
+
+        previous = 0
+        for k in range(0, self.size, BLOCK_SIZE):
+            block = postings[k:k + BLOCK_SIZE]
+            self.blockLast.append(block[-1])
+            self.blockStart.append(len(data))
+            encodeVByte((b - a for a, b in zip([previous] + list(block), block)), data)
+            previous = block[-1]
+
+        self.data = bytes(data)
+        if self.size <= BLOCK_SIZE:
+            self.blockLast = self.blockStart = None
+
+    def block(self, i: int) -> array:
+        """Decodes the i-th block."""
+        count = min(BLOCK_SIZE, self.size - BLOCK_SIZE * i)
+        if self.blockStart is None:
+            return decodeVByte(self.data, 0, count)
+        return decodeVByte(self.data, self.blockStart[i], count,
+                           self.blockLast[i - 1] if i else 0)
+
+    def toArray(self) -> array:
+        """Decodes the whole postings list."""
+        if self.blockStart is None:
+            return decodeVByte(self.data, 0, self.size)
+        rval = array('q')
+        for i in range(len(self.blockStart)):
+            rval.extend(self.block(i))
+        return rval
+
+    def intersect(self, other) -> array:
+        """
+        Computes the intersection with another (shorter) postings list. For
+        every document number of `other` the skip table is searched for the
+        only block which can contain it, and a block is decoded at most once
+        and only if it is needed.
+        :param other: a sorted sequence of document numbers
+        :return: returns the intersection as a postings list
+        """
+        if isinstance(other, CompressedPostings):
+            other = other.toArray()
+
+        rval = array('q')
+        if not self.size:
+            return rval
+        if self.blockLast is None:
+            block = self.toArray()
+            blockLast = array('q', [block[-1]])
+        else:
+            block = None
+            blockLast = self.blockLast
+
+        i = 0
+        pos = 0
+        for val in other:
+            if val > blockLast[i]:
+                # skip to the first block which ends at or after val
+                i = bisect_left(blockLast, val, i + 1)
+                if i == len(blockLast):
+                    break
+                block = None
+                pos = 0
+            if block is None:
+                block = self.block(i)
+            pos = bisect_left(block, val, pos)
+            if block[pos] == val:
+                rval.append(val)
+        return rval
+
+    def nbytes(self) -> int:
+        """The number of bytes taken by the encoded postings and the skip table."""
+        if self.blockStart is None:
+            return len(self.data)
+        return len(self.data) + 8 * 2 * len(self.blockStart)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        if self.blockStart is None:
+            yield from self.toArray()
+        else:
+            for i in range(len(self.blockStart)):
+                yield from self.block(i)
+
+    def __getitem__(self, k: int) -> int:
+        if k < 0:
+            k += self.size
+        if not 0 <= k < self.size:
+            raise IndexError('postings index out of range')
+        return self.block(k // BLOCK_SIZE)[k % BLOCK_SIZE]
@@ -0,0 +1,317 @@
+"""
+Segmented inverted index for `TwitterIR` that can be updated without
+rebuilding it.
+
+New tweets are indexed into a small in-memory buffer. Once the buffer holds
+`maxBufferedDocs` tweets it is frozen into an immutable segment. Deleted
+tweets are only marked with a tombstone, which hides them from queries until
+the segment holding them is merged. Segments are merged with a logarithmic
+(tiered) policy: a segment's tier is the logarithm of its number of tweets to
+the base `mergeFactor`, and whenever the newest `mergeFactor` segments are in
+the same tier they are merged into one segment of the next tier. Every tweet
+is therefore merged O(log n) times. Merges can run in a background thread.
+
+Document numbers only ever grow, so the segments hold disjoint, increasing
+ranges of them, and the postings list of a term across segments is just the
+concatenation of its postings lists in the segments, oldest first.
+
+Queries read from a `Snapshot`, which pins the segments, the buffer and the
+tombstones that existed when it was taken, so a query sees
+the same index for all of its terms even while tweets are added, deleted or
+merged.
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class Segment(object):
+    """
+    An immutable part of the index: a dictionary of terms and their `Index`
+    objects, covering the document numbers from `firstDoc` to `lastDoc`.
+    """
+
+    __slots__ = 'indices', 'numDocs', 'firstDoc', 'lastDoc'
+
+    def __init__(self, indices, numDocs: int, firstDoc: int, lastDoc: int):
+        self.indices = indices
+        self.numDocs = numDocs
+        self.firstDoc = firstDoc
+        self.lastDoc = lastDoc
+
+    def postings(self, term: str):
+        """Returns the postings list of a term in this segment, or None."""
+        index = self.indices.get(term)
+        return None if index is None else index.postings
+
+    def tier(self, mergeFactor: int) -> int:
+        """The integer logarithm of the number of tweets to the base `mergeFactor`."""
+        # math.log is not exact at powers, e.g. math.log(1000, 10) < 3
+        numDocs = self.numDocs
+        tier = 0
+        while numDocs >= mergeFactor:
+            numDocs //= mergeFactor
+            tier += 1
+        return tier
+
+
+class Snapshot(object):
+    """
+    A consistent, read-only view of a `SegmentedIndex` which can be used in
+    place of the `indices` dictionary of `TwitterIR`.
+    """
+
+    def __init__(self, segments: tuple, buffer: dict, tombstones: frozenset, indexClass):
+        self.segments = segments
+        # the buffer is not changed anymore once a snapshot reads it (see
+        # `SegmentedIndex.add`)
+        self.buffer = buffer
+        # sorted, so that only the postings lists which span a tombstone are
+        # filtered
+        self.tombstones = sorted(tombstones)
+        self.indexClass = indexClass
+
+    def __getitem__(self, term: str):
+        postings = array('q')
+        for segment in self.segments:
+            self._extend(postings, segment.postings(term))
+        self._extend(postings, self.buffer.get(term))
+        if not postings:
+            raise KeyError(term)
+        return self.indexClass(len(postings), postings)
+
+    def _extend(self, postings: array, part) -> None:
+        """Appends a postings list (or None) to postings, without the deleted tweets."""
+        if part is None or not len(part):
+            return
+        start = bisect_left(self.tombstones, part[0])
+        end = bisect_right(self.tombstones, part[-1], start)
+        if start == end:
+            postings.extend(part)
+            return
+        part = array('q', part)
+        # cut out the few deleted tweets instead of testing every posting
+        i = 0
+        for docNum in self.tombstones[start:end]:
+            j = bisect_left(part, docNum, i)
+            if j < len(part) and part[j] == docNum:
+                postings.extend(part[i:j])
+                i = j + 1
+        postings.extend(part[i:])
+
+    def get(self, term: str, default=None):
+        try:
+            return self[term]
+        except KeyError:
+            return default
+
+    def __contains__(self, term: str) -> bool:
+        return self.get(term) is not None
+
+    def __iter__(self):
+        terms = set()
+        for segment in self.segments:
+            terms.update(segment.indices)
+        terms.update(self.buffer)
+        return (t for t in sorted(terms) if t in self)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        for t in self:
+            yield t, self[t]
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class SegmentedIndex(object):
+    """
+    An inverted index made of immutable segments and an in-memory buffer,
+    supporting additions and deletions of tweets (see the module docstring).
+    Lookups go through a fresh `Snapshot`, so it can be used in place of the
+    `indices` dictionary of `TwitterIR`.
+    """
+
+    def __init__(self, indexClass, maxBufferedDocs: int = 1000, mergeFactor: int = 4,
+                 background: bool = True):
+        """
+        :param indexClass: the class of the objects returned for a term, called
+                with the size of the postings list and the postings list
+        :param maxBufferedDocs: the number of tweets buffered before they are
+                frozen into a segment
+        :param mergeFactor: the number of segments of a tier which are merged
+        :param background: whether to merge segments in a background thread
+        """
+        self.indexClass = indexClass
+        self.maxBufferedDocs = maxBufferedDocs
+        self.mergeFactor = mergeFactor
+        self.background = background
+        # the segments, oldest first; replaced (never changed) under the lock
+        self.segments = ()
+        self.buffer = {}
+        self.bufferDocs = 0
+        self.bufferFirstDoc = None
+        self.nextDoc = 0
+        self.tombstones = set()
+        # whether a snapshot reads the buffer, which is then copied before the
+        # next tweet is added to it
+        self._bufferShared = False
+        self._lock = threading.Lock()
+        self._merger = None
+        # whether a background merge thread is running; only changed under the
+        # lock, together with the decision whether there is anything to merge
+        self._merging = False
+
+    def addSegment(self, indices, numDocs: int, firstDoc: int, lastDoc: int) -> None:
+        """
+        Adds an existing index (e.g. the `indices` of a `TwitterIR`) as a
+        segment. Its document numbers must all be below those added later.
+        """
+        with self._lock:
+            self.segments += (Segment(indices, numDocs, firstDoc, lastDoc),)
+            self.nextDoc = max(self.nextDoc, lastDoc + 1)
+
+    def add(self, docNum: int, tokens) -> None:
+        """
+        Indexes a tweet into the buffer.
+        :param docNum: the document number of the tweet, larger than any before
+        :param tokens: the tokens of the tweet
+        """
+        with self._lock:
+            if docNum < self.nextDoc:
+                raise ValueError(f'Document number {docNum} was already used.')
+            if self._bufferShared:
+                self.buffer = {t: array('q', postings) for t, postings in self.buffer.items()}
+                self._bufferShared = False
+            for t in set(tokens):
+                try:
+                    self.buffer[t].append(docNum)
+                except KeyError:
+                    self.buffer[t] = array('q', [docNum])
+            if self.bufferFirstDoc is None:
+                self.bufferFirstDoc = docNum
+            self.bufferDocs += 1
+            self.nextDoc = docNum + 1
+            full = self.bufferDocs >= self.maxBufferedDocs
+        if full:
+            self.flush()
+
+    def delete(self, docNum: int) -> None:
+        """Marks a tweet as deleted; it is removed for good when its segment is merged."""
+        with self._lock:
+            self.tombstones.add(docNum)
+
+    def flush(self) -> None:
+        """Freezes the buffer into a segment and starts merging if needed."""
+        with self._lock:
+            if not self.bufferDocs:
+                return
+            indices = {t: self.indexClass(len(postings), postings)
+                       for t, postings in self.buffer.items()}
+            self.segments += (Segment(indices, self.bufferDocs, self.bufferFirstDoc,
+                                      self.nextDoc - 1),)
+            # snapshots keep reading the old buffer, which is not changed anymore
+            self.buffer = {}
+            self._bufferShared = False
+            self.bufferDocs = 0
+            self.bufferFirstDoc = None
+
+            startMerger = self.background and not self._merging
+            if startMerger:
+                self._merging = True
+                self._merger = threading.Thread(target=self.maybeMerge, daemon=True)
+
+        if startMerger:
+            self._merger.start()
+        elif not self.background:
+            self.maybeMerge()
+
+    def maybeMerge(self) -> None:
+        """Merges the newest segments as long as `mergeFactor` of them share a tier."""
+        while True:
+            with self._lock:
+                toMerge = self._segmentsToMerge()
+                if toMerge is None:
+                    self._merging = False
+                    return
+                tombstones = frozenset(self.tombstones)
+
+            merged = self._merge(toMerge, tombstones)
+            with self._lock:
+                # only merges remove segments, so the merged ones are still there
+                start = self.segments.index(toMerge[0])
+                self.segments = self.segments[:start] + (merged,) + \
+                    self.segments[start + self.mergeFactor:]
+                # the purged tweets are in no other segment
+                self.tombstones -= set(docNum for docNum in tombstones
+                                       if merged.firstDoc <= docNum <= merged.lastDoc)
+
+    def _segmentsToMerge(self):
+        """Returns the newest `mergeFactor` segments if they share a tier, else None."""
+        if len(self.segments) < self.mergeFactor:
+            return None
+        toMerge = self.segments[-self.mergeFactor:]
+        if len(set(segment.tier(self.mergeFactor) for segment in toMerge)) != 1:
+            return None
+        return toMerge
+
+    def _merge(self, segments: tuple, tombstones: frozenset) -> Segment:
+        """Merges consecutive segments into one, dropping deleted tweets."""
+        terms = set()
+        for segment in segments:
+            terms.update(segment.indices)
+
+        indices = {}
+        for t in terms:
+            postings = array('q')
+            for segment in segments:
+                segmentPostings = segment.postings(t)
+                if segmentPostings is not None:
+                    postings.extend(docNum for docNum in segmentPostings
+                                    if docNum not in tombstones)
+            if postings:
+                indices[t] = self.indexClass(len(postings), postings)
+
+        firstDoc, lastDoc = segments[0].firstDoc, segments[-1].lastDoc
+        deleted = sum(1 for docNum in tombstones if firstDoc <= docNum <= lastDoc)
+        numDocs = sum(segment.numDocs for segment in segments) - deleted
+        return Segment(indices, numDocs, firstDoc, lastDoc)
+
+    def waitForMerges(self) -> None:
+        """Blocks until the background merges are done."""
+        while True:
+            with self._lock:
+                merger = self._merger if self._merging else None
+            if merger is None:
+                return
+            merger.join()
+
+    def snapshot(self) -> Snapshot:
+        """Returns a consistent view of the index as it is now."""
+        with self._lock:
+            self._bufferShared = True
+            segments, buffer, tombstones = self.segments, self.buffer, frozenset(self.tombstones)
+        return Snapshot(segments, buffer, tombstones, self.indexClass)
+
+    def __getitem__(self, term: str):
+        return self.snapshot()[term]
+
+    def get(self, term: str, default=None):
+        return self.snapshot().get(term, default)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.snapshot()
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def keys(self):
+        return self.snapshot().keys()
+
+    def items(self):
+        return self.snapshot().items()
+
+    def __len__(self) -> int:
+        return len(self.snapshot())
@@ -1,8 +1,220 @@
+import multiprocessing
+import os
+import pickle
+import sys
+from collections import Counter, OrderedDict
+
+
+class DictionaryRegistry(object):
+    """
+    Lazily loaded mapping of languages to dictionary word lists.
+
+    Nothing is read until a language is first looked up, so importing the
+    module is free and does not depend on the current working directory. The
+    first lookup of a language parses its dictionary file into a sorted list
+    of distinct, lowercased words and pickles that list next to the file (or
+    into `cache_dir`). Later processes load the pickle instead, as long as it
+    is newer than the dictionary file. Loaded lists are kept in memory, so
+    every lookup after the first returns the same list object.
+    """
+
+    CACHE_SUFFIX = '.words.pickle'
+
+    def __init__(self, paths: dict, cache_dir: str = None):
+        """
+        :param paths: Key:Value pairs of languages and paths to their dictionary
+                files (one word per line); relative paths are tried in the current
+                working directory first and then next to this module
+        :param cache_dir: the directory for the compiled word lists; if None, they
+                are written next to the dictionary files
+        """
+        self.paths = dict(paths)
+        self.cache_dir = cache_dir
+        self._loaded = {}
+
+    def register(self, lang: str, path: str) -> None:
+        """Sets (or replaces) the dictionary file of a language."""
+        self.paths[lang] = path
+        self._loaded.pop(lang, None)
+
+    def __getitem__(self, lang: str) -> list:
+        try:
+            return self._loaded[lang]
+        except KeyError:
+            words = self._load(self._resolve(self.paths[lang]))
+            self._loaded[lang] = words
+            return words
+
+    def __contains__(self, lang: str) -> bool:
+        return lang in self.paths
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def keys(self):
+        return self.paths.keys()
+
+    def _resolve(self, path: str) -> str:
+        """Returns `path` if it exists, else the same path relative to this module."""
+        if os.path.isabs(path) or os.path.exists(path):
+            return path
+        module_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+        return module_path if os.path.exists(module_path) else path
+
+    def _cache_path(self, path: str) -> str:
+        if self.cache_dir is None:
+            return path + DictionaryRegistry.CACHE_SUFFIX
+        return os.path.join(self.cache_dir, os.path.basename(path) + DictionaryRegistry.CACHE_SUFFIX)
+
+    def _load(self, path: str) -> list:
+        """
+        Loads the compiled word list of a dictionary file, compiling (and caching)
+        it first if there is no up-to-date cache.
+
+        :param path: path to the dictionary file
+        :return: a sorted list of distinct, lowercased words
+        """
+        cache_path = self._cache_path(path)
+        try:
+            if os.path.getmtime(cache_path) >= os.path.getmtime(path):
+                with open(cache_path, 'rb') as f:
+                    return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+        with open(path, 'r', encoding='utf-8') as f:
+            words = sorted(set(line.strip().lower() for line in f if line.strip()))
+
+        # Failing to write the cache only costs the next process the parse
+        try:
+            with open(cache_path, 'wb') as f:
+                pickle.dump(words, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass
+
+        return words
+
+
+class CorrectionCache(object):
+    """
+    Bounded least-recently-used cache of spelling corrections, keyed by
+    `(language, token)`. Once `max_size` entries are stored, adding another
+    evicts the one that was used longest ago. `hits` and `misses` count the
+    lookups, which is handy to see whether a cache is worth persisting.
+
+    The cache can be pickled to `path` with `save` and is read back from it on
+    construction, so a reindex reuses the corrections of the previous run.
+    """
+
+    def __init__(self, max_size: int = 100000, path: str = None):
+        """
+        :param max_size: the maximum number of corrections kept
+        :param path: optional file the cache is loaded from and saved to
+        """
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._corrections = OrderedDict()
+        # the keys stored by `put` since `track` was called, None if not tracking
+        self._tracked = None
+
+        if path is not None and os.path.exists(path):
+            with open(path, 'rb') as f:
+                self._corrections.update(pickle.load(f))
+            self._evict()
+
+    def get(self, lang: str, token: str, default=None):
+        """Returns the cached correction of a token, or `default` if there is none."""
+        key = (lang, token)
+        try:
+            correction = self._corrections[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._corrections.move_to_end(key)
+        self.hits += 1
+        return correction
+
+    def put(self, lang: str, token: str, correction: str) -> None:
+        """Stores the correction of a token, evicting the least recently used one if full."""
+        key = (lang, token)
+        self._corrections[key] = correction
+        self._corrections.move_to_end(key)
+        if self._tracked is not None:
+            self._tracked.add(key)
+        self._evict()
+
+    def get_or_compute(self, lang: str, token: str, compute) -> str:
+        """
+        Returns the cached correction of a token, calling `compute(token)` and
+        caching its result on a miss.
+        """
+        correction = self.get(lang, token)
+        if correction is None:
+            correction = compute(token)
+            self.put(lang, token, correction)
+        return correction
+
+    def track(self) -> None:
+        """
+        Starts remembering which corrections are stored from now on, e.g. in a
+        worker process whose corrections are merged into the cache of its
+        parent (see `tracked`).
+        """
+        self._tracked = set()
+
+    def tracked(self) -> list:
+        """Returns the (language, token, correction) triples stored since `track` and still cached."""
+        if self._tracked is None:
+            return []
+        return [key + (self._corrections[key],) for key in self._tracked if key in self._corrections]
+
+    def save(self, path: str = None) -> None:
+        """Pickles the cached corrections to `path` (defaults to the path given at construction)."""
+        path = path or self.path
+        if path is None:
+            raise ValueError('No path to save the correction cache to.')
+        with open(path, 'wb') as f:
+            pickle.dump(list(self._corrections.items()), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def clear(self) -> None:
+        """Removes all corrections and resets the counters."""
+        self._corrections.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _evict(self) -> None:
+        while len(self._corrections) > self.max_size:
+            self._corrections.popitem(last=False)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._corrections
+
+    def __len__(self) -> int:
+        return len(self._corrections)
+
+
+# The `SpellChecker` used by the worker processes of `SpellChecker.spell_check_many`
+_pool_spell_checker = None
+
+
+def _init_pool_spell_checker(spell_checker):
+    global _pool_spell_checker
+    _pool_spell_checker = spell_checker
+
+
+def _pool_spell_check(word: str) -> str:
+    return _pool_spell_checker.spell_check(word)
+
+
 class SpellChecker(object):
-    DEFAULT_DICTIONARIES = {'english': open('englishdic.sec', 'r').read().splitlines(),
-                            'german': open('germandic-utf8.sec', 'r').read().splitlines()}
+    # Dictionaries are only read on first use, see `DictionaryRegistry`
+    DEFAULT_DICTIONARIES = DictionaryRegistry({'english': 'englishdic.sec',
+                                               'german': 'germandic-utf8.sec'})
 
-    def __init__(self, lang_vocab: list, fdist: dict = None, max_edit_distance: int = 2):
+    def __init__(self, lang_vocab: list, fdist: dict = None, max_edit_distance: int = 2,
+                 candidate_index: str = None):
         """
         Creates a `SpellChecker` object from a dictionary and a frequency distribution. The principle
         method is `spell_check`. Every other method is called in calling it. To best understand this
@@ -14,15 +226,20 @@ class SpellChecker(object):
                 if none is provided and the class default English dictionary is supplied to
                 `lang_vocab`, the Brown corpus is imported and used
         :param max_edit_distance: the maximum edit distance at which words will still be considered
+        :param candidate_index: optionally the index `candidates` looks words up in instead of
+                generating every edit of the word; 'deletion' builds a `DeletionIndex` (fastest
+                lookups, but its size grows steeply with `max_edit_distance`), 'kgram' builds a
+                `KGramIndex` (small, and works for any `max_edit_distance`)
         """
         # At present, sticking with the German alphabet even for English
         self.alphabet = 'aäbcdefghijklmnoöpqrsßtuüvwxyz'
-        # Key:Value pair of alphabet letters and lists of words beginning with those letters
-        # in the provided list of dictionary terms to decrease the time it takes to do dictionary lookups.
-        self.lang_vocab = {letter: [word.lower() for word in lang_vocab \
-                                    if word.lower().startswith(letter)] for letter in self.alphabet}
+        # Key:Value pair of alphabet letters and sets of words beginning with those letters
+        # in the provided list of dictionary terms, so that dictionary lookups are hash lookups.
+        self.lang_vocab = {letter: set() for letter in self.alphabet}
         self.fdist = fdist
         self.max_edit_distance = max_edit_distance
+        self.candidate_index = None
+        self.add_dictionary(lang_vocab)
 
         # If no fdist provided and `lang_vocab` is default English, use the Brown news corpus'.
         # In case you don't have a corpus big enough to create a strong frequency distribution
@@ -36,12 +253,27 @@ class SpellChecker(object):
             else:
                 raise TypeError('No frequency distribution index provided.')
 
+        if candidate_index is not None:
+            try:
+                index_class = {'deletion': DeletionIndex, 'kgram': KGramIndex}[candidate_index]
+            except KeyError:
+                raise ValueError(f'{candidate_index} is not a supported candidate index.')
+            self.candidate_index = index_class(
+                (word for words in self.lang_vocab.values() for word in words if len(word) > 1),
+                self.alphabet, self.max_edit_distance)
+
     def candidates(self, word: str) -> set:
         """
         Returns words within an edit distance of 2 in a ranked order, only generating words
         if there are no results from the previous method. If the word does not begin with
         a letter in `self.alphabet`, it is returned immediately as it was given.
+
+        If a candidate index was built, the same tiers (up to `max_edit_distance`) are
+        answered from the index instead.
         """
+        if self.candidate_index is not None:
+            return self.candidate_index.lookup(word.lower()) or [word]
+
         try:
             return (self.known([word.lower()]) or                     # word if it is known
                     self.known(self.edit_distance1(word.lower())) or  # known words with edit distance 1
@@ -89,16 +321,36 @@ class SpellChecker(object):
                    in self.edit_distance1(edit))
 
     def edit_distanceN(self, word: str) -> set:
-        # FIXME
-        """Runs `edit_distance1` on the results of `edit_distance1` n times."""
-        ret_val = set(word)
+        """
+        Runs `edit_distance1` on the results of `edit_distance1` `max_edit_distance` times.
+        The number of words generated grows exponentially, use a candidate index for
+        anything beyond an edit distance of 2.
+        """
+        ret_val = {word}
 
         for _ in range(self.max_edit_distance):
-            for val in ret_val:
-                ret_val = ret_val | self.edit_distance1(val)
+            ret_val = ret_val | set(edit for val in ret_val for edit in self.edit_distance1(val))
 
         return ret_val
 
+    def add_dictionary(self, words: list) -> None:
+        """
+        Adds words to `lang_vocab` (and the candidate index, if there is one). This is
+        used to build the vocabulary in `__init__`, but more dictionaries can be added
+        at runtime the same way. Words not beginning with a letter in `self.alphabet`
+        are skipped.
+
+        :param words: a list of words in the language's vocabulary
+        """
+        for word in words:
+            word = sys.intern(word.lower())
+            try:
+                self.lang_vocab[word[:1]].add(word)
+            except KeyError:
+                continue
+            if self.candidate_index is not None and len(word) > 1:
+                self.candidate_index.add(word)
+
     def in_dictionary(self, word: str) -> bool:
         """Returns whether the word is in the dictionary."""
         try:
@@ -117,6 +369,41 @@ class SpellChecker(object):
         """Chooses the most likely word in a set of candidates based on `word_probability`."""
         return max(self.candidates(word), key=self.word_probability)
 
+    def spell_check_many(self, words: list, workers: int = 1, chunksize: int = 256) -> list:
+        """
+        Runs `spell_check` on many words at once. Every distinct word is only
+        corrected once, and with more than one worker the distinct words are
+        spread across a process pool. Where processes are forked, the workers
+        inherit this `SpellChecker` (and its vocabulary) instead of receiving a
+        pickled copy.
+
+        :param words: the words to correct
+        :param workers: the number of processes to use
+        :param chunksize: the number of words sent to a worker at a time
+        :return: a list of corrections in the order of `words`
+        """
+        words = list(words)
+        unique = list(dict.fromkeys(words))
+
+        if workers <= 1 or len(unique) <= chunksize:
+            corrections = [self.spell_check(word) for word in unique]
+        else:
+            global _pool_spell_checker
+            if 'fork' in multiprocessing.get_all_start_methods():
+                _pool_spell_checker = self
+                pool = multiprocessing.get_context('fork').Pool(workers)
+            else:
+                pool = multiprocessing.Pool(workers, initializer=_init_pool_spell_checker,
+                                            initargs=(self,))
+            try:
+                with pool:
+                    corrections = pool.map(_pool_spell_check, unique, chunksize)
+            finally:
+                _pool_spell_checker = None
+
+        corrected = dict(zip(unique, corrections))
+        return [corrected[word] for word in words]
+
     def word_probability(self, word: str) -> int:
         """Divides the frequency of a word by overall token count."""
         try:
@@ -124,3 +411,281 @@ class SpellChecker(object):
         except KeyError:
             return 0
 
+
+
+def damerau_levenshtein(s1: str, s2: str, max_distance: int = None) -> int:
+    """
+    Computes the (unrestricted) Damerau-Levenshtein distance between two strings,
+    i.e. the smallest number of insertions, deletions, replacements and transpositions
+    of adjacent letters that turn `s1` into `s2`. This is the distance that repeatedly
+    applying `SpellChecker.edit_distance1` walks, so the two agree on what "an edit
+    distance of 2" means.
+
+    :param s1: the first string
+    :param s2: the second string
+    :param max_distance: optionally stop as soon as the distance is known to exceed this
+    :return: the edit distance between the two strings, or `max_distance + 1` if it
+            exceeds `max_distance`
+    """
+    if max_distance is not None and abs(len(s1) - len(s2)) > max_distance:
+        return max_distance + 1
+
+    infinity = len(s1) + len(s2)
+    # last row in which each character was seen in `s1`
+    last_row = {}
+    # the matrix is padded with an extra row and column holding `infinity`
+    matrix = [[infinity] * (len(s2) + 2)]
+    matrix += [[infinity] + list(range(len(s2) + 1))]
+    matrix += [[infinity, i] + [0] * len(s2) for i in range(1, len(s1) + 1)]
+
+    for row in range(1, len(s1) + 1):
+        last_match_col = 0
+        for col in range(1, len(s2) + 1):
+            last_match_row = last_row.get(s2[col - 1], 0)
+            cost = 0 if s1[row - 1] == s2[col - 1] else 1
+            matrix[row + 1][col + 1] = min(
+                matrix[row][col] + cost,            # replacement (or match)
+                matrix[row + 1][col] + 1,           # insertion
+                matrix[row][col + 1] + 1,           # deletion
+                matrix[last_match_row][last_match_col]
+                + (row - last_match_row - 1) + 1
+                + (col - last_match_col - 1))       # transposition
+            if not cost:
+                last_match_col = col
+        last_row[s1[row - 1]] = row
+        # no cell of a later row can be smaller than the smallest of this one
+        if max_distance is not None and min(matrix[row + 1][1:]) > max_distance:
+            return max_distance + 1
+
+    return matrix[len(s1) + 1][len(s2) + 1]
+
+
+class DeletionIndex(object):
+    """
+    Symmetric delete index (as in SymSpell) for looking up dictionary words within
+    a maximum edit distance.
+
+    Every word in the vocabulary is stored under all strings that can be made by
+    deleting up to `max_edit_distance` letters from it. At lookup time only the
+    deletions of the misspelled word are generated and hashed, which is a few
+    dozen strings instead of the hundreds of thousands that inserting and replacing
+    letters from the alphabet produces. Words found this way are then verified
+    with `damerau_levenshtein`.
+    """
+
+    def __init__(self, vocab, alphabet: str, max_edit_distance: int = 2):
+        """
+        :param vocab: an iterable of (lowercased) dictionary words
+        :param alphabet: the letters `SpellChecker.edit_distance1` inserts and replaces;
+                words containing other letters that the misspelled word does not
+                contain are not reachable by those edits and are left out
+        :param max_edit_distance: the maximum edit distance the index can answer
+        """
+        self.alphabet = set(alphabet)
+        self.max_edit_distance = max_edit_distance
+        self.words = set()
+        # Key:Value pair of delete variants and the words they were generated from
+        self.deletes = {}
+
+        for word in vocab:
+            self.add(word)
+
+    def add(self, word: str) -> None:
+        """Adds a word and all of its delete variants to the index."""
+        if word in self.words:
+            return
+        self.words.add(word)
+        for variant in self.delete_variants(word):
+            try:
+                self.deletes[variant].append(word)
+            except KeyError:
+                self.deletes[variant] = [word]
+
+    def delete_variants(self, word: str) -> set:
+        """Returns the word and every string made by deleting up to `max_edit_distance` letters."""
+        variants = {word}
+        last = {word}
+        for _ in range(self.max_edit_distance):
+            last = set(w[:i] + w[i + 1:] for w in last for i in range(len(w)))
+            variants |= last
+        return variants
+
+    def lookup(self, word: str) -> set:
+        """
+        Returns the known words with the smallest edit distance to `word`,
+        mirroring the tiers of `SpellChecker.candidates`: the word itself if it
+        is known, otherwise the known words at distance 1, otherwise those at
+        distance 2 and so on up to `max_edit_distance`.
+
+        :param word: the (lowercased) word to look up
+        :return: a set of known words, empty if there is none within reach
+        """
+        if word in self.words:
+            return {word}
+
+        tiers = [set() for _ in range(self.max_edit_distance + 1)]
+        seen = set()
+        for variant in self.delete_variants(word):
+            for candidate in self.deletes.get(variant, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if abs(len(candidate) - len(word)) > self.max_edit_distance:
+                    continue
+                if not set(candidate) - set(word) <= self.alphabet:
+                    continue
+                distance = damerau_levenshtein(word, candidate, self.max_edit_distance)
+                if distance <= self.max_edit_distance:
+                    tiers[distance].add(candidate)
+
+        for tier in tiers:
+            if tier:
+                return tier
+        return set()
+
+
+class KGramIndex(object):
+    """
+    Positional inverted index from letter bigrams to the words containing them,
+    used to look up dictionary words within any maximum edit distance.
+
+    Words are padded with '$', so 'word' has the bigrams '$w', 'wo', 'or',
+    'rd' and 'd$' at the positions 0 to 4. A single edit destroys at most three
+    bigrams (a transposition of 'ab' in 'xaby' destroys 'xa', 'ab' and 'by')
+    and shifts the others by at most one position. Two words at edit distance
+    `d` therefore share at least `max(len(w1), len(w2)) + 1 - 3 * d` bigrams
+    no more than `d` positions apart. Only words that pass this count filter
+    are verified with `damerau_levenshtein`, and the tiers are searched from
+    distance 1 upwards, so the filter is as strict as possible for the common
+    case of a single typo.
+
+    For short words and large distances that bound drops to zero. Those words
+    are filtered by their letters instead: an edit destroys at most one letter
+    (a transposition moves two letters by one position each), so two words at
+    edit distance `d` share at least `max(len(w1), len(w2)) - d` letters no
+    more than `d` positions apart. Only when both words have at most `d`
+    letters does every word of a similar length have to be verified.
+    """
+
+    def __init__(self, vocab, alphabet: str, max_edit_distance: int = 2):
+        """
+        :param vocab: an iterable of (lowercased) dictionary words
+        :param alphabet: the letters `SpellChecker.edit_distance1` inserts and replaces;
+                words containing other letters that the misspelled word does not
+                contain are not reachable by those edits and are left out
+        :param max_edit_distance: the maximum edit distance searched by `lookup`
+        """
+        self.alphabet = set(alphabet)
+        self.max_edit_distance = max_edit_distance
+        self.words = []
+        self.word_ids = {}
+        # Key:Value pair of (bigram, position) and lists of ids of the words containing them
+        self.postings = {}
+        # Key:Value pair of (letter, position) and lists of ids of the words
+        # containing them, only for the words short enough to need them
+        self.letter_postings = {}
+        # Key:Value pair of word lengths and lists of ids of words with that length
+        self.by_length = {}
+
+        for word in vocab:
+            self.add(word)
+
+    @staticmethod
+    def kgrams(word: str) -> list:
+        """Returns the padded bigrams of a word, e.g. 'word' -> ['$w', 'wo', 'or', 'rd', 'd$']."""
+        padded = '$' + word + '$'
+        return [padded[i:i + 2] for i in range(len(padded) - 1)]
+
+    def add(self, word: str) -> None:
+        """Adds a word to the index."""
+        if word in self.word_ids:
+            return
+        word_id = len(self.words)
+        self.words.append(word)
+        self.word_ids[word] = word_id
+        self.by_length.setdefault(len(word), []).append(word_id)
+        for position, gram in enumerate(self.kgrams(word)):
+            try:
+                self.postings[gram, position].append(word_id)
+            except KeyError:
+                self.postings[gram, position] = [word_id]
+        if len(word) + 1 - 3 * self.max_edit_distance <= 0:
+            for position, letter in enumerate(word):
+                try:
+                    self.letter_postings[letter, position].append(word_id)
+                except KeyError:
+                    self.letter_postings[letter, position] = [word_id]
+
+    def lookup(self, word: str) -> set:
+        """
+        Returns the known words with the smallest edit distance to `word`,
+        mirroring the tiers of `SpellChecker.candidates`: the word itself if it
+        is known, otherwise the known words at distance 1, otherwise those at
+        distance 2 and so on up to `max_edit_distance`.
+
+        :param word: the (lowercased) word to look up
+        :return: a set of known words, empty if there is none within reach
+        """
+        if word in self.word_ids:
+            return {word}
+
+        grams = self.kgrams(word)
+        # distances already computed in a lower tier
+        distances = {}
+        for distance in range(1, self.max_edit_distance + 1):
+            shared = self._shared(grams, self.postings, distance)
+
+            tier = set()
+            for word_id in self._filter(word, shared, distance):
+                if word_id not in distances:
+                    candidate = self.words[word_id]
+                    if set(candidate) - set(word) <= self.alphabet:
+                        distances[word_id] = damerau_levenshtein(
+                            word, candidate, self.max_edit_distance)
+                    else:
+                        distances[word_id] = None
+                if distances[word_id] == distance:
+                    tier.add(self.words[word_id])
+            if tier:
+                return tier
+        return set()
+
+    @staticmethod
+    def _shared(grams, postings: dict, distance: int) -> Counter:
+        """
+        Counts for every word how many of the grams (bigrams or letters) it
+        contains no more than `distance` positions away from their position.
+        """
+        shared = Counter()
+        for position, gram in enumerate(grams):
+            for shifted in range(max(position - distance, 0), position + distance + 1):
+                shared.update(postings.get((gram, shifted), ()))
+        return shared
+
+    def _filter(self, word: str, shared: Counter, distance: int):
+        """
+        Yields the ids of the words which pass the length and bigram count
+        filters for `distance`, or the letter count filter for the lengths
+        where the bigram count bound is zero.
+        """
+        lengths = range(max(len(word) - distance, 2), len(word) + distance + 1)
+        short = [length for length in lengths if max(length, len(word)) + 1 - 3 * distance <= 0]
+        for word_id, count in shared.items():
+            length = len(self.words[word_id])
+            if length in lengths and length not in short and \
+                    count >= max(length, len(word)) + 1 - 3 * distance:
+                yield word_id
+        if not short:
+            return
+
+        shared = self._shared(word, self.letter_postings, distance)
+        for word_id, count in shared.items():
+            length = len(self.words[word_id])
+            if length in short and count >= max(length, len(word)) - distance:
+                yield word_id
+        # words sharing no letter at all only pass if that bound is zero as well
+        for length in short:
+            if max(length, len(word)) - distance <= 0:
+                for word_id in self.by_length.get(length, ()):
+                    if word_id not in shared:
+                        yield word_id
@@ -0,0 +1,115 @@
+"""
+Single-pass in-memory indexing (SPIMI) with sorted segments on disk.
+
+While indexing, postings lists are collected in memory until their
+estimated size exceeds a memory budget. The in-memory index is then
+flushed as a segment: a file holding its terms in sorted order, each with
+its postings list. When all tweets are indexed, the segments are merged in
+a single pass with a k-way merge over the terms, so neither the segments
+nor the merged index have to fit in memory at once.
+
+A segment is a sequence of records, one per term, each a 4-byte length
+followed by the variable-byte encoded length of the UTF-8 encoded term,
+the term itself, the number of postings and the gaps between them (see
+`postings.encodeVByte`).
+"""
+import heapq
+import struct
+from array import array
+
+from postings import decodeVByte, encodeVByte
+
+RECORD_LENGTH = struct.Struct('<I')
+# rough size in bytes of a term in the in-memory dictionary (the key, the
+# dictionary entry and an empty array), and of each posting in the array
+TERM_BYTES = 200
+POSTING_BYTES = 8
+
+
+def estimateSize(numTerms: int, numPostings: int) -> int:
+    """Estimates the memory taken by an in-memory index of the given size."""
+    return numTerms * TERM_BYTES + numPostings * POSTING_BYTES
+
+
+def writeSegment(path: str, tokens2id: dict) -> None:
+    """
+    Writes an in-memory index to a segment file, sorted by term.
+    :param path: the path of the segment file
+    :param tokens2id: the dictionary of terms and their sorted postings lists
+    """
+    with open(path, 'wb') as f:
+        for t in sorted(tokens2id):
+            postings = tokens2id[t]
+            encoded = t.encode('utf-8')
+            record = bytearray()
+            encodeVByte((len(encoded),), record)
+            record += encoded
+            encodeVByte((len(postings),), record)
+            encodeVByte((b - a for a, b in zip([0] + list(postings), postings)), record)
+            f.write(RECORD_LENGTH.pack(len(record)))
+            f.write(record)
+
+
+def readSegment(path: str):
+    """
+    Generator over the (term, postings list) pairs of a segment file, in
+    sorted order.
+    :param path: the path of the segment file
+    """
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(RECORD_LENGTH.size)
+            if not header:
+                break
+            record = f.read(RECORD_LENGTH.unpack(header)[0])
+            # the term's length, then the term, then the number of postings
+            length = decodeVByte(record, 0, 1)[0]
+            start = _vbyteEnd(record, 0)
+            t = record[start:start + length].decode('utf-8')
+            start += length
+            size = decodeVByte(record, start, 1)[0]
+            start = _vbyteEnd(record, start)
+            yield t, decodeVByte(record, start, size)
+
+
+def mergeSegments(paths: list):
+    """
+    Merges segment files into one stream of (term, postings list) pairs,
+    sorted by term. The segments have to be given in the order they were
+    written, so that concatenating the postings lists of a term keeps them
+    sorted (segments written later hold later document numbers).
+    :param paths: the paths of the segment files, oldest first
+    """
+    segments = [_tagged(n, path) for n, path in enumerate(paths)]
+    current = None
+    merged = None
+    for t, _, postings in heapq.merge(*segments):
+        if t != current:
+            if current is not None:
+                yield current, merged
+            current = t
+            merged = array('q', postings)
+        elif merged[-1] < postings[0]:
+            merged.extend(postings)
+        else:
+            # a tweet in more than one segment (only if a tweetID repeats)
+            merged = array('q', sorted(set(merged) | set(postings)))
+    if current is not None:
+        yield current, merged
+
+
+def _tagged(n: int, path: str):
+    """
+    Generator over the (term, n, postings list) triples of a segment file. The
+    segment number breaks ties between equal terms in `mergeSegments`, keeping
+    the order of the segments.
+    """
+    for t, postings in readSegment(path):
+        yield t, n, postings
+
+
+def _vbyteEnd(data, start: int) -> int:
+    """Returns the offset after the variable-byte encoded number at `start`."""
+    while data[start] < 128:
+        start += 1
+    return start + 1
@@ -0,0 +1,141 @@
+"""
+Tests of the boolean query parser and the cursor executor: random queries are
+evaluated over random postings lists and compared with the same set
+operations on Python sets. Run with `python test_booleanquery.py`; the last
+test builds a `TwitterIR` with small dictionaries of its own.
+"""
+import os
+import random
+import tempfile
+from array import array
+
+import booleanquery
+from postings import CompressedPostings
+
+
+class Index:
+    def __init__(self, postings):
+        self.size = len(postings)
+        self.postings = postings
+        self.positions = None
+
+
+NUM_DOCS = 3000
+TERMS = 'abcdefgh'
+# looked up as None, like a stop word
+IGNORED = 's'
+
+
+def randomPostings(docs, seed=0):
+    """Returns random postings lists of the terms over the given documents."""
+    rng = random.Random(seed)
+    postings = {t: sorted(rng.sample(docs, min(len(docs), rng.choice([0, 3, 50, 400, 2000]))))
+                for t in TERMS}
+    # a term which occurs nowhere
+    postings['z'] = []
+    return postings
+
+
+def randomQuery(rng, postings, docs, depth=0):
+    """Returns a random query and the set of documents it matches, None if it is ignored."""
+    r = rng.random()
+    if depth > 3 or r < .3:
+        t = rng.choice(TERMS + 'z' + IGNORED)
+        return t, None if t == IGNORED else set(postings[t])
+    if r < .45:
+        query, matches = randomQuery(rng, postings, docs, depth + 1)
+        return f'NOT {query}', None if matches is None else set(docs) - matches
+    operator = rng.choice(['AND', 'OR', ''])
+    operands = [randomQuery(rng, postings, docs, depth + 1) for _ in range(rng.randint(2, 4))]
+    sets = [matches for _, matches in operands if matches is not None]
+    if not sets:
+        matches = None
+    elif operator == 'OR':
+        matches = set().union(*sets)
+    else:
+        matches = set.intersection(*sets)
+    query = f' {operator} ' if operator else ' '
+    return '(' + query.join(query for query, _ in operands) + ')', matches
+
+
+def check(docs, compressed, numQueries=1000, seed=0):
+    postings = randomPostings(docs, seed)
+    indices = {t: Index(CompressedPostings(p) if compressed else array('q', p))
+               for t, p in postings.items()}
+
+    def lookup(t):
+        return None if t == IGNORED else indices[t]
+
+    rng = random.Random(seed)
+    for _ in range(numQueries):
+        query, matches = randomQuery(rng, postings, docs)
+        result = list(booleanquery.evaluate(booleanquery.parse(query), lookup, docs))
+        assert result == sorted(matches or ()), query
+
+
+def test_evaluate():
+    check(range(NUM_DOCS), compressed=False)
+
+
+def test_evaluateCompressed():
+    check(range(NUM_DOCS), compressed=True)
+
+
+def test_evaluateWithGaps():
+    # the complement of a NOT only contains the given (live) documents
+    rng = random.Random(1)
+    docs = sorted(rng.sample(range(NUM_DOCS), NUM_DOCS // 2))
+    check(docs, compressed=False, numQueries=300)
+    check(docs, compressed=True, numQueries=300)
+
+
+def test_parse():
+    assert repr(booleanquery.parse('a b OR NOT c AND (d OR e)')) == '((a AND b) OR (NOT c AND (d OR e)))'
+    assert repr(booleanquery.parse('NOT NOT a')) == 'NOT NOT a'
+    assert repr(booleanquery.parse('"a b" c NEAR/2 d')) == '("a b" AND (c NEAR/2 d))'
+    assert booleanquery.terms(booleanquery.parse('a OR NOT (b "c d")')) == ['a', 'b', 'c', 'd']
+    for query in ['', 'a AND', '(a', 'a)', 'OR b', 'NOT', '"a b', '""', 'a NEAR/2',
+                  'NEAR/2 a', 'a NEAR/2 b NEAR/2 c', 'a NEAR/2 (b)']:
+        try:
+            booleanquery.parse(query)
+        except ValueError:
+            continue
+        raise AssertionError(f'{query!r} was parsed')
+
+
+def test_notAfterUpdates():
+    from language import LANGUAGES
+    from spell_checker import SpellChecker
+    from twitterir import TwitterIR
+
+    words = ['wall', 'border', 'mexico']
+    twitterIR = TwitterIR(spellCheckers={
+        lang: SpellChecker(words, {word: 1 for word in words}) for lang in LANGUAGES})
+    twitterIR.addDocuments([('t0', 'wall'), ('t1', 'wall border'), ('t2', 'border')])
+    # replaces t1, whose old document number stays in docIds
+    twitterIR.addDocuments([('t1', 'border mexico'), ('t3', 'mexico')])
+    assert twitterIR.booleanQuery('NOT wall') == ['t1', 't2', 't3']
+    twitterIR.deleteDocuments(['t2'])
+    assert twitterIR.booleanQuery('NOT wall') == ['t1', 't3']
+    assert twitterIR.booleanQuery('NOT mexico') == ['t0']
+    assert twitterIR.booleanQuery('border OR NOT mexico') == ['t0', 't1']
+
+    # the deleted and replaced tweets stay deleted in a saved index
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tweets.idx')
+        twitterIR.save(path)
+        opened = TwitterIR.open(path, spellCheckers=twitterIR.spellCheckers)
+        indexFile = opened.indices
+        assert opened.booleanQuery('NOT wall') == ['t1', 't3']
+        assert opened.booleanQuery('border OR NOT mexico') == ['t0', 't1']
+        assert opened.booleanQuery('border') == ['t1']
+        opened.deleteDocuments(['t0'])
+        assert opened.booleanQuery('NOT mexico') == []
+        indexFile.close()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f'{name} passed')
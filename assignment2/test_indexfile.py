@@ -0,0 +1,123 @@
+"""
+Tests of the binary index file format: an index is saved, memory-mapped again
+and compared with the original, and the postings lists handed out are
+checked to be released when the file is closed. Run with
+`python test_indexfile.py`.
+"""
+import os
+import random
+import tempfile
+from array import array
+
+from indexfile import IndexFile
+from twitterir import Index, TwitterIR
+
+
+def randomIndex(seed=0, numDocs=500):
+    rng = random.Random(seed)
+    terms = ['a', 'b', 'wall', 'mauer', 'straße', 'über', '#trump', '@user', '😀']
+    indices = {}
+    for t in terms:
+        postings = array('q', sorted(rng.sample(range(numDocs), rng.randint(1, numDocs))))
+        indices[t] = Index(len(postings), postings)
+    docIds = [str(10**17 + docNum) for docNum in range(numDocs)]
+    docOffsets = [100 * docNum if docNum % 7 else -1 for docNum in range(numDocs)]
+    return indices, docIds, docOffsets
+
+
+def tempPath():
+    f, path = tempfile.mkstemp(suffix='.idx')
+    os.close(f)
+    return path
+
+
+def test_roundTrip():
+    indices, docIds, docOffsets = randomIndex()
+    path = tempPath()
+    try:
+        IndexFile.save(path, indices, docIds, docOffsets, 'tweets.csv', deleted={3, 8, 499})
+        with IndexFile.open(path) as indexFile:
+            assert indexFile.numLive == len(docIds) - 3
+            assert indexFile.deletedDocNums() == [3, 8, 499]
+            assert [indexFile.isLive(docNum) for docNum in range(10)] == \
+                [docNum not in (3, 8) for docNum in range(10)]
+            assert len(indexFile) == len(indices)
+            assert list(indexFile) == sorted(indices)
+            for t, index in indices.items():
+                assert t in indexFile
+                assert indexFile[t].size == index.size
+                assert list(indexFile[t].postings) == list(index.postings)
+            assert 'mexico' not in indexFile
+            assert indexFile.get('mexico') is None
+            assert indexFile.docIds() == docIds
+            assert [indexFile.docOffset(docNum) for docNum in range(len(docIds))] == docOffsets
+            assert indexFile.tweetsPath == 'tweets.csv'
+    finally:
+        os.remove(path)
+
+
+def test_empty():
+    path = tempPath()
+    try:
+        IndexFile.save(path, {}, [])
+        with IndexFile.open(path) as indexFile:
+            assert len(indexFile) == 0
+            assert indexFile.get('a') is None
+            assert indexFile.docIds() == []
+            assert indexFile.tweetsPath is None
+    finally:
+        os.remove(path)
+
+
+def test_closeWithLivePostings():
+    indices, docIds, _ = randomIndex()
+    path = tempPath()
+    try:
+        IndexFile.save(path, indices, docIds)
+        indexFile = IndexFile.open(path)
+        postings = indexFile['wall'].postings
+        kept = array('q', indexFile['mauer'].postings)
+        # a postings list which is not referenced anymore is forgotten
+        indexFile['a']
+        assert len(indexFile._exported) == 1
+
+        indexFile.close()
+        try:
+            postings[0]
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('the postings list was not released')
+        assert list(kept) == list(indices['mauer'].postings)
+        # closing twice does nothing
+        indexFile.close()
+    finally:
+        os.remove(path)
+
+
+def test_twitterIROpen():
+    indices, docIds, docOffsets = randomIndex()
+    path = tempPath()
+    try:
+        IndexFile.save(path, indices, docIds, docOffsets, 'tweets.csv')
+        twitterIR = TwitterIR.open(path)
+        # nothing is loaded or decoded before it is used
+        assert twitterIR.spellCheckers.spellCheckers == {}
+        assert twitterIR.docNums.dict is None
+        assert twitterIR.id2doc.offsets.dict is None
+        assert len(twitterIR.docIds) == len(docIds)
+        assert twitterIR.docIds[7] == docIds[7]
+        assert list(twitterIR.docIds) == docIds
+        assert twitterIR.docNums[docIds[42]] == 42
+        assert twitterIR.id2doc.offsets[docIds[5]] == docOffsets[5]
+        assert docIds[7] not in twitterIR.id2doc
+        twitterIR.indices.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f'{name} passed')
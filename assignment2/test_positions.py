@@ -0,0 +1,149 @@
+"""
+Tests of phrase and NEAR matching: random tweets are indexed with positions,
+and phrase and NEAR queries are compared with searching the tokens of every
+tweet. Run with `python test_positions.py`; the last test builds a
+`TwitterIR` with small dictionaries of its own.
+"""
+import os
+import random
+import tempfile
+from array import array
+
+import booleanquery
+from positions import Positions, nearMatch, phraseMatch
+from postings import CompressedPostings
+
+TERMS = 'abcde'
+
+
+class Index:
+    def __init__(self, postings, positions):
+        self.size = len(postings)
+        self.postings = postings
+        self.positions = positions
+
+
+def randomTweets(numTweets=2000, seed=0):
+    rng = random.Random(seed)
+    return [rng.choices(TERMS, k=rng.randint(1, 12)) for _ in range(numTweets)]
+
+
+def positionalIndex(tweets, compressed=False):
+    positions = {}
+    for docNum, tokens in enumerate(tweets):
+        for position, t in enumerate(tokens):
+            positions.setdefault(t, {}).setdefault(docNum, array('I')).append(position)
+    indices = {}
+    for t, tokenPositions in positions.items():
+        postings = array('q', sorted(tokenPositions))
+        indices[t] = Index(CompressedPostings(postings) if compressed else postings,
+                           Positions(tokenPositions[docNum] for docNum in postings))
+    return indices
+
+
+def containsPhrase(tokens, phrase):
+    return any(tokens[i:i + len(phrase)] == phrase for i in range(len(tokens)))
+
+
+def containsNear(tokens, t1, t2, k):
+    return any(abs(i - j) <= k for i, a in enumerate(tokens) if a == t1
+               for j, b in enumerate(tokens) if b == t2)
+
+
+def test_positions():
+    positionLists = [[0, 3], [], [1], [2, 5, 9]]
+    positions = Positions(array('I', p) for p in positionLists)
+    assert len(positions) == len(positionLists)
+    assert [list(positions[k]) for k in range(len(positions))] == positionLists
+
+
+def test_phraseMatch():
+    assert phraseMatch([[0, 4], [5], [6]])
+    assert not phraseMatch([[0, 4], [5], [7]])
+    assert phraseMatch([[3]])
+    # the same term twice
+    assert phraseMatch([[1, 2], [1, 2]])
+    assert not phraseMatch([[1, 3], [1, 3]])
+
+
+def test_nearMatch():
+    rng = random.Random(0)
+    for _ in range(2000):
+        positions1 = sorted(rng.sample(range(30), rng.randint(1, 5)))
+        positions2 = sorted(rng.sample(range(30), rng.randint(1, 5)))
+        k = rng.randint(0, 6)
+        assert nearMatch(positions1, positions2, k) == \
+            any(abs(i - j) <= k for i in positions1 for j in positions2)
+
+
+def check(compressed):
+    tweets = randomTweets()
+    indices = positionalIndex(tweets, compressed)
+    lookup = indices.get
+    docs = range(len(tweets))
+    rng = random.Random(1)
+    for _ in range(300):
+        phrase = rng.choices(TERMS, k=rng.randint(1, 4))
+        result = list(booleanquery.evaluate(booleanquery.parse('"' + ' '.join(phrase) + '"'),
+                                            lookup, docs))
+        assert result == [d for d in docs if containsPhrase(tweets[d], phrase)], phrase
+
+        t1, t2 = rng.choices(TERMS, k=2)
+        k = rng.randint(0, 5)
+        result = list(booleanquery.evaluate(booleanquery.parse(f'{t1} NEAR/{k} {t2}'), lookup, docs))
+        assert result == [d for d in docs if containsNear(tweets[d], t1, t2, k)], (t1, t2, k)
+
+    # phrases combined with the other operators
+    result = list(booleanquery.evaluate(booleanquery.parse('"a b" AND NOT c NEAR/1 d'), lookup, docs))
+    assert result == [d for d in docs if containsPhrase(tweets[d], ['a', 'b'])
+                      and not containsNear(tweets[d], 'c', 'd', 1)]
+
+
+def test_queries():
+    check(compressed=False)
+
+
+def test_queriesCompressed():
+    check(compressed=True)
+
+
+def test_missingPositions():
+    indices = {'a': Index(array('q', [0]), None), 'b': Index(array('q', [0]), None)}
+    try:
+        list(booleanquery.evaluate(booleanquery.parse('"a b"'), indices.get, range(1)))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('a phrase was matched without positions')
+
+
+def test_twitterIR():
+    from language import LANGUAGES
+    from spell_checker import SpellChecker
+    from twitterir import TwitterIR
+
+    tweets = ['the campaign finance laws', 'finance of the campaign', 'campaign reform bill',
+              'reform of the senate bill']
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tweets.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            for id, tweet in enumerate(tweets):
+                f.write(f'x\t{id}\tx\tx\t{tweet}\n')
+        words = ['campaign', 'finance', 'laws', 'reform', 'bill', 'senate']
+        twitterIR = TwitterIR(positional=True, spellCheckers={
+            lang: SpellChecker(words, {word: 1 for word in words}) for lang in LANGUAGES})
+        twitterIR.index(path, maxDocs=None)
+
+    # stop words are not counted in the positions
+    assert twitterIR.booleanQuery('"campaign finance"') == ['0']
+    assert twitterIR.booleanQuery('"finance campaign"') == ['1']
+    assert twitterIR.booleanQuery('reform NEAR/1 bill') == ['2']
+    assert twitterIR.booleanQuery('reform NEAR/2 bill') == ['2', '3']
+    assert twitterIR.booleanQuery('campaign NEAR/1 finance AND NOT laws') == ['1']
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f'{name} passed')
@@ -0,0 +1,82 @@
+"""
+Tests of the compressed postings lists: random postings lists are encoded and
+decoded again, read through the skip table and intersected, and compared
+with the plain arrays. Run with `python test_postings.py`.
+"""
+import random
+from array import array
+
+from postings import BLOCK_SIZE, CompressedPostings, decodeVByte, encodeVByte
+
+# around the block size, where the skip table starts
+SIZES = [0, 1, 2, BLOCK_SIZE - 1, BLOCK_SIZE, BLOCK_SIZE + 1, 2 * BLOCK_SIZE,
+         5 * BLOCK_SIZE + 17, 3000]
+
+
+def randomPostings(rng, size, maxDoc=10**6):
+    return array('q', sorted(rng.sample(range(maxDoc), size)))
+
+
+def test_vbyte():
+    numbers = [0, 1, 127, 128, 129, 16383, 16384, 2**32, 2**62, 5]
+    data = bytearray()
+    encodeVByte(numbers, data)
+    # the high bit marks the last byte of every number
+    assert sum(byte >= 128 for byte in data) == len(numbers)
+    assert len(data) == 1 + 1 + 1 + 2 + 2 + 2 + 3 + 5 + 9 + 1
+    # the decoded gaps are added up
+    assert list(decodeVByte(data, 0, len(numbers))) == [sum(numbers[:k + 1]) for k in range(len(numbers))]
+    assert list(decodeVByte(data, 1, 2, 10)) == [11, 138]
+
+
+def test_roundTrip():
+    rng = random.Random(0)
+    for size in SIZES:
+        # gaps of one, two and up to five bytes
+        for step in (1, 100, 2**30):
+            postings = array('q', sorted(rng.sample(range(0, 4 * (size + 1) * step, step), size)))
+            compressed = CompressedPostings(postings)
+            assert len(compressed) == size
+            assert compressed.toArray() == postings
+            assert list(compressed) == list(postings)
+            assert [compressed[k] for k in range(size)] == list(postings)
+            if size:
+                assert compressed[-1] == postings[-1]
+            # lists which fit into one block have no skip table
+            assert (compressed.blockLast is None) == (size <= BLOCK_SIZE)
+            if compressed.blockLast is not None:
+                assert list(compressed.blockLast) == list(postings[BLOCK_SIZE - 1::BLOCK_SIZE]) + \
+                    ([postings[-1]] if size % BLOCK_SIZE else [])
+                for i in range(len(compressed.blockLast)):
+                    assert compressed.block(i) == postings[i * BLOCK_SIZE:(i + 1) * BLOCK_SIZE]
+            for k in (size, -size - 1):
+                try:
+                    compressed[k]
+                except IndexError:
+                    continue
+                raise AssertionError(f'postings index {k} of {size}')
+
+
+def test_dense():
+    # consecutive document numbers take a byte each
+    postings = array('q', range(1000))
+    assert CompressedPostings(postings).nbytes() < postings.itemsize * len(postings) // 4
+
+
+def test_intersect():
+    rng = random.Random(1)
+    for size1 in SIZES:
+        for size2 in SIZES:
+            postings1 = randomPostings(rng, size1, 5000)
+            postings2 = randomPostings(rng, size2, 5000)
+            expected = sorted(set(postings1) & set(postings2))
+            compressed = CompressedPostings(postings1)
+            assert list(compressed.intersect(postings2)) == expected
+            assert list(compressed.intersect(CompressedPostings(postings2))) == expected
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f'{name} passed')
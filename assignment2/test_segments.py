@@ -0,0 +1,107 @@
+"""
+Tests of the segmented index: random additions and deletions are compared
+with the set of live tweets, with merges in the foreground and in the
+background thread. Run with `python test_segments.py`.
+"""
+import random
+from array import array
+
+from segments import Segment, SegmentedIndex
+
+TERMS = 'abcdefghij'
+
+
+class Index:
+    def __init__(self, size, postings):
+        self.size = size
+        self.postings = postings
+
+
+def expected(tweets, deleted, t):
+    return [docNum for docNum, tokens in tweets.items() if t in tokens and docNum not in deleted]
+
+
+def check(background, seed=0):
+    rng = random.Random(seed)
+    index = SegmentedIndex(Index, maxBufferedDocs=5, mergeFactor=3, background=background)
+    tweets = {}
+    deleted = set()
+    for docNum in range(2000):
+        tweets[docNum] = rng.sample(TERMS, 3)
+        index.add(docNum, tweets[docNum])
+        if rng.random() < .1:
+            victim = rng.randrange(docNum + 1)
+            if victim not in deleted:
+                deleted.add(victim)
+                index.delete(victim)
+        if docNum % 97 == 0:
+            for t in TERMS:
+                assert list(index.get(t, Index(0, [])).postings) == expected(tweets, deleted, t)
+    index.flush()
+    index.waitForMerges()
+
+    for t in TERMS:
+        assert list(index[t].postings) == expected(tweets, deleted, t)
+    # the newest segments do not share a tier anymore
+    assert index._segmentsToMerge() is None
+    # the segments hold disjoint, increasing ranges of document numbers
+    for older, newer in zip(index.segments, index.segments[1:]):
+        assert older.lastDoc < newer.firstDoc
+    # the tombstones of merged segments are purged
+    assert len(index.tombstones) < len(deleted)
+    assert sum(segment.numDocs for segment in index.segments) == \
+        len(tweets) - (len(deleted) - len(index.tombstones))
+
+
+def test_foreground():
+    check(background=False)
+
+
+def test_background():
+    check(background=True)
+
+
+def test_tier():
+    for numDocs, tier in [(0, 0), (1, 0), (9, 0), (10, 1), (99, 1), (100, 2), (999, 2),
+                          (1000, 3), (10**6, 6), (10**15, 15)]:
+        assert Segment({}, numDocs, 0, 0).tier(10) == tier, numDocs
+    assert Segment({}, 4**5, 0, 0).tier(4) == 5
+    assert Segment({}, 4**5 - 1, 0, 0).tier(4) == 4
+
+
+def test_snapshot():
+    index = SegmentedIndex(Index, maxBufferedDocs=2, mergeFactor=2, background=False)
+    for docNum in range(5):
+        index.add(docNum, ['a'])
+    snapshot = index.snapshot()
+    index.add(5, ['a', 'b'])
+    index.delete(0)
+    index.flush()
+    assert list(snapshot['a'].postings) == [0, 1, 2, 3, 4]
+    assert 'b' not in snapshot
+    assert list(index['a'].postings) == [1, 2, 3, 4, 5]
+    assert list(index['b'].postings) == [5]
+    # a term whose tweets are all deleted is gone
+    index.delete(5)
+    assert 'b' not in index
+    assert list(index) == ['a']
+
+
+def test_addSegment():
+    index = SegmentedIndex(Index, background=False)
+    index.addSegment({'a': Index(2, array('q', [0, 2]))}, 3, 0, 2)
+    try:
+        index.add(2, ['a'])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('a document number was used twice')
+    index.add(3, ['a'])
+    assert list(index['a'].postings) == [0, 2, 3]
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f'{name} passed')
@@ -0,0 +1,147 @@
+"""
+Tests of the candidate indexes of the spell checker: random misspellings are
+looked up in a small random vocabulary and compared with the tiers of known
+words found by computing the edit distance to every word. The batch
+correction is compared with correcting one word at a time, also in the
+processes of a parallel `TwitterIR.index`. Run with
+`python test_spell_checker.py`.
+"""
+import random
+
+from spell_checker import CorrectionCache, DeletionIndex, KGramIndex, SpellChecker, damerau_levenshtein
+
+LETTERS = 'abcdeäß'
+
+
+def randomVocab(seed=0, size=300):
+    rng = random.Random(seed)
+    vocab = {''.join(rng.choices(LETTERS, k=rng.randint(2, 7))) for _ in range(size)}
+    # a letter the edits of the spell checker never insert
+    vocab.add('abé')
+    return sorted(vocab)
+
+
+def randomWords(seed=1, number=150):
+    rng = random.Random(seed)
+    return [''.join(rng.choices(LETTERS + 'xé', k=rng.randint(1, 8))) for _ in range(number)]
+
+
+def bruteForce(word, vocab, alphabet, maxEditDistance):
+    """The known words with the smallest edit distance to word, like `SpellChecker.candidates`."""
+    if word in vocab:
+        return {word}
+    tiers = {}
+    for candidate in vocab:
+        if set(candidate) - set(word) <= set(alphabet):
+            distance = damerau_levenshtein(word, candidate)
+            if distance <= maxEditDistance:
+                tiers.setdefault(distance, set()).add(candidate)
+    return tiers[min(tiers)] if tiers else set()
+
+
+def check(indexClass):
+    vocab = randomVocab()
+    alphabet = SpellChecker(vocab, {}).alphabet
+    for maxEditDistance in (1, 2, 3):
+        index = indexClass(vocab, alphabet, maxEditDistance)
+        for word in randomWords() + vocab[:20]:
+            assert index.lookup(word) == bruteForce(word, vocab, alphabet, maxEditDistance), \
+                (word, maxEditDistance)
+
+
+def test_damerauLevenshtein():
+    for s1, s2, distance in [('', '', 0), ('', 'abc', 3), ('abc', 'abc', 0), ('abc', 'abd', 1),
+                             ('abc', 'acb', 1), ('ca', 'abc', 2), ('kitten', 'sitting', 3),
+                             ('straße', 'strasse', 2)]:
+        assert damerau_levenshtein(s1, s2) == distance, (s1, s2)
+        assert damerau_levenshtein(s2, s1) == distance, (s2, s1)
+    # distances beyond the maximum are cut off
+    assert damerau_levenshtein('kitten', 'sitting', 1) == 2
+
+
+def test_deletionIndex():
+    check(DeletionIndex)
+
+
+def test_kgramIndex():
+    check(KGramIndex)
+
+
+def test_kgramLetters():
+    # only the words for which the bigram bound can be zero are indexed by letters
+    vocab = randomVocab() + ['abcdabcd', 'abcdabcda']
+    index = KGramIndex(vocab, SpellChecker(vocab, {}).alphabet, 3)
+    lengths = {len(index.words[word_id]) for postings in index.letter_postings.values()
+               for word_id in postings}
+    assert max(lengths) == 8
+
+
+def test_candidates():
+    # the index gives the same candidates as generating the edits of the word
+    vocab = randomVocab()
+    fdist = {word: 1 for word in vocab}
+    edits = SpellChecker(vocab, fdist)
+    indexes = [SpellChecker(vocab, fdist, candidate_index=index) for index in ('deletion', 'kgram')]
+    # generating the edits at distance 2 takes long
+    for word in randomWords(number=30):
+        for indexed in indexes:
+            assert set(indexed.candidates(word)) == set(edits.candidates(word)), word
+
+
+def test_spellCheckMany():
+    vocab = randomVocab()
+    # distinct frequencies, so that every process picks the same correction
+    spellChecker = SpellChecker(vocab, {word: rank for rank, word in enumerate(vocab)},
+                                candidate_index='kgram')
+    words = randomWords() * 2
+    serial = [spellChecker.spell_check(word) for word in words]
+    assert spellChecker.spell_check_many(words) == serial
+    assert spellChecker.spell_check_many(words, workers=2, chunksize=16) == serial
+    assert spellChecker.spell_check_many([], workers=2) == []
+
+
+def test_correctionCacheTracking():
+    cache = CorrectionCache(max_size=2)
+    cache.put('english', 'teh', 'the')
+    assert cache.tracked() == []
+    cache.track()
+    cache.get('english', 'teh')
+    cache.put('english', 'wal', 'wall')
+    assert cache.tracked() == [('english', 'wal', 'wall')]
+    # evicted corrections are not reported
+    cache.put('german', 'mauerr', 'mauer')
+    cache.put('german', 'strase', 'straße')
+    assert sorted(cache.tracked()) == [('german', 'mauerr', 'mauer'), ('german', 'strase', 'straße')]
+
+
+def test_parallelCorrections():
+    import os
+    import tempfile
+
+    from language import LANGUAGES
+    from twitterir import TwitterIR
+
+    words = ['wall', 'border', 'mexico']
+    tweets = ['wal border', 'border mexiko', 'wall', 'mexico walll'] * 10
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tweets.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            for id, tweet in enumerate(tweets):
+                f.write(f'x\t{id}\tx\tx\t{tweet}\n')
+        twitterIR = TwitterIR(spellCheckers={
+            lang: SpellChecker(words, {word: 1 for word in words}) for lang in LANGUAGES})
+        twitterIR.index(path, maxDocs=None, workers=2)
+
+    # the corrections made by the worker processes are cached in the parent
+    corrections = {token: correction for (_, token), correction
+                   in twitterIR.correctionCache._corrections.items()}
+    assert corrections == {'wal': 'wall', 'mexiko': 'mexico', 'walll': 'wall'}
+    assert twitterIR.booleanQuery('wall') == sorted(str(id) for id, tweet in enumerate(tweets)
+                                                    if 'wal' in tweet)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f'{name} passed')
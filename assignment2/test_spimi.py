@@ -0,0 +1,130 @@
+"""
+Tests of the SPIMI segments: segments are written, read back and merged, and
+compared with the in-memory index they were made of. Run with
+`python test_spimi.py`; the last test builds a `TwitterIR` with small
+dictionaries of its own.
+"""
+import heapq
+import os
+import random
+import tempfile
+from array import array
+
+import spimi
+
+
+def randomSegments(numSegments=4, docsPerSegment=300, seed=0):
+    """Returns in-memory indexes over consecutive ranges of document numbers."""
+    rng = random.Random(seed)
+    terms = ['a', 'b', 'wall', 'mauer', 'straße', 'über', '#trump', '@user', '😀', 'x' * 200]
+    segments = []
+    for n in range(numSegments):
+        docs = range(n * docsPerSegment, (n + 1) * docsPerSegment)
+        tokens2id = {}
+        for t in rng.sample(terms, rng.randint(1, len(terms))):
+            tokens2id[t] = array('q', sorted(rng.sample(docs, rng.randint(1, len(docs)))))
+        segments.append(tokens2id)
+    # a large gap takes several bytes
+    segments[-1]['far'] = array('q', [2**40, 2**40 + 1, 2**62])
+    return segments
+
+
+def writeSegments(directory, segments):
+    paths = []
+    for n, tokens2id in enumerate(segments):
+        paths.append(os.path.join(directory, f'segment{n}'))
+        spimi.writeSegment(paths[-1], tokens2id)
+    return paths
+
+
+def test_roundTrip():
+    with tempfile.TemporaryDirectory() as directory:
+        for tokens2id, path in zip(randomSegments(), writeSegments(directory, randomSegments())):
+            items = list(spimi.readSegment(path))
+            assert [t for t, _ in items] == sorted(tokens2id)
+            for t, postings in items:
+                assert postings == tokens2id[t]
+
+
+def test_empty():
+    with tempfile.TemporaryDirectory() as directory:
+        path, = writeSegments(directory, [{}])
+        assert list(spimi.readSegment(path)) == []
+        assert list(spimi.mergeSegments([path])) == []
+        assert list(spimi.mergeSegments([])) == []
+
+
+def test_merge():
+    segments = randomSegments()
+    expected = {}
+    for tokens2id in segments:
+        for t, postings in tokens2id.items():
+            expected.setdefault(t, array('q')).extend(postings)
+    with tempfile.TemporaryDirectory() as directory:
+        merged = list(spimi.mergeSegments(writeSegments(directory, segments)))
+    assert [t for t, _ in merged] == sorted(expected)
+    for t, postings in merged:
+        assert postings == expected[t]
+
+
+def test_mergeOverlapping():
+    # a tweet in two segments is only in the merged postings list once
+    segments = [{'a': array('q', [1, 5, 9])}, {'a': array('q', [5, 7]), 'b': array('q', [7])}]
+    with tempfile.TemporaryDirectory() as directory:
+        merged = dict(spimi.mergeSegments(writeSegments(directory, segments)))
+    assert merged == {'a': array('q', [1, 5, 7, 9]), 'b': array('q', [7])}
+
+
+def test_mergeOrder():
+    # equal terms come out of the segments in the order the segments were written
+    segments = [{'a': array('q', [n, 10 - n]), 'b': array('q', [20 + n])} for n in range(4)]
+    with tempfile.TemporaryDirectory() as directory:
+        paths = writeSegments(directory, segments)
+        tagged = heapq.merge(*(spimi._tagged(n, path) for n, path in enumerate(paths)))
+        assert [(t, n) for t, n, _ in tagged] == [('a', n) for n in range(4)] + [('b', n) for n in range(4)]
+        merged = dict(spimi.mergeSegments(paths))
+    assert merged == {'a': array('q', [0, 1, 2, 3, 7, 8, 9, 10]), 'b': array('q', [20, 21, 22, 23])}
+
+
+def test_indexToFile():
+    from language import LANGUAGES
+    from spell_checker import SpellChecker
+    from twitterir import TwitterIR
+
+    tweets = [('1', 'wall wall wall border'), ('2', 'border mexico'), ('3', 'mexico wall')]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tweets.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            for id, tweet in tweets:
+                f.write(f'x\t{id}\tx\tx\t{tweet}\n')
+
+        words = ['wall', 'border', 'mexico']
+        twitterIR = TwitterIR(spellCheckers={
+            lang: SpellChecker(words, {word: 1 for word in words}) for lang in LANGUAGES})
+        # the tweets indexed before are not in the index file
+        twitterIR.index(path, maxDocs=2)
+        twitterIR.addDocuments([('4', 'wall')])
+
+        # every (term, tweet) pair counts as one posting, however often the
+        # term occurs in the tweet
+        estimates = []
+        estimateSize = spimi.estimateSize
+        spimi.estimateSize = lambda numTerms, numPostings: \
+            estimates.append(numPostings) or estimateSize(numTerms, numPostings)
+        try:
+            twitterIR.indexToFile(path, os.path.join(directory, 'tweets.idx'))
+        finally:
+            spimi.estimateSize = estimateSize
+        assert estimates[-1] == sum(len(set(twitterIR.clean(tweet))) for _, tweet in tweets)
+
+        assert list(twitterIR.docIds) == ['1', '2', '3']
+        assert twitterIR.booleanQuery('wall') == ['1', '3']
+        assert twitterIR.booleanQuery('NOT wall') == ['2']
+        twitterIR.indices.close()
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f'{name} passed')
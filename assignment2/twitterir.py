@@ -1,78 +1,277 @@
 import sys
+import os
 import csv
-import string
-import re
-import emoji
+import multiprocessing
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, MutableMapping
 import nltk
 #nltk.download('stopwords')
 from nltk.tokenize import TweetTokenizer
 from nltk.corpus import stopwords
-from spell_checker import SpellChecker
+from spell_checker import SpellChecker, CorrectionCache
+from normalizer import TweetNormalizer
+from language import LANGUAGES, LanguageDetector
+from indexfile import IndexFile
+from postings import CompressedPostings
+from segments import SegmentedIndex
+from positions import Positions
+import spimi
+import booleanquery
 
 class Index:
     """
     This data structure is the value of the indices dictionary.
     """
-    def __init__(self, size, pointer2postingsList):
+    def __init__(self, size, postings, positions=None):
         # size of the postings list
-        
         self.size = size
-        # pointer to the head of the postings list
-        self.pointer2postingsList = pointer2postingsList
+        # the postings list: a sorted array of internal document numbers
+        self.postings = postings
+        # the `Positions` of the term in each tweet of the postings list,
+        # if the index is positional
+        self.positions = positions
 
-class PostingNode:
+# The `TwitterIR` used by the worker processes of `TwitterIR._getTokens2idsParallel`
+_poolTwitterIR = None
+
+
+def _initPoolTwitterIR(twitterIR):
+    global _poolTwitterIR
+    _poolTwitterIR = twitterIR
+
+
+def _indexShard(shard):
+    return _poolTwitterIR._indexShard(*shard)
+
+
+class LazyDict(MutableMapping):
+    """
+    A dictionary which is only built when it is first used, e.g. the mapping
+    from tweetIDs to document numbers of an opened index, which most queries
+    never need.
+    """
+    def __init__(self, build):
+        """
+        :param build: a function returning the dictionary
+        """
+        self.build = build
+        self.dict = None
+
+    def _dict(self):
+        if self.dict is None:
+            self.dict = self.build()
+        return self.dict
+
+    def __getitem__(self, key):
+        return self._dict()[key]
+
+    def __setitem__(self, key, value):
+        self._dict()[key] = value
+
+    def __delitem__(self, key):
+        del self._dict()[key]
+
+    def __iter__(self):
+        return iter(self._dict())
+
+    def __len__(self):
+        return len(self._dict())
+
+
+class DocIds:
+    """
+    The tweetIDs of an opened index file by document number. They are read
+    from the file when they are looked up instead of being decoded up front;
+    tweets added later are appended in memory.
+    """
+    def __init__(self, indexFile):
+        self.indexFile = indexFile
+        self.added = []
+
+    def __getitem__(self, docNum):
+        if docNum < self.indexFile.numDocs:
+            return self.indexFile.docId(docNum)
+        return self.added[docNum - self.indexFile.numDocs]
+
+    def __len__(self):
+        return self.indexFile.numDocs + len(self.added)
+
+    def __iter__(self):
+        yield from (self.indexFile.docId(docNum) for docNum in range(self.indexFile.numDocs))
+        yield from self.added
+
+    def append(self, id):
+        self.added.append(id)
+
+
+class SpellCheckers(Mapping):
     """
-    Linked list for the postings list
+    The `SpellChecker` of each language, which is only created when it is
+    first used, so that e.g. opening a saved index does not load the
+    dictionaries.
     """
-    def __init__(self, val):
-        self.val = val
-        self.next = None
+    def __init__(self, create, spellCheckers=None):
+        """
+        :param create: a function creating the `SpellChecker` of a language
+        :param spellCheckers: optionally the already created `SpellChecker`s
+        """
+        self.create = create
+        self.spellCheckers = dict(spellCheckers or {})
+
+    def __getitem__(self, lang):
+        try:
+            return self.spellCheckers[lang]
+        except KeyError:
+            if lang not in LANGUAGES:
+                raise
+        spellChecker = self.spellCheckers[lang] = self.create(lang)
+        return spellChecker
+
+    def __iter__(self):
+        return iter(LANGUAGES)
+
+    def __len__(self):
+        return len(LANGUAGES)
+
+
+class DocumentStore:
+    """
+    Read-only mapping from tweetIDs to tweets which does not hold the tweets
+    in memory. Only the byte offset of each tweet's line in the tweets.csv
+    file is kept, and a tweet is read from disk when it is looked up.
+
+    The offsets are recorded while `items` streams through the file for the
+    first time, so the store can be filled in the same pass that indexes the
+    tweets.
+    """
+    def __init__(self, path, offsets=None):
+        self.path = path
+        # the byte offsets of the lines of the tweets in the file
+        self.offsets = {} if offsets is None else offsets
+        # tweets which were added later and are not in the file
+        self.added = {}
+
+    @staticmethod
+    def _parse(line):
+        """Splits a raw line of the file into its (tweetID, tweet) columns."""
+        line = next(csv.reader([line.decode('utf-8')], delimiter='\t'))
+        return line[1], line[4]
+
+    def items(self):
+        """
+        Generator over the (tweetID, tweet) pairs in the file, recording the
+        offset of each line on the way.
+        """
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                id, doc = self._parse(line)
+                self.offsets[id] = offset
+                offset += len(line)
+                yield id, doc
+
+    def __getitem__(self, id):
+        if id in self.added:
+            return self.added[id]
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[id])
+            return self._parse(f.readline())[1]
+
+    def __setitem__(self, id, doc):
+        self.added[id] = doc
+
+    def __delitem__(self, id):
+        if id in self.added:
+            del self.added[id]
+        else:
+            del self.offsets[id]
+
+    def __contains__(self, id):
+        return id in self.added or id in self.offsets
+
+    def __iter__(self):
+        yield from self.offsets
+        yield from (id for id in self.added if id not in self.offsets)
+
+    def __len__(self):
+        return len(self.offsets) + sum(1 for id in self.added if id not in self.offsets)
+
 
 class TwitterIR(object):
     """
     Main Class for the information retrieval task.
     """
-    __slots__ = 'id2doc', 'tokenizer', 'unicodes2remove', 'indices', \
-                'urlregex', 'punctuation', 'emojis', 'stop_words', \
-                'engSpellCheck', 'gerSpellCheck', 'correctedTerms'
+    # For the sake of time and presenting functionality, we're limiting the number
+    # of tweets that we are indexing by default.
+    MAX_DOCS_TO_INDEX = 25
 
-    def __init__(self):
+    # intersect gallops through the longer postings list when it is at least
+    # this many times longer than the shorter one
+    GALLOP_RATIO = 6
+
+    __slots__ = 'id2doc', 'tokenizer', 'normalizer', 'indices', 'stop_words', \
+                'spellCheckers', 'languageDetector', 'correctedTerms', \
+                'correctionCache', 'docIds', 'docNums', 'deleted', 'tweetsPath', \
+                'compressPostings', 'positional'
+
+    def __init__(self, correctionCacheSize=100000, correctionCachePath=None,
+                 compressPostings=False, positional=False, spellCheckers=None):
+        """
+        :param correctionCacheSize: the maximum number of spelling corrections
+        which are remembered between calls of `spellCheck`
+        :param correctionCachePath: optional file the corrections are loaded from
+        and saved to (see `saveCorrections`), so a reindex can reuse them
+        :param compressPostings: whether to store the postings lists as
+        `CompressedPostings` (delta + variable-byte encoded blocks), which
+        takes a fraction of the memory but is slower to read
+        :param positional: whether to also record the positions of the tokens
+        in the tweets, which phrase and NEAR queries need (see `booleanQuery`);
+        positions are only built by `index` and are not saved by `save`
+        :param spellCheckers: optionally the `SpellChecker` of each language
+        (see `language.LANGUAGES`); the missing ones are created from the
+        default dictionaries when they are first used
+        """
         # the original mapping from the id's to the tweets, 
-        # which is kept until the end to index the tweets
+        # which is kept until the end to index the tweets (a `DocumentStore`
+        # reading them from disk instead when indexing in streaming mode)
         self.id2doc = {}
         self.tokenizer = TweetTokenizer()
-        # bunch of punctuation unicodes which are not in 'string.punctuation'
-        self.unicodes2remove = [
-            # all kinds of quotes
-            u'\u2018', u'\u2019', u'\u201a', u'\u201b', u'\u201c', \
-            u'\u201d', u'\u201e', u'\u201f', u'\u2014',
-            # all kinds of hyphens
-            u'\u002d', u'\u058a', u'\u05be', u'\u1400', u'\u1806', \
-            u'\u2010', u'\u2011', u'\u2012', u'\u2013',
-            u'\u2014', u'\u2015', u'\u2e17', u'\u2e1a', u'\u2e3a', \
-            u'\u2e3b', u'\u2e40', u'\u301c', u'\u3030',
-            u'\u30a0', u'\ufe31', u'\ufe32', u'\ufe58', u'\ufe63', \
-            u'\uff0d', u'\u00b4'
-        ]
         # the resulting data structure which has the tokens as keys
         # and the Index objects as values
         self.indices = {}
-        # regex to match urls (taken from the web)
-        self.urlregex = re.compile('http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]'
-                                   '|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
-        # keep @ to be able to recognize usernames
-        self.punctuation = string.punctuation.replace('@', '') + \
-                           ''.join(self.unicodes2remove)
-        self.punctuation = self.punctuation.replace('#', '')
-        self.punctuation = self.punctuation.replace('…', '')
-        # a bunch of emoji unicodes
-        self.emojis = ''.join(emoji.UNICODE_EMOJI)
-        self.emojis = self.emojis.replace('#', '')
+        # the postings lists hold dense internal document numbers instead of
+        # tweetIDs; docIds maps them back to the tweetIDs, docNums the other way
+        self.docIds = []
+        self.docNums = {}
+        # the document numbers of deleted and replaced tweets, which stay in
+        # docIds but not in docNums
+        self.deleted = set()
+        # the path of the last indexed tweets.csv file
+        self.tweetsPath = None
+        self.compressPostings = compressPostings
+        self.positional = positional
         # combined english and german stop words
         self.stop_words = set(stopwords.words('english') + stopwords.words('german'))
-        self.engSpellCheck = self._initSpellCheck('english')
-        self.gerSpellCheck = self._initSpellCheck('german')
+        # removes urls, punctuation, digits and emojis, tokenizes and removes
+        # the stop words (see `normalizer`)
+        self.normalizer = TweetNormalizer(self.tokenizer, self.stop_words)
+        self.spellCheckers = SpellCheckers(self._initSpellCheck, spellCheckers)
+        # stop word sets and dictionaries of both languages (see `language`)
+        self.languageDetector = LanguageDetector(self.tokenizer, self.normalizer,
+                                                 self.spellCheckers)
         self.correctedTerms = []    # For demonstration purposes only
+        # tweets repeat the same misspellings over and over, so corrections
+        # are memoized per (language, token)
+        self.correctionCache = CorrectionCache(correctionCacheSize, correctionCachePath)
+
+    @property
+    def engSpellCheck(self):
+        return self.spellCheckers['english']
+
+    @property
+    def gerSpellCheck(self):
+        return self.spellCheckers['german']
 
     def clean(self, s):
         """
@@ -83,16 +282,7 @@ class TwitterIR(object):
         :param s the string (tweet) to clean
         :return: returns a list of cleaned tokens
         """
-        s = ' '.join(s.replace('[NEWLINE]', '').split())
-        s = ' '.join(s.replace('…', '...').split())
-        s = self.urlregex.sub('', s).strip()
-        s = s.translate(str.maketrans('', '', self.punctuation + string.digits \
-                                      + self.emojis)).strip()
-        s = ' '.join(s.split())
-        s = s.lower()
-        s = self.tokenizer.tokenize(s)
-        s = [w for w in s if w not in self.stop_words]
-        return s
+        return self.normalizer.clean(s)
 
     def _detectLanguage(self, context):
         """
@@ -103,30 +293,7 @@ class TwitterIR(object):
         :param context: 
         :return: the determined language of the tweet
         """
-        tokens = self.tokenizer.tokenize(context)
-        stopsEN = [token for token in tokens if token in stopwords.words('english')]
-        stopsDE = [token for token in tokens if token in stopwords.words('german')]
-
-        # Chooses a language based on the number of stopwords
-        if len(stopsEN) > len(stopsDE):
-            return 'english'
-        elif len(stopsDE) > len(stopsEN):
-            return 'german'
-        # If that comparison isn't conclusive, it compares the number of words
-        # that exist in the respective dictionaries.
-        else:
-            cleaned = self.clean(context)
-
-            wordsEN = [token for token in cleaned if self.engSpellCheck.in_dictionary(token)]
-            wordsDE = [token for token in cleaned if self.gerSpellCheck.in_dictionary(token)]
-
-            if len(wordsEN) > len(wordsDE):
-                return 'english'
-            elif len(wordsDE) > len(wordsEN):
-                return 'german'
-            # If it still cannot decide, it defaults to the more common language: English
-            else:
-                return 'english'
+        return self.languageDetector.detect(context)
 
     @staticmethod
     def _getGermanFreqDist():
@@ -159,108 +326,383 @@ class TwitterIR(object):
 
             return fdist
 
-    def _getTokens2ids(self):
+    def _processTweet(self, doc):
         """
-        Indexes all the tokens and maps them to a list of tweetIDs.
-        :return: a dictionary visualized as {token: [tweetID1, tweetID2, ...]}
+        Cleans and tokenizes a tweet, detects its language and spellchecks
+        every token that is not in the dictionary of that language.
+        :param doc: the tweet
+        :return: the list of (corrected) tokens of the tweet
+        """
+        doc = self.clean(doc)
+        language = self._detectLanguage(' '.join(doc))
+
+        tokens = []
+        for t in doc:
+            if language == 'english':
+                # We are specifically excluding handles and hashtags
+                # Nor do we want to spellcheck words that are in the dictionary
+                if t[0] not in ['@', '#'] and not self.engSpellCheck.in_dictionary(t):
+                    original = t
+                    t = self.spellCheck(t, language)
+
+                    # Collects corrected words for demonstration purposes
+                    if original != t:
+                        self.correctedTerms.append((original, t))
+
+            elif language == 'german':
+                if t[0] not in ['@', '#'] and not self.gerSpellCheck.in_dictionary(t):
+                    original = t
+                    t = self.spellCheck(t, language)
+
+                    if original != t:
+                        self.correctedTerms.append((original, t))
+
+            tokens.append(t)
+
+        return tokens
+
+    def _getTokens2ids(self, tweets, maxDocs=None, positions=None):
+        """
+        Indexes all the tokens and maps them to the document numbers of the
+        tweets containing them. The tweets are processed one at a time, so
+        `tweets` can be a generator streaming them from disk.
+        :param tweets: an iterable of (tweetID, tweet) pairs
+        :param maxDocs: the maximum number of tweets to index, None for all
+        :param positions: optionally a dictionary the positions of the tokens
+        are added to (see `_addPositions`)
+        :return: a dictionary visualized as {token: array([docNum1, docNum2, ...])}
+        with every postings list sorted in ascending order
         """
-        # For the sake of time and presenting functionality, we're limiting the number
-        # of tweets that we are indexing.
-        MAX_DOCS_TO_INDEX = 25
         i = 0
 
         tokens2id = {}
 
-        for id, doc in self.id2doc.items():
-            doc = self.clean(doc)
-            language = self._detectLanguage(' '.join(doc))
+        for id, doc in tweets:
+            # Stop after maxDocs iterations
+            if maxDocs is not None and i >= maxDocs:
+                break
+            i += 1
+
+            docNum = self._docNum(id)
 
-            # This print statement is for demonstration purposes 
-            print(language, doc)
+            tokens = self._processTweet(doc)
+            for t in tokens:
+                self._addPosting(tokens2id, t, docNum)
+            if positions is not None:
+                self._addPositions(positions, tokens, docNum)
 
-            for t in doc:
-                if language == 'english':
-                    # We are specifically excluding handles and hashtags
-                    # Nor do we want to spellcheck words that are in the dictionary
-                    if t[0] not in ['@', '#'] and not self.engSpellCheck.in_dictionary(t):
-                        original = t
-                        t = self.spellCheck(t, language)
+        return tokens2id
 
-                        # Collects corrected words for demonstration purposes
-                        if original != t:
-                            self.correctedTerms.append((original, t))
+    @staticmethod
+    def _addPosting(tokens2id, t, docNum):
+        """
+        Adds a document number to the postings list of a token, keeping the
+        postings list sorted and free of duplicates.
+        :param tokens2id: the dictionary of tokens and their postings lists
+        :param t: the token
+        :param docNum: the document number
+        :return: whether the document number was added, False if it was
+        already in the postings list
+        """
+        postings = tokens2id.get(t)
+        if postings is None:
+            tokens2id[t] = array('q', [docNum])
+        # document numbers are handed out in increasing order, so the
+        # postings list stays sorted and free of duplicates by only
+        # comparing against its last entry
+        elif postings[-1] < docNum:
+            postings.append(docNum)
+        # unless a tweetID is seen again (e.g. when indexing twice)
+        elif postings[-1] > docNum:
+            k = bisect_left(postings, docNum)
+            if postings[k] == docNum:
+                return False
+            postings.insert(k, docNum)
+        else:
+            return False
+        return True
 
-                elif language == 'german':
-                    if t[0] not in ['@', '#'] and not self.gerSpellCheck.in_dictionary(t):
-                        original = t
-                        t = self.spellCheck(t, language)
+    @staticmethod
+    def _addPositions(tokens2positions, tokens, docNum):
+        """
+        Records the positions of the tokens of a tweet.
+        :param tokens2positions: a dictionary visualized as
+        {token: {docNum: array([position1, position2, ...])}}
+        :param tokens: the tokens of the tweet
+        :param docNum: the document number of the tweet
+        """
+        positions = {}
+        for position, t in enumerate(tokens):
+            try:
+                positions[t].append(position)
+            except KeyError:
+                positions[t] = array('I', [position])
+        # a tweet indexed again replaces its positions
+        for t, tokenPositions in positions.items():
+            tokens2positions.setdefault(t, {})[docNum] = tokenPositions
 
-                        if original != t:
-                            self.correctedTerms.append((original, t))
+    def _getTokens2idsParallel(self, path, workers, maxDocs=None, positions=None):
+        """
+        Does the same as `_getTokens2ids` on the tweets of a file, but splits
+        the file into byte ranges (shards) and indexes them in a pool of
+        `workers` processes. Each process builds the postings lists of its
+        shard with its own document numbers, and the partial postings lists
+        are translated and merged in file order, so the result is the same as
+        indexing the file serially (as long as no tweetID occurs twice).
+        :param path: the path to the tweets.csv file
+        :param workers: the number of processes to use
+        :param maxDocs: the maximum number of tweets to index, None for all
+        :param positions: optionally a dictionary the positions of the tokens
+        are added to (see `_addPositions`)
+        :return: a dictionary visualized as {token: array([docNum1, docNum2, ...])}
+        """
+        global _poolTwitterIR
+        shards = self._shardFile(path, workers, maxDocs)
+        if 'fork' in multiprocessing.get_all_start_methods():
+            _poolTwitterIR = self
+            pool = multiprocessing.get_context('fork').Pool(workers)
+        else:
+            pool = multiprocessing.Pool(workers, initializer=_initPoolTwitterIR,
+                                        initargs=(self,))
+        try:
+            with pool:
+                partials = pool.map(_indexShard, [(path, start, end) for start, end in shards])
+        finally:
+            _poolTwitterIR = None
 
-                if t in tokens2id.keys():
-                    tokens2id[t].add(id)
+        tokens2id = {}
+        for ids, offsets, partial, partialPositions, correctedTerms, corrections in partials:
+            # translate the document numbers of the shard into the global ones
+            docNums = array('q', (self._docNum(id) for id in ids))
+            if isinstance(self.id2doc, DocumentStore):
+                self.id2doc.offsets.update(zip(ids, offsets))
+            self.correctedTerms.extend(correctedTerms)
+            # the workers spell checked with copies of the cache
+            for lang, token, correction in corrections:
+                self.correctionCache.put(lang, token, correction)
+
+            for t, localPostings in partial.items():
+                postings = tokens2id.get(t)
+                translated = array('q', (docNums[d] for d in localPostings))
+                # the shards come in file order, so the translated postings
+                # usually all go to the end of the postings list
+                if postings is None:
+                    tokens2id[t] = translated
+                elif postings[-1] < translated[0] and all(
+                        a < b for a, b in zip(translated, translated[1:])):
+                    postings.extend(translated)
                 else:
-                    # a set is used to avoid multiple entries of the same tweetID
-                    tokens2id[t] = {id}
+                    for docNum in translated:
+                        self._addPosting(tokens2id, t, docNum)
 
-            # Break the loop after MAX_DOCS_TO_INDEX iterations
-            i += 1
-            if i >= MAX_DOCS_TO_INDEX:
-                break
+            if positions is not None:
+                for t, localPositions in partialPositions.items():
+                    positions.setdefault(t, {}).update(
+                        (docNums[d], tokenPositions) for d, tokenPositions in localPositions.items())
 
         return tokens2id
 
-    def index(self, path):
+    @staticmethod
+    def _shardFile(path, n, maxDocs=None):
+        """
+        Splits a file into (at most) n byte ranges of about the same size
+        which start and end at line boundaries.
+        :param path: the path to the file
+        :param n: the number of shards
+        :param maxDocs: only split the first maxDocs lines, None for all
+        :return: a list of (start, end) byte offsets
+        """
+        with open(path, 'rb') as f:
+            if maxDocs is None:
+                size = os.fstat(f.fileno()).st_size
+            else:
+                size = sum(len(line) for line, _ in zip(f, range(maxDocs)))
+
+            bounds = [0]
+            for k in range(1, n):
+                f.seek(max(k * size // n, bounds[-1]))
+                # move to the beginning of the next line
+                if f.tell() > 0:
+                    f.seek(f.tell() - 1)
+                    f.readline()
+                bounds.append(min(f.tell(), size))
+            bounds.append(size)
+
+        return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+    def _indexShard(self, path, start, end):
+        """
+        Indexes the tweets in a byte range of a file, numbering them from 0.
+        :param path: the path to the tweets.csv file
+        :param start: the offset of the first line of the shard
+        :param end: the offset after the last line of the shard
+        :return: the tweetIDs and line offsets of the tweets in the shard,
+        the postings lists of the shard, the positions of its tokens (None if
+        the index is not positional), the corrected terms and the
+        (language, token, correction) triples added to the correction cache
+        """
+        ids = []
+        offsets = array('q')
+        tokens2id = {}
+        positions = {} if self.positional else None
+        correctedTerms = len(self.correctedTerms)
+        self.correctionCache.track()
+
+        with open(path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            while offset < end:
+                line = f.readline()
+                if not line:
+                    break
+                id, doc = DocumentStore._parse(line)
+                docNum = len(ids)
+                ids.append(id)
+                offsets.append(offset)
+                offset += len(line)
+
+                tokens = self._processTweet(doc)
+                for t in tokens:
+                    self._addPosting(tokens2id, t, docNum)
+                if positions is not None:
+                    self._addPositions(positions, tokens, docNum)
+
+        return ids, offsets, tokens2id, positions, self.correctedTerms[correctedTerms:], \
+            self.correctionCache.tracked()
+
+    def index(self, path, streaming=False, maxDocs=MAX_DOCS_TO_INDEX, workers=1):
         """
         1) call the method to read the file in
         2) iterate over the original datastructure id2doc which keeps the mapping
         of the tweet ids to the actual tweets and do:
             2a) preprocessing of the tweets
-            2b) create a mapping from each token to its postings list (tokens2id)
+            2b) append the tweet to the postings list of each of its tokens
+            (tokens2id), which are kept sorted in compact integer arrays
         3) iterate over the just created mapping of tokens to their respective 
-        postings lists (tokens2id) and do:
-            3a) calculate the size of the postingslist
-            3b) sort the postings list numerically in ascending order
-            3c) create a linked list for the postings list
-            3d) create the Index object with the size of the postings list and
-            the pointer to the postings list - add to the resulting datastructure 
+        postings lists (tokens2id) and create the Index object with the size of
+        the postings list and the postings list itself - add to the resulting
+        datastructure
+
+        In streaming mode, the file is not read into memory in step 1. Instead,
+        id2doc becomes a `DocumentStore` which only remembers where each tweet
+        is in the file, and step 2 reads the tweets one at a time while
+        indexing them.
+
+        With more than one worker, step 2 is split across processes, see
+        `_getTokens2idsParallel`.
+
+        If the index is positional, step 2 also records the positions of the
+        tokens in every tweet, and step 3 stores them alongside the postings.
         :param path: the path to the tweets.csv file
+        :param streaming: whether to stream the tweets instead of loading them
+        :param maxDocs: the maximum number of tweets to index, None for all
+        :param workers: the number of processes to index with
         :return:
         """
-        self.initId2doc(path)
-        self._indexPostings(self._getTokens2ids())
+        self.tweetsPath = path
+        if streaming:
+            self.id2doc = DocumentStore(path)
+        else:
+            self.initId2doc(path)
 
-    def _indexPostings(self, tokens2id):
+        positions = {} if self.positional else None
+        if workers > 1:
+            tokens2id = self._getTokens2idsParallel(path, workers, maxDocs, positions)
+        else:
+            tokens2id = self._getTokens2ids(self.id2doc.items(), maxDocs, positions)
+        self._indexPostings(tokens2id, positions)
+
+    def indexToFile(self, path, indexPath, memoryBudget=64 * 2**20, maxDocs=None):
+        """
+        Indexes a tweets.csv file which does not need to fit into memory
+        (SPIMI, see `spimi`): the tweets are streamed, postings are collected
+        in memory until their estimated size exceeds `memoryBudget`, and each
+        time that happens they are flushed to a sorted segment file. In the
+        end the segments are merged into an index file (see `save`), which is
+        then opened in place of `indices`.
+        :param path: the path to the tweets.csv file
+        :param indexPath: the path of the index file to build
+        :param memoryBudget: the approximate number of bytes the postings
+        lists may take in memory
+        :param maxDocs: the maximum number of tweets to index, None for all
+        :return:
+        """
+        if self.positional:
+            raise ValueError('Positional indexes can only be built in memory with index().')
+        self.tweetsPath = path
+        self.id2doc = DocumentStore(path)
+        # the index file only holds the tweets of this file, numbered from 0
+        self.docIds = []
+        self.docNums = {}
+        self.deleted = set()
+        segmentPaths = []
+        tokens2id = {}
+        numPostings = 0
+
+        try:
+            for i, (id, doc) in enumerate(self.id2doc.items()):
+                if maxDocs is not None and i >= maxDocs:
+                    break
+                docNum = self._docNum(id)
+                for t in self._processTweet(doc):
+                    # repeated tokens of a tweet only have one posting
+                    if self._addPosting(tokens2id, t, docNum):
+                        numPostings += 1
+
+                if spimi.estimateSize(len(tokens2id), numPostings) > memoryBudget:
+                    segmentPaths.append(f'{indexPath}.segment{len(segmentPaths)}')
+                    spimi.writeSegment(segmentPaths[-1], tokens2id)
+                    tokens2id = {}
+                    numPostings = 0
+
+            if tokens2id:
+                segmentPaths.append(f'{indexPath}.segment{len(segmentPaths)}')
+                spimi.writeSegment(segmentPaths[-1], tokens2id)
+                tokens2id = {}
+
+            docOffsets = [self.id2doc.offsets[id] for id in self.docIds]
+            IndexFile.write(indexPath, spimi.mergeSegments(segmentPaths), self.docIds,
+                            docOffsets, path)
+        finally:
+            for segmentPath in segmentPaths:
+                if os.path.exists(segmentPath):
+                    os.remove(segmentPath)
+
+        self._openIndexFile(indexPath)
+
+    def _indexPostings(self, tokens2id, positions=None):
         """
-        Creates an `Index` object, which contains a pointer to to the beginning
-        of a postings list for every key/token in the `tokens2id` dictionary. It
-        stores this in the master inverted index `self.indices`.
+        Creates an `Index` object, which holds the sorted postings list for
+        every key/token in the `tokens2id` dictionary as an array of document
+        numbers. It stores this in the master inverted index `self.indices`.
 
         :param tokens2id: 
+        :param positions: optionally the positions of the tokens in the tweets
+        (see `_addPositions`), stored as `Positions` in postings list order
         """
-        for t, ids in tokens2id.items():
-            # size of the postings list which belongs to token t
-            size = len(ids)
-            # sort in ascending order
-            ids = sorted(ids)
-            # use the first (and smallest) tweetID to be the head node of the 
-            # linked list
-            node = PostingNode(ids[0])
-            # keep reference to the head of the linked list since node variable
-            # is going to be overridden
-            pointer = node
-            for id in ids[1:]:
-                # create further list items
-                n = PostingNode(id)
-                # and append to the linked list
-                node.next = n
-                # step further
-                node = n
-            # create the index object with size of the postings list 
-            # and a link to the postings list itself
-            i = Index(size, pointer)
-            self.indices[t] = i
+        for t, postings in tokens2id.items():
+            termPositions = None
+            if positions is not None:
+                termPositions = Positions(positions[t][docNum] for docNum in postings)
+            if self.compressPostings:
+                postings = CompressedPostings(postings)
+            # create the index object with size of the postings list
+            # and the postings list itself
+            self.indices[t] = Index(len(postings), postings, termPositions)
+
+    def _docNum(self, id):
+        """
+        Returns the internal document number of a tweetID, assigning the next
+        free one if the tweet has not been seen before.
+        :param id: the tweetID
+        :return: the dense document number used in the postings lists
+        """
+        try:
+            return self.docNums[id]
+        except KeyError:
+            self.docNums[id] = len(self.docIds)
+            self.docIds.append(id)
+            return self.docNums[id]
 
     def initId2doc(self, path):
         """
@@ -293,43 +735,104 @@ class TwitterIR(object):
 
         return SpellChecker(SpellChecker.DEFAULT_DICTIONARIES[lang], fdist=freq_dist)
 
-    def intersect(self, pointer1, pointer2):
-        """
-        Computes the intersection for two postings lists.
-        :param pointer1: first postings list
-        :param pointer2: second postings list
-        :return: returns the intersection 
-        """
-        # create temporary head node
-        node = PostingNode('tmp')
-        # keep reference to head node
-        rvalpointer = node
-        while pointer1 and pointer2:
-            val1 = pointer1.val
-            val2 = pointer2.val
-            # only append to the linked list if the values are equal
+    @staticmethod
+    def intersect(postings1, postings2):
+        """
+        Computes the intersection for two postings lists. If one list is
+        much longer than the other (see `GALLOP_RATIO`), the elements of the
+        shorter one are searched for in the longer one by galloping, so the
+        long list is skipped through instead of scanned. Otherwise both lists
+        are merged linearly.
+
+        If the longer list is compressed, its skip table is used to only
+        decode the blocks which can contain values of the shorter one.
+        :param postings1: first postings list
+        :param postings2: second postings list
+        :return: returns the intersection as a postings list
+        """
+        if len(postings1) > len(postings2):
+            postings1, postings2 = postings2, postings1
+        if isinstance(postings2, CompressedPostings):
+            return postings2.intersect(postings1)
+        if isinstance(postings1, CompressedPostings):
+            postings1 = postings1.toArray()
+        if len(postings2) >= TwitterIR.GALLOP_RATIO * len(postings1):
+            return TwitterIR._gallopIntersect(postings1, postings2)
+        return TwitterIR._mergeIntersect(postings1, postings2)
+
+    @staticmethod
+    def _mergeIntersect(postings1, postings2):
+        """
+        Computes the intersection for two postings lists by walking
+        both of them in parallel.
+        :param postings1: first postings list
+        :param postings2: second postings list
+        :return: returns the intersection as a postings list
+        """
+        rval = array('q')
+        i = j = 0
+        len1 = len(postings1)
+        len2 = len(postings2)
+        while i < len1 and j < len2:
+            val1 = postings1[i]
+            val2 = postings2[j]
+            # only append to the result if the values are equal
             if val1 == val2:
-                n = PostingNode(val1)
-                node.next = n
-                node = n
-                pointer1 = pointer1.next
-                pointer2 = pointer2.next
-            # otherwise the postings list with the smaller value 
+                rval.append(val1)
+                i += 1
+                j += 1
+            # otherwise the postings list with the smaller value
             # at the current index moves one forward
             elif val1 > val2:
-                pointer2 = pointer2.next
-            elif val1 < val2:
-                pointer1 = pointer1.next
-        # return from the second element on since the first was the temporary one
-        return rvalpointer.next
+                j += 1
+            else:
+                i += 1
+        return rval
+
+    @staticmethod
+    def _gallopIntersect(short, long):
+        """
+        Computes the intersection for a short and a long postings list. For
+        every value of the short list the long list is probed at exponentially
+        growing distances from the current position (1, 2, 4, ...) until a
+        value at least as large is found, and the value is then binary searched
+        within the last step. This costs O(len(short) * log(len(long) / len(short)))
+        comparisons instead of O(len(short) + len(long)).
+        :param short: the shorter postings list
+        :param long: the longer postings list
+        :return: returns the intersection as a postings list
+        """
+        rval = array('q')
+        lo = 0
+        end = len(long)
+        for val in short:
+            # gallop to find an upper bound for val
+            step = 1
+            hi = lo
+            while hi < end and long[hi] < val:
+                lo = hi + 1
+                hi += step
+                step *= 2
+            # binary search between the last two probes
+            lo = bisect_left(long, val, lo, min(hi + 1, end))
+            if lo == end:
+                break
+            if long[lo] == val:
+                rval.append(val)
+                lo += 1
+        return rval
 
-    def _query(self, term, lang):
+    def _query(self, term, lang, indices=None):
         """
         Internal method to query for one term.
         :param: term the word which was queried for 
         :param: lang the language of the term for spellchecking
+        :param: indices the index to look the term up in, `self.indices` by default
         :return: returns the Index object of the corresponding query term
         """
+        if indices is None:
+            indices = self.indices
+
         if lang == 'english':
             if not self.engSpellCheck.in_dictionary(term):
                 term = self.spellCheck(term, lang)
@@ -338,9 +841,9 @@ class TwitterIR(object):
                 term = self.spellCheck(term, lang)
 
         try:
-            return self.indices[term]
+            return indices[term]
         except KeyError:
-            return Index(0, PostingNode(''))
+            return Index(0, array('q'))
 
     def query(self, *arg):
         """
@@ -354,16 +857,21 @@ class TwitterIR(object):
         print(language)  # For demonstration
 
         # at this point it's a list of Index objects
-        pointers = [self._query(t, language) for t in arg if t not in self.stop_words]
+        # all terms are looked up in the same state of the index, even if
+        # it is being updated at the same time
+        indices = self.indices
+        if isinstance(indices, SegmentedIndex):
+            indices = indices.snapshot()
+        pointers = [self._query(t, language, indices) for t in arg if t not in self.stop_words]
         # here the Index objects get sorted by the size of the 
         # postings list they point to
         pointers = sorted(pointers, key=lambda i: i.size)
-        # here it becomes a list of pointers to the postings lists
-        pointers = [i.pointer2postingsList for i in pointers]
-        # first pointer
-        intersection = pointers[0]
-        # step through the pointers
-        for p in pointers[1:]:
+        # here it becomes a list of the postings lists
+        postings = [i.postings for i in pointers]
+        # first postings list
+        intersection = postings[0]
+        # step through the postings lists
+        for p in postings[1:]:
             # intersection between the new postings list and the so far
             # computed intersection
             intersection = self.intersect(intersection, p)
@@ -371,21 +879,173 @@ class TwitterIR(object):
             # no need to continue
             if not intersection:
                 return []
-        # convert the resulting intersection to a normal list
-        rval = []
-        pointer = intersection
-        while pointer:
-            rval.append(pointer.val)
-            pointer = pointer.next
+        # map the document numbers back to tweetIDs
+        return sorted(self.docIds[docNum] for docNum in intersection)
 
-        return rval
+    def booleanQuery(self, query):
+        """
+        Query method for boolean queries with AND, OR, NOT and parentheses,
+        e.g. 'trump AND (wall OR mauer) AND NOT mexico' (see `booleanquery`).
+        If the index is positional, "quoted phrases" and `term1 NEAR/k term2`
+        can be used as well, e.g. '"campaign finance" AND reform NEAR/3 bill'.
+        Terms are spell checked like for `query` and stop words are ignored.
+        :param query: the query string
+        :return: returns a list of tweetIDs which match the query
+        """
+        node = booleanquery.parse(query)
+        language = self._detectLanguage(' '.join(booleanquery.terms(node)))
+
+        indices = self.indices
+        if isinstance(indices, SegmentedIndex):
+            indices = indices.snapshot()
+
+        def lookup(term):
+            if term in self.stop_words:
+                return None
+            return self._query(term, language, indices)
+
+        docNums = booleanquery.evaluate(node, lookup, self._liveDocNums())
+        return sorted(self.docIds[docNum] for docNum in docNums)
+
+    def _liveDocNums(self):
+        """
+        Returns the sorted document numbers of the tweets in the index. The
+        numbers of deleted and replaced tweets stay in `docIds` (their
+        postings are only purged when their segment is merged), so unless
+        there are none, they are left out.
+        """
+        if not self.deleted:
+            return range(len(self.docIds))
+        return [docNum for docNum in range(len(self.docIds)) if docNum not in self.deleted]
 
     def spellCheck(self, term, lang):
-        """Runs the relevant spellchecker method."""
-        return {'english': self.engSpellCheck,
-                'german': self.gerSpellCheck}[lang].spell_check(term)
+        """Runs the relevant spellchecker method, unless the term was corrected before."""
+        spellChecker = self.spellCheckers[lang]
+        return self.correctionCache.get_or_compute(lang, term, spellChecker.spell_check)
+
+    def saveCorrections(self, path=None):
+        """
+        Saves the memoized spelling corrections so that a later run can reuse them.
+        :param path: the file to save to, defaults to `correctionCachePath`
+        """
+        self.correctionCache.save(path)
+
+    def addDocuments(self, tweets, maxBufferedDocs=1000, mergeFactor=4):
+        """
+        Adds tweets to the index without rebuilding it. The first call turns
+        `indices` into a `SegmentedIndex`, with everything indexed so far as
+        its first segment. New tweets are buffered in memory, frozen into
+        segments and merged in the background (see `segments`). Adding a
+        tweetID which is already indexed replaces the tweet.
+        :param tweets: an iterable of (tweetID, tweet) pairs
+        :param maxBufferedDocs: the number of tweets buffered before they are
+        frozen into a segment (only used by the first call)
+        :param mergeFactor: the number of segments of the same size which are
+        merged (only used by the first call)
+        """
+        segmentedIndex = self._segmentedIndex(maxBufferedDocs, mergeFactor)
+        for id, doc in tweets:
+            if id in self.docNums:
+                self.deleteDocuments([id])
+            # a new document number, even for a replaced tweet, keeps the
+            # document numbers in the buffer increasing
+            self.docNums[id] = len(self.docIds)
+            self.docIds.append(id)
+            self.id2doc[id] = doc
+            segmentedIndex.add(self.docNums[id], self._processTweet(doc))
+
+    def deleteDocuments(self, ids):
+        """
+        Removes tweets from the index. They disappear from query results
+        right away and are purged from the postings lists when their segment
+        is merged.
+        :param ids: the tweetIDs to remove
+        """
+        segmentedIndex = self._segmentedIndex()
+        for id in ids:
+            docNum = self.docNums.pop(id, None)
+            if docNum is not None:
+                segmentedIndex.delete(docNum)
+                self.deleted.add(docNum)
+                if id in self.id2doc:
+                    del self.id2doc[id]
+
+    def _segmentedIndex(self, maxBufferedDocs=1000, mergeFactor=4):
+        """
+        Returns `indices` as a `SegmentedIndex`, converting it first if needed.
+        """
+        if self.positional:
+            raise ValueError('Positional indexes cannot be updated, they have to be rebuilt.')
+        if not isinstance(self.indices, SegmentedIndex):
+            segmentedIndex = SegmentedIndex(Index, maxBufferedDocs, mergeFactor)
+            if len(self.docIds):
+                segmentedIndex.addSegment(self.indices, len(self.docIds), 0,
+                                          len(self.docIds) - 1)
+            self.indices = segmentedIndex
+        return self.indices
+
+    def save(self, path):
+        """
+        Saves the inverted index to a binary index file (see `indexfile`),
+        which `open` memory-maps so that it does not have to be rebuilt. The
+        deleted tweets are left out of the postings lists and marked as
+        deleted in the file.
+        :param path: the path of the index file
+        """
+        if isinstance(self.id2doc, DocumentStore):
+            store = self.id2doc
+        elif self.tweetsPath is not None:
+            # find the offsets of the tweets in the file for the doc table
+            store = DocumentStore(self.tweetsPath)
+            for _ in store.items():
+                pass
+        else:
+            store = None
+
+        docOffsets = None
+        if store is not None:
+            docOffsets = [store.offsets.get(id, -1) for id in self.docIds]
+        indices = self.indices
+        if isinstance(indices, SegmentedIndex):
+            indices = indices.snapshot()
+        IndexFile.save(path, indices, self.docIds, docOffsets, self.tweetsPath, self.deleted)
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        """
+        Creates a `TwitterIR` from an index file written by `save` instead of
+        indexing. The file is memory-mapped, so this takes milliseconds and the
+        pages are shared by all processes that open the same file. The
+        tweetIDs are read from the file when they are looked up, and the
+        tweets from the tweets.csv file they were indexed from.
+        :param path: the path of the index file
+        :param kwargs: the arguments of the constructor
+        :return: the `TwitterIR`
+        """
+        twitterIR = cls(**kwargs)
+        twitterIR._openIndexFile(path)
+        return twitterIR
+
+    def _openIndexFile(self, path):
+        """
+        Replaces the index with the index file at path (see `open`).
+        :param path: the path of the index file
+        """
+        indexFile = IndexFile.open(path)
+        self.indices = indexFile
+        self.docIds = DocIds(indexFile)
+        self.deleted = set(indexFile.deletedDocNums())
+        self.docNums = LazyDict(lambda: {indexFile.docId(docNum): docNum
+                                         for docNum in range(indexFile.numDocs)
+                                         if docNum not in self.deleted})
+        self.tweetsPath = indexFile.tweetsPath
+        if self.tweetsPath is not None:
+            self.id2doc = DocumentStore(self.tweetsPath, LazyDict(lambda: {
+                indexFile.docId(docNum): indexFile.docOffset(docNum)
+                for docNum in range(indexFile.numDocs)
+                if indexFile.docOffset(docNum) >= 0 and docNum not in self.deleted}))
 
     def __len__(self):
         """The number of tokens in the inverted index."""
-        return len(self.indices.keys())
+        return len(self.indices)
 
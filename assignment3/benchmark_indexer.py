@@ -0,0 +1,87 @@
+"""
+Regression benchmark for the indexing time of `TwitterIQ`.
+
+Indexes corpora of doubling size and reports the time per tweet, which stays
+flat as long as indexing is linear in the size of the corpus. Without a path,
+synthetic tweets are used in which a few terms occur in every tweet, the
+worst case for a duplicate check that scans the postings lists. With a path,
+prefixes of that tweets file are indexed instead.
+
+	python benchmark_indexer.py [path/to/tweets.csv]
+
+Exits with status 1 if a tweet takes more than `MAX_SLOWDOWN` times as long
+to index in the largest corpus as in the smallest one.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import islice
+from typing import *
+
+from indexer import TwitterIQ
+
+SIZES = (5000, 10000, 20000, 40000)
+MAX_SLOWDOWN = 2.0
+
+
+def synthetic_tweets(n: int, seed: int = 0) -> List[str]:
+	"""
+	Generates lines in the format of tweets.csv.
+
+	:param int n: the number of tweets
+	:param int seed: the seed of the random words
+	:return: the lines, each ending in a newline
+	:rtype: list
+	"""
+	rng = random.Random(seed)
+	vocabulary = [f'word{i}' for i in range(5000)]
+	lines = []
+	for i in range(n):
+		text = ' '.join(['campaign', 'finance', 'reform'] + rng.sample(vocabulary, 12))
+		lines.append(f'{i}\t{i}\tuser\tdate\t{text}\n')
+	return lines
+
+
+def time_indexing(lines: List[str], directory: str) -> float:
+	"""
+	Writes the lines to a file and times indexing it.
+
+	:param list lines: the lines of the tweets file
+	:param str directory: the directory to write the file to
+	:return: the indexing time in seconds
+	:rtype: float
+	"""
+	path = os.path.join(directory, f'tweets{len(lines)}.csv')
+	with open(path, 'w') as f:
+		f.writelines(lines)
+	start = time.perf_counter()
+	TwitterIQ(path)
+	return time.perf_counter() - start
+
+
+def main(path: str = None) -> int:
+	if path is None:
+		corpus = synthetic_tweets(SIZES[-1])
+	else:
+		with open(path, 'r') as f:
+			corpus = list(islice(f, SIZES[-1]))
+
+	per_tweet = []
+	print(f'{"tweets":>8} {"seconds":>9} {"us/tweet":>9}')
+	with tempfile.TemporaryDirectory() as directory:
+		for size in SIZES:
+			if size > len(corpus):
+				break
+			seconds = time_indexing(corpus[:size], directory)
+			per_tweet.append(seconds / size * 1e6)
+			print(f'{size:>8} {seconds:>9.3f} {per_tweet[-1]:>9.1f}')
+
+	slowdown = per_tweet[-1] / per_tweet[0]
+	print(f'slowdown per tweet: {slowdown:.2f}x (at most {MAX_SLOWDOWN}x allowed)')
+	return 0 if slowdown <= MAX_SLOWDOWN else 1
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,78 @@
+"""
+Benchmark for the top-k retrieval of `TfidfIndex`.
+
+Indexes the tweets in tweets.csv and runs queries made of random terms of
+random tweets, once by scoring every tweet (`TfidfIndex.top_x`) and once with
+the pruned document-at-a-time traversal (`TfidfIndex.search`). Checks that
+both return the same tweets with the same similarities and prints the time
+per query and the share of the query terms' postings `search` touched.
+
+	python benchmark_search.py [path/to/tweets.csv] [number of queries]
+"""
+import csv
+import random
+import sys
+import time
+from typing import *
+
+from nltk.tokenize import TweetTokenizer
+
+import shared
+from indexer import TwitterIQ
+from normalizer import TweetNormalizer
+from tfidf_index import TfidfIndex
+
+KS = (10, 100)
+QUERY_LENGTHS = (1, 2, 3, 5)
+
+
+def random_queries(tweets: List[List[str]], n: int, seed: int = 0) -> List[List[str]]:
+	"""
+	Samples cleaned queries from the terms of random tweets.
+
+	:param list tweets: the tokenized tweets
+	:param int n: the number of queries
+	:param int seed: the seed of the sampling
+	:return: the tokens of each query
+	:rtype: list
+	"""
+	rng = random.Random(seed)
+	tweets = [tweet for tweet in tweets if tweet]
+	return [rng.sample(tweet, min(len(tweet), rng.choice(QUERY_LENGTHS)))
+		for tweet in rng.choices(tweets, k=n)]
+
+
+def main(path: str, n: int):
+	with open(path, 'r', encoding='utf-8', newline='') as f:
+		raw = [line[4] for line in csv.reader(f, delimiter='\t')]
+	normalizer = TweetNormalizer(TweetTokenizer(reduce_len=True))
+	index = TfidfIndex(normalizer.clean_many(raw), TwitterIQ(path), normalizer)
+	queries = random_queries(index.tweets, n)
+	# converts the postings lists `search` uses up front
+	for q in queries:
+		index.search(q, 1, cleaned=True)
+
+	print(f'{len(raw)} tweets, {len(queries)} queries')
+	print(f'{"k":>4} {"top_x ms":>9} {"search ms":>10} {"postings":>9}')
+	for k in KS:
+		exhaustive = searched = 0
+		touched = postings = 0
+		for q in queries:
+			start = time.perf_counter()
+			expected = index.top_x(k, q, cleaned=True)
+			middle = time.perf_counter()
+			result = index.search(q, k, cleaned=True)
+			exhaustive += middle - start
+			searched += time.perf_counter() - middle
+			assert result == expected, q
+
+			weights, _ = index.query_vector(q)
+			postings += sum(index.matrix.getcol(column).nnz for column in weights)
+			touched += index.postings_touched
+		print(f'{k:>4} {exhaustive / len(queries) * 1e3:>9.2f} {searched / len(queries) * 1e3:>10.2f} '
+			f'{touched / max(postings, 1):>8.1%}')
+
+
+if __name__ == '__main__':
+	main(sys.argv[1] if len(sys.argv) > 1 else 'tweets.csv',
+		int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -0,0 +1,221 @@
+"""
+Evaluation of rankings against relevance judgements (qrels).
+
+All metrics of all queries are computed at once: the relevance of the
+retrieved documents is put into a (queries x ranks) array, and the metrics
+at every rank follow from its cumulative sums, e.g. the number of relevant
+documents retrieved up to each rank. The relevance is graded, a document
+counts as relevant if its grade is positive.
+
+Rankings (runs) map each query to its documents, best first, and qrels map
+each query to the grades of its judged documents. Both are read from files
+with one document per line:
+
+	document grade             (qrels of one query)
+	query document grade
+	query 0 document grade     (TREC qrels)
+
+	document                   (runs of one query, in the order of the ranking)
+	query document
+	query Q0 document rank score tag    (TREC runs, ordered by score)
+
+An annotated ranking like annotation_johannes.txt (`document grade` in the
+order of the ranking) is both a run and qrels, see `read_annotation`.
+
+	python evaluation.py path/to/run path/to/qrels
+	python evaluation.py path/to/annotation
+"""
+import sys
+from typing import *
+
+import numpy as np
+
+DEFAULT_QUERY = '1'
+KS = (1, 5, 10, 20)
+# the recall levels of the interpolated precision-recall curves
+RECALL_LEVELS = np.linspace(0, 1, 11)
+
+
+def _fields(path: str) -> Iterator[List[str]]:
+	with open(path, 'r', encoding='utf-8') as f:
+		for line in f:
+			fields = line.split()
+			if fields:
+				yield fields
+
+
+def read_qrels(path: str, query: str = DEFAULT_QUERY) -> Dict[str, Dict[str, int]]:
+	"""
+	Reads relevance judgements (see the module docstring for the formats).
+
+	:param str path: the path of the qrels file
+	:param str query: the query of lines without one
+	:return: Dictionary mapping each query to the grades of its documents
+	:rtype: dict
+	"""
+	qrels = {}
+	for fields in _fields(path):
+		if len(fields) == 2:
+			fields = [query] + fields
+		elif len(fields) == 4:
+			del fields[1]
+		elif len(fields) != 3:
+			raise ValueError(f'{path}: expected 2 to 4 fields, got {fields}')
+		qrels.setdefault(fields[0], {})[fields[1]] = int(fields[2])
+	return qrels
+
+
+def read_run(path: str, query: str = DEFAULT_QUERY) -> Dict[str, List[str]]:
+	"""
+	Reads rankings (see the module docstring for the formats).
+
+	:param str path: the path of the run file
+	:param str query: the query of lines without one
+	:return: Dictionary mapping each query to its documents, best first
+	:rtype: dict
+	"""
+	run = {}
+	scores = {}
+	for fields in _fields(path):
+		if len(fields) == 6:
+			run.setdefault(fields[0], []).append(fields[2])
+			scores.setdefault(fields[0], []).append(-float(fields[4]))
+		elif len(fields) == 2:
+			run.setdefault(fields[0], []).append(fields[1])
+		elif len(fields) == 1:
+			run.setdefault(query, []).append(fields[0])
+		else:
+			raise ValueError(f'{path}: expected 1, 2 or 6 fields, got {fields}')
+	for q, documents in run.items():
+		if q in scores:
+			order = np.argsort(scores[q], kind='stable')
+			run[q] = [documents[i] for i in order]
+	return run
+
+
+def read_annotation(path: str, query: str = DEFAULT_QUERY) -> Tuple[Dict[str, List[str]], Dict[str, Dict[str, int]]]:
+	"""
+	Reads a ranking of one query annotated with the grade of each document,
+	like annotation_johannes.txt.
+
+	:param str path: the path of the annotation file
+	:param str query: the query of the ranking
+	:return: the run and the qrels
+	:rtype: tuple
+	"""
+	run = {query: [fields[0] for fields in _fields(path)]}
+	return run, read_qrels(path, query)
+
+
+def relevance(run: Dict[Hashable, List[Hashable]], qrels: Dict[Hashable, Dict[Hashable, int]],
+		depth: int = None) -> Tuple[list, np.ndarray, np.ndarray]:
+	"""
+	Looks up the grades of the retrieved documents and of the best possible
+	rankings. Only the queries with at least one relevant document are
+	evaluated, since recall, AP and nDCG are undefined for the others.
+
+	:param dict run: the documents of each query, best first
+	:param dict qrels: the grades of the judged documents of each query
+	:param int depth: the number of ranks to evaluate, the length of the
+		longest ranking by default
+	:return: the evaluated queries, the grades of their retrieved documents
+		and the grades of the judged documents in descending order, both as
+		(queries x ranks) arrays padded with zeros
+	:rtype: tuple
+	"""
+	queries = [q for q, grades in qrels.items() if any(grade > 0 for grade in grades.values())]
+	if depth is None:
+		depth = max((len(run.get(q, ())) for q in queries), default=0)
+	grades = np.zeros((len(queries), depth))
+	ideal = np.zeros((len(queries), depth))
+	for i, q in enumerate(queries):
+		judged = qrels[q]
+		retrieved = [judged.get(document, 0) for document in run.get(q, ())[:depth]]
+		grades[i, :len(retrieved)] = retrieved
+		best = sorted((grade for grade in judged.values() if grade > 0), reverse=True)[:depth]
+		ideal[i, :len(best)] = best
+	return queries, np.maximum(grades, 0), ideal
+
+
+def evaluate(run: Dict[Hashable, List[Hashable]], qrels: Dict[Hashable, Dict[Hashable, int]],
+		ks: Sequence[int] = KS) -> Dict[str, Any]:
+	"""
+	Computes the metrics of every query with relevant documents.
+
+	:param dict run: the documents of each query, best first
+	:param dict qrels: the grades of the judged documents of each query
+	:param ks: the ranks to compute P@k, recall@k and nDCG@k at
+	:return: Dictionary with the evaluated `queries` and the `ks`, and the
+		metrics of each query: `P`, `recall` and `nDCG` as (queries x ks)
+		arrays, `AP` and the `interpolated_P` at `RECALL_LEVELS` as
+		(queries x levels) array
+	:rtype: dict
+	"""
+	ks = np.asarray(ks)
+	if len(ks) and ks.min() < 1:
+		raise ValueError('The ranks must be at least 1.')
+	queries, grades, ideal = relevance(run, qrels, max(ks.max(initial=1),
+		max((len(ranking) for ranking in run.values()), default=0)))
+	num_relevant = np.array([sum(grade > 0 for grade in qrels[q].values()) for q in queries])
+	ranks = np.arange(1, grades.shape[1] + 1)
+
+	# the number of relevant documents up to each rank
+	hits = np.cumsum(grades > 0, axis=1)
+	precision = hits / ranks
+	recall = hits / num_relevant[:, None]
+	ap = (precision * (grades > 0)).sum(axis=1) / num_relevant
+
+	# the precision at a rank is interpolated with the best precision at any
+	# later rank; the precision at a recall level is the interpolated one at
+	# the first rank which reaches it
+	interpolated = np.maximum.accumulate(precision[:, ::-1], axis=1)[:, ::-1]
+	reached = recall[:, :, None] >= RECALL_LEVELS - 1e-12
+	first = reached.argmax(axis=1)
+	interpolated_p = np.where(reached.any(axis=1),
+		np.take_along_axis(interpolated, first, axis=1), 0.0)
+
+	discounts = 1 / np.log2(ranks + 1)
+	dcg = np.cumsum(grades * discounts, axis=1)
+	idcg = np.cumsum(ideal * discounts, axis=1)
+	ndcg = np.divide(dcg, idcg, out=np.zeros_like(dcg), where=idcg > 0)
+
+	columns = ks - 1
+	return {
+		'queries': queries,
+		'ks': ks,
+		'P': precision[:, columns],
+		'recall': recall[:, columns],
+		'nDCG': ndcg[:, columns],
+		'AP': ap,
+		'interpolated_P': interpolated_p,
+	}
+
+
+def summary(metrics: Dict[str, Any]) -> Dict[str, float]:
+	"""
+	Averages the metrics of `evaluate` over the queries.
+
+	:param dict metrics: the result of `evaluate`
+	:return: Dictionary mapping e.g. 'P@10' or 'MAP' to the mean over the queries
+	:rtype: dict
+	"""
+	means = {}
+	for name in ('P', 'recall', 'nDCG'):
+		for k, mean in zip(metrics['ks'], metrics[name].mean(axis=0)):
+			means[f'{name}@{k}'] = float(mean)
+	means['MAP'] = float(metrics['AP'].mean())
+	for level, mean in zip(RECALL_LEVELS, metrics['interpolated_P'].mean(axis=0)):
+		means[f'iP@{level:.1f}'] = float(mean)
+	return means
+
+
+if __name__ == '__main__':
+	if len(sys.argv) == 2:
+		metrics = evaluate(*read_annotation(sys.argv[1]))
+	elif len(sys.argv) == 3:
+		metrics = evaluate(read_run(sys.argv[1]), read_qrels(sys.argv[2]))
+	else:
+		sys.exit(__doc__)
+	print(f'{"queries":<10} {len(metrics["queries"]):>8}')
+	for name, mean in summary(metrics).items():
+		print(f'{name:<10} {mean:>8.4f}')
@@ -5,6 +5,9 @@ from emoji import UNICODE_EMOJI
 from string import punctuation
 from nltk.tokenize import TweetTokenizer
 
+import shared  # makes the modules of assignment2 importable
+from indexfile import IndexFile
+
 
 class TwitterIQ(dict):
 	"""
@@ -21,10 +24,14 @@ class TwitterIQ(dict):
 
 	Query methods are detailed in their respective methods' docstrings.
 
+	An index can be saved to a binary index file with `save` and opened
+	again with `open`, which memory-maps the file instead of indexing.
+
 	Attributes:
 		all_postings: List containing ALL postings lists
 		tweet_content_dict: Dictionary whose keys are twitter_ids
 			pointing to the content of the tokenized tweets.
+		path: the path of the indexed tweets file
 		__current_tweet_id: ID of the doc/tweet that is currently
 			being iterated over. This is used by the __missing__ method
 			to propery organize the dictionary
@@ -32,6 +39,9 @@ class TwitterIQ(dict):
 
 	STOP_WORDS = stopwords.words('english') + stopwords.words('german')
 	EXCLUSION_LIST = list(punctuation) + list(UNICODE_EMOJI.keys()) + ['...', 'de', 'com']
+	# set versions of the lists above for the membership tests while indexing
+	_STOP_WORDS = frozenset(STOP_WORDS)
+	_EXCLUSION_SET = frozenset(EXCLUSION_LIST)
 
 	def __init__(self, path: str = None, strip_handles: bool = True, **kwargs):
 		"""
@@ -46,6 +56,9 @@ class TwitterIQ(dict):
 		self.tokenizer = TweetTokenizer(strip_handles=strip_handles)
 		self.__indexing = False
 		self.length = 0
+		self.path = None
+		# the memory-mapped index file the tokens are looked up in, if opened
+		self.__index_file = None
 
 		if path:
 			self.index(path)
@@ -62,8 +75,11 @@ class TwitterIQ(dict):
 			self.all_postings.append([self.length])
 			self[token] = PostingNode(self.all_postings[-1])
 			return self[token]
-		else:
-			return PostingNode([])
+		if self.__index_file is not None:
+			posting_node = self.__index_file.get(token)
+			if posting_node is not None:
+				return posting_node
+		return PostingNode([])
 
 	def __index_tokens(self, tweet_content: list) -> None:
 		"""
@@ -83,7 +99,9 @@ class TwitterIQ(dict):
 
 			# creates entry or assigns posting_node to existing one
 			posting_node = self[token]
-			if self.length not in posting_node.postings_list:
+			# doc ids are indexed in increasing order, so the current doc
+			# can only be at the end of the postings list
+			if posting_node.postings_list[-1] != self.length:
 				# adds to end of posting list and increments freq
 				posting_node.postings_list.append(self.length)
 				posting_node.freq += 1
@@ -98,7 +116,7 @@ class TwitterIQ(dict):
 		:rtype: str
 		"""
 
-		if token in TwitterIQ.EXCLUSION_LIST or token.startswith(('http')):
+		if token in TwitterIQ._EXCLUSION_SET or token.startswith(('http')):
 			return
 
 		if token.startswith('#'):
@@ -106,7 +124,7 @@ class TwitterIQ(dict):
 
 		token = token.lower()
 
-		if token in TwitterIQ.STOP_WORDS:
+		if token in TwitterIQ._STOP_WORDS:
 			return
 
 		return token
@@ -133,6 +151,7 @@ class TwitterIQ(dict):
 
 	def index(self, path: str) -> None:
 		self.__indexing = True
+		self.path = path
 
 		with open(path, 'r') as corpus:
 			# combs through each doc/tweet individually
@@ -171,6 +190,60 @@ class TwitterIQ(dict):
 		for tweet_id in self.query(term1, term2):
 			print(f'{tweet_id}:', self.tweet_content_dict[tweet_id])
 
+	def save(self, path: str) -> None:
+		"""
+		Saves the inverted index to a binary index file (see `indexfile` in
+		assignment2), which `open` memory-maps so that it does not have to
+		be rebuilt. The tweets are not copied, the file records where they
+		are in the indexed tweets file.
+
+		:param str path: the path of the index file
+		"""
+		offsets = None
+		if self.path is not None:
+			offsets = line_offsets(self.path)[:self.length]
+		IndexFile.write(path, ((token, self[token].postings_list) for token in sorted(self)),
+			[str(tweet_id) for tweet_id in range(self.length)], offsets, self.path)
+
+	@classmethod
+	def open(cls, path: str) -> 'TwitterIQ':
+		"""
+		Opens an index file written by `save` instead of indexing. The file is
+		memory-mapped, so this takes milliseconds and its pages are shared by
+		all processes which open it. The tweets are read from the indexed
+		tweets file when they are looked up.
+
+		:param str path: the path of the index file
+		:return: the opened index
+		:rtype: TwitterIQ
+		"""
+		index = cls()
+		index_file = IndexFile.open(path, lambda freq, postings_list: PostingNode(postings_list))
+		index.__index_file = index_file
+		index.length = index_file.numDocs
+		index.path = index_file.tweetsPath
+		if index.path is not None:
+			index.tweet_content_dict = TweetFile(index.path, index_file)
+		return index
+
+	def close(self) -> None:
+		"""
+		Closes the index file of an opened index; the postings lists looked
+		up before must not be used anymore.
+		"""
+		if self.__index_file is not None:
+			self.__index_file.close()
+
+	def __iter__(self):
+		if self.__index_file is not None:
+			return iter(self.__index_file)
+		return super().__iter__()
+
+	def __contains__(self, token: str) -> bool:
+		if self.__index_file is not None:
+			return token in self.__index_file
+		return super().__contains__(token)
+
 	def __len__(self):
 		return self.length
 
@@ -186,7 +259,7 @@ class PostingNode(object):
 		self.freq = len(postings_list)
 
 	def __str__(self) -> str:
-		ret = f'(Frequency: {self.freq}, {self.postings_list[:5]}'
+		ret = f'(Frequency: {self.freq}, {list(self.postings_list[:5])}'
 		if self.freq > 5:
 			ret += '...'
 		ret += ')'
@@ -201,3 +274,48 @@ class PostingNode(object):
 
 	def __gt__(self, other) -> bool:
 		return self.freq > other.freq
+
+
+class TweetFile(Mapping):
+	"""
+	The tweets of an opened `TwitterIQ`, read from the tweets file when they
+	are looked up instead of being held in memory.
+	"""
+
+	def __init__(self, path: str, index_file: IndexFile):
+		"""
+		:param str path: the path of the tweets file
+		:param IndexFile index_file: the index file with the offsets of the tweets
+		"""
+		self.path = path
+		self.index_file = index_file
+
+	def __getitem__(self, tweet_id: int) -> str:
+		if not 0 <= tweet_id < self.index_file.numDocs:
+			raise KeyError(tweet_id)
+		with open(self.path, 'rb') as f:
+			f.seek(self.index_file.docOffset(tweet_id))
+			return f.readline().decode('utf-8').split('\t')[4]
+
+	def __iter__(self):
+		return iter(range(self.index_file.numDocs))
+
+	def __len__(self) -> int:
+		return self.index_file.numDocs
+
+
+def line_offsets(path: str) -> List[int]:
+	"""
+	Returns the byte offset of every line of a file.
+
+	:param str path: the path of the file
+	:return: the offsets, in the order of the lines
+	:rtype: list
+	"""
+	offsets = []
+	offset = 0
+	with open(path, 'rb') as f:
+		for line in f:
+			offsets.append(offset)
+			offset += len(line)
+	return offsets
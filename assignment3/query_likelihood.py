@@ -0,0 +1,165 @@
+import math
+from collections import Counter
+from itertools import islice
+from typing import *
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class QueryLikelihood(object):
+	"""
+	Ranks tokenized tweets by the log likelihood of a query under their
+	language models, smoothed with the collection's language model
+	(Jelinek-Mercer) like `jelenik_mercer` in Assignment3.ipynb:
+
+		P(t|d) = lam * tf / |d| + (1 - lam) * cf / |C|
+
+	where tf is the frequency of a term in a tweet, |d| the length of the
+	tweet, cf the frequency of the term in the collection and |C| the length
+	of the collection.
+
+	The lengths and collection probabilities are computed once, and the term
+	frequencies are stored as postings lists (the columns of a sparse
+	tweet-term matrix). Since
+
+		log P(t|d) = log((1 - lam) * cf / |C|) + log(1 + lam * tf / (|d| * (1 - lam) * cf / |C|))
+
+	and the first summand is the same for every tweet, a query is scored by
+	adding up the second summand over the postings of its terms only. Tweets
+	which contain none of its terms all get the first summand, the query's
+	likelihood under the collection's model.
+
+	Attributes:
+		tweets: the tokenized tweets
+		texts: the tweets as strings, joined by spaces
+		lam: the default weight of the tweets' models
+		vocabulary: Dictionary mapping each term to its column
+		lengths: the length of each tweet
+		collection_probs: the probability of each column under the
+			collection's model
+		tfs: the sparse tweet-term matrix of term frequencies in CSC format
+	"""
+
+	def __init__(self, tweets: List[List[str]], lam: float = 0.5, normalizer=None):
+		"""
+		Computes the statistics of the collection.
+
+		:param list tweets: the tokenized tweets
+		:param float lam: the default weight of the tweets' models, from 0
+			(only the collection's model) up to but excluding 1
+		:param normalizer: optionally the `TweetNormalizer` used to clean
+			queries which are given as strings
+		"""
+		self._check_lam(lam)
+		self.tweets = list(tweets)
+		self.texts = [' '.join(tweet) for tweet in self.tweets]
+		self.lam = lam
+		self.normalizer = normalizer
+		self.vocabulary = {}
+
+		indptr = [0]
+		indices = []
+		tfs = []
+		for tweet in self.tweets:
+			for term, tf in Counter(tweet).items():
+				indices.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+				tfs.append(tf)
+			indptr.append(len(indices))
+
+		self.lengths = np.array([len(tweet) for tweet in self.tweets], dtype=np.int64)
+		self.tfs = csr_matrix((np.array(tfs, dtype=np.float64), np.array(indices, dtype=np.int64),
+			np.array(indptr, dtype=np.int64)), shape=(len(self.tweets), len(self.vocabulary))).tocsc()
+		self.tfs.sort_indices()
+		self.collection_probs = np.asarray(self.tfs.sum(axis=0)).ravel() / max(self.lengths.sum(), 1)
+		# the tweets sorted by their text, descending, to break ties
+		self._by_text = None
+
+	@staticmethod
+	def _check_lam(lam: float):
+		if not 0 <= lam < 1:
+			# with lam = 1 every tweet missing a query term has probability 0
+			raise ValueError(f'lam must be at least 0 and less than 1, not {lam}.')
+
+	def _clean(self, q: Union[str, List[str]], cleaned: bool) -> List[str]:
+		if cleaned:
+			return q
+		if self.normalizer is None:
+			raise ValueError('Queries which are not cleaned need a normalizer.')
+		return self.normalizer.clean(q)
+
+	def scores(self, q: Union[str, List[str]], cleaned: bool = False,
+			lam: float = None) -> Tuple[np.ndarray, np.ndarray, float]:
+		"""
+		Computes the log likelihood of a query for the tweets containing at
+		least one of its terms, in time proportional to their postings.
+		Query terms which do not occur in the collection have probability 0
+		in every tweet and are ignored.
+
+		:param q: the query, a string or (if `cleaned`) a list of tokens
+		:param bool cleaned: whether `q` is cleaned
+		:param float lam: the weight of the tweets' models, `self.lam` by default
+		:return: the tweets containing a query term, their log likelihoods
+			and the log likelihood of every other tweet
+		:rtype: tuple
+		"""
+		if lam is None:
+			lam = self.lam
+		self._check_lam(lam)
+		tweets = []
+		summands = []
+		background = 0.0
+		for term, qtf in Counter(self._clean(q, cleaned)).items():
+			column = self.vocabulary.get(term)
+			if column is None:
+				continue
+			smoothed = (1 - lam) * self.collection_probs[column]
+			background += qtf * math.log(smoothed)
+			start, end = self.tfs.indptr[column], self.tfs.indptr[column + 1]
+			docs = self.tfs.indices[start:end]
+			tweets.append(docs)
+			summands.append(qtf * np.log1p(lam * self.tfs.data[start:end] / (self.lengths[docs] * smoothed)))
+
+		if not tweets:
+			return np.zeros(0, dtype=np.int64), np.zeros(0), background
+		tweets, inverse = np.unique(np.concatenate(tweets), return_inverse=True)
+		return tweets, background + np.bincount(inverse, weights=np.concatenate(summands)), background
+
+	def top_x(self, x: int, q: Union[str, List[str]], cleaned: bool = False,
+			lam: float = None) -> List[Tuple[float, str]]:
+		"""
+		Returns the x tweets under whose models a query is most likely, by
+		log likelihood, then by text, both descending.
+
+		:param int x: top x number
+		:param q: the query, a string or (if `cleaned`) a list of tokens
+		:param bool cleaned: whether `q` is cleaned
+		:param float lam: the weight of the tweets' models, `self.lam` by default
+		:return: (log likelihood, tweet text) pairs
+		:rtype: list
+		"""
+		tweets, scores, background = self.scores(q, cleaned, lam)
+		x = min(x, len(self.tweets))
+		if x <= 0:
+			return []
+
+		# the tweets scoring more than the ones without any query term; the
+		# others all have the same score and are ordered by their text
+		above = scores > background
+		tweets, scores = tweets[above], scores[above]
+		result = []
+		if len(scores):
+			# every tweet tied with the x-th best score is a candidate, so that
+			# ties are broken by the text like when sorting all of them
+			n = min(x, len(scores))
+			threshold = np.partition(scores, len(scores) - n)[len(scores) - n]
+			candidates = np.flatnonzero(scores >= threshold)
+			result = sorted(((float(scores[i]), self.texts[tweets[i]]) for i in candidates),
+				reverse=True)[:x]
+		if len(result) < x:
+			if self._by_text is None:
+				self._by_text = sorted(range(len(self.texts)), key=self.texts.__getitem__, reverse=True)
+			found = set(tweets.tolist())
+			rest = (self.texts[tweet] for tweet in self._by_text if tweet not in found)
+			result.extend((background, text) for text in islice(rest, x - len(result)))
+		return result
@@ -0,0 +1,18 @@
+"""
+Makes the modules of assignment2 (e.g. `normalizer` and `indexfile`)
+importable in assignment3, instead of copying them. Import this module
+before them:
+
+	import shared
+	from indexfile import IndexFile
+
+The directory is appended to the module search path, so the modules of
+assignment3 take precedence.
+"""
+import os
+import sys
+
+ASSIGNMENT2 = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'assignment2')
+
+if ASSIGNMENT2 not in sys.path:
+	sys.path.append(ASSIGNMENT2)
@@ -0,0 +1,84 @@
+"""
+Tests of the evaluation of rankings: the metrics of small rankings are
+compared with values computed by hand, and the file formats are read back.
+Run with `python test_evaluation.py`.
+"""
+import math
+import os
+import tempfile
+
+import numpy as np
+
+import evaluation
+
+RUN = {'q1': ['d1', 'd2', 'd3', 'd4', 'd5'], 'q2': ['a', 'b'], 'q3': ['x']}
+# d6 is relevant but not retrieved, and q3 has no relevant documents
+QRELS = {'q1': {'d1': 2, 'd3': 1, 'd5': 0, 'd6': 1}, 'q2': {'b': 1}, 'q3': {'x': 0}}
+
+
+def test_evaluate():
+	metrics = evaluation.evaluate(RUN, QRELS, ks=(1, 5))
+	assert metrics['queries'] == ['q1', 'q2']
+	# the relevant documents of q1 are at ranks 1 and 3, the one of q2 at rank 2
+	assert np.allclose(metrics['P'], [[1, 2 / 5], [0, 1 / 5]])
+	assert np.allclose(metrics['recall'], [[1 / 3, 2 / 3], [0, 1]])
+	assert np.allclose(metrics['AP'], [(1 + 2 / 3) / 3, 1 / 2])
+	# the grades of q1 are 2, 0, 1, 0, 0 and at best 2, 1, 1
+	dcg = 2 + 1 / math.log2(4)
+	idcg = 2 + 1 / math.log2(3) + 1 / math.log2(4)
+	assert np.allclose(metrics['nDCG'], [[1, dcg / idcg], [0, 1 / math.log2(3)]])
+	# the best precision at any rank which reaches each recall level
+	assert np.allclose(metrics['interpolated_P'], [
+		[1, 1, 1, 1, 2 / 3, 2 / 3, 2 / 3, 0, 0, 0, 0],
+		[1 / 2] * 11])
+
+	summary = evaluation.summary(metrics)
+	assert math.isclose(summary['P@5'], (2 / 5 + 1 / 5) / 2)
+	assert math.isclose(summary['MAP'], ((1 + 2 / 3) / 3 + 1 / 2) / 2)
+	assert math.isclose(summary['iP@0.0'], (1 + 1 / 2) / 2)
+
+
+def test_unranked():
+	# a query with relevant documents but no ranking scores 0
+	metrics = evaluation.evaluate({}, {'q': {'d': 1}}, ks=(1, 3))
+	assert metrics['queries'] == ['q']
+	for name in ('P', 'recall', 'nDCG', 'AP', 'interpolated_P'):
+		assert not metrics[name].any(), name
+
+
+def test_ks():
+	try:
+		evaluation.evaluate(RUN, QRELS, ks=(0, 5))
+	except ValueError:
+		pass
+	else:
+		raise AssertionError('rank 0 was evaluated')
+
+
+def test_files():
+	with tempfile.TemporaryDirectory() as directory:
+		def write(name, lines):
+			path = os.path.join(directory, name)
+			with open(path, 'w', encoding='utf-8') as f:
+				f.write('\n'.join(lines) + '\n')
+			return path
+
+		# TREC runs are ordered by score
+		run = evaluation.read_run(write('run', ['q1 Q0 d2 1 0.5 tag', 'q1 Q0 d1 2 0.9 tag',
+			'q2 Q0 a 1 0.1 tag']))
+		assert run == {'q1': ['d1', 'd2'], 'q2': ['a']}
+		assert evaluation.read_run(write('run1', ['d2', 'd1'])) == {evaluation.DEFAULT_QUERY: ['d2', 'd1']}
+
+		qrels = evaluation.read_qrels(write('qrels', ['q1 0 d1 2', 'q1 d2 0', '', 'q2 0 a 1']))
+		assert qrels == {'q1': {'d1': 2, 'd2': 0}, 'q2': {'a': 1}}
+
+		run, qrels = evaluation.read_annotation(write('annotation', ['d3 1', 'd1 0', 'd2 2']))
+		assert run == {'1': ['d3', 'd1', 'd2']}
+		assert qrels == {'1': {'d3': 1, 'd1': 0, 'd2': 2}}
+
+
+if __name__ == '__main__':
+	for name, test in list(globals().items()):
+		if name.startswith('test_'):
+			test()
+			print(f'{name} passed')
@@ -0,0 +1,82 @@
+"""
+Tests of the query likelihood ranking: the log likelihoods of random queries
+are compared with Jelinek-Mercer smoothing computed for every (query, tweet)
+pair like `jelenik_mercer` in Assignment3.ipynb. Run with
+`python test_query_likelihood.py`.
+"""
+import math
+import random
+from collections import Counter
+from typing import *
+
+import numpy as np
+
+from query_likelihood import QueryLikelihood
+
+TERMS = ['wall', 'mauer', 'trump', 'mexico', 'border', 'straße', 'über', 'fake', 'news', 'sad']
+
+
+def random_tweets(n: int = 300, seed: int = 0) -> List[List[str]]:
+	rng = random.Random(seed)
+	# few terms and short tweets, so that many tweets tie
+	return [rng.choices(TERMS[:rng.randint(2, len(TERMS))], k=rng.randint(1, 6)) for _ in range(n)]
+
+
+def random_queries(n: int = 100, seed: int = 1) -> List[List[str]]:
+	rng = random.Random(seed)
+	return [rng.choices(TERMS + ['unknown'], k=rng.randint(1, 4)) for _ in range(n)] + [[], ['unknown']]
+
+
+def jelinek_mercer(q: List[str], tweet: List[str], collection: Counter, lam: float) -> float:
+	"""The log likelihood of a query under the smoothed model of a tweet, computed from scratch."""
+	length = sum(collection.values())
+	tfs = Counter(tweet)
+	return sum(math.log(lam * tfs[term] / len(tweet) + (1 - lam) * collection[term] / length)
+		for term in q if term in collection)
+
+
+def all_scores(model: QueryLikelihood, q: List[str], lam: float = None) -> np.ndarray:
+	"""The log likelihoods of a query for every tweet."""
+	tweets, scores, background = model.scores(q, cleaned=True, lam=lam)
+	result = np.full(len(model.tweets), background)
+	result[tweets] = scores
+	return result
+
+
+def test_scores():
+	tweets = random_tweets()
+	model = QueryLikelihood(tweets)
+	collection = Counter(term for tweet in tweets for term in tweet)
+	for lam in (None, 0.0, 0.2, 0.9):
+		for q in random_queries():
+			expected = [jelinek_mercer(q, tweet, collection, model.lam if lam is None else lam)
+				for tweet in tweets]
+			assert np.allclose(all_scores(model, q, lam), expected), (q, lam)
+
+
+def test_top_x():
+	tweets = random_tweets()
+	model = QueryLikelihood(tweets, lam=0.3)
+	for lam in (None, 0.0, 0.7):
+		for q in random_queries():
+			# by log likelihood, then by text, both descending
+			ranking = sorted(zip(all_scores(model, q, lam).tolist(), model.texts), reverse=True)
+			for x in (0, 1, 10, len(tweets), len(tweets) + 5):
+				assert model.top_x(x, q, cleaned=True, lam=lam) == ranking[:x], (q, lam, x)
+
+
+def test_lam():
+	for lam in (-0.1, 1, 1.5):
+		try:
+			QueryLikelihood(random_tweets(), lam)
+		except ValueError:
+			pass
+		else:
+			raise AssertionError(f'lam {lam} was accepted')
+
+
+if __name__ == '__main__':
+	for name, test in list(globals().items()):
+		if name.startswith('test_'):
+			test()
+			print(f'{name} passed')
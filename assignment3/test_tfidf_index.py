@@ -0,0 +1,111 @@
+"""
+Tests of the tf-idf ranking: the scores of random tweets are compared with
+computing the weights of every (query, tweet) pair like the tfidf notebook,
+and the pruned `search` with ranking every tweet. Run with
+`python test_tfidf_index.py`.
+"""
+import math
+import random
+from collections import Counter
+from typing import *
+
+import numpy as np
+
+from indexer import PostingNode, TwitterIQ
+from tfidf_index import TfidfIndex
+
+TERMS = ['wall', 'mauer', 'trump', 'mexico', 'border', 'straße', 'über', 'fake', 'news', 'sad']
+
+
+def random_tweets(n: int = 300, seed: int = 0) -> List[List[str]]:
+	rng = random.Random(seed)
+	# few terms and short tweets, so that many tweets tie
+	return [rng.choices(TERMS[:rng.randint(2, len(TERMS))], k=rng.randint(1, 6)) for _ in range(n)]
+
+
+def random_queries(n: int = 100, seed: int = 1) -> List[List[str]]:
+	rng = random.Random(seed)
+	return [rng.choices(TERMS + ['unknown'], k=rng.randint(1, 4)) for _ in range(n)] + [[], ['unknown']]
+
+
+def inverted_index(tweets: List[List[str]]) -> TwitterIQ:
+	"""Returns a `TwitterIQ` with the postings lists of the tweets."""
+	inv_index = TwitterIQ()
+	for tweet_id, tweet in enumerate(tweets):
+		for term in sorted(set(tweet)):
+			inv_index.setdefault(term, PostingNode([])).postings_list.append(tweet_id)
+	for posting_node in inv_index.values():
+		posting_node.freq = len(posting_node.postings_list)
+	return inv_index
+
+
+def cosine(q: List[str], tweet: List[str], tweets: List[List[str]], inv_index: TwitterIQ) -> float:
+	"""The similarity of a query to a tweet, computed from scratch."""
+	def weights(tokens):
+		return {term: 1 + math.log10(tf) * math.log10(len(tweets) / (inv_index[term].freq + 1))
+			for term, tf in Counter(tokens).items()}
+
+	query_weights, tweet_weights = weights(q), weights(tweet)
+	dot = sum(weight * tweet_weights.get(term, 0) for term, weight in query_weights.items())
+	lengths = math.sqrt(sum(w ** 2 for w in query_weights.values())) * \
+		math.sqrt(sum(w ** 2 for w in tweet_weights.values()))
+	return dot / lengths if lengths else 0.0
+
+
+def test_scores():
+	tweets = random_tweets()
+	inv_index = inverted_index(tweets)
+	index = TfidfIndex(tweets, inv_index)
+	queries = random_queries()
+	scores = index.scores_many(queries, cleaned=True)
+	for j, q in enumerate(queries):
+		expected = [cosine(q, tweet, tweets, inv_index) for tweet in tweets]
+		assert np.allclose(scores[:, j], expected), q
+		assert np.allclose(index.scores(q, cleaned=True), expected), q
+
+
+def test_top_x():
+	tweets = random_tweets()
+	index = TfidfIndex(tweets, inverted_index(tweets))
+	for q in random_queries():
+		scores = index.scores(q, cleaned=True)
+		# by similarity, then by text, both descending
+		ranking = sorted(zip(scores.tolist(), index.texts), reverse=True)
+		for x in (0, 1, 10, len(tweets), len(tweets) + 5):
+			assert index.top_x(x, q, cleaned=True) == ranking[:x], (q, x)
+
+
+def test_search():
+	tweets = random_tweets(2000)
+	index = TfidfIndex(tweets, inverted_index(tweets))
+	for q in random_queries():
+		for k in (1, 3, 10, 100, len(tweets) + 5):
+			# the same tweets in the same order, including the ties
+			assert index.search(q, k, cleaned=True) == index.top_x(k, q, cleaned=True), (q, k)
+	assert index.search(['wall'], 0, cleaned=True) == []
+
+
+def test_search_prunes():
+	# a rare term makes the common one non-essential once the top k is full
+	tweets = [['sad', 'wall']] * 3 + [['wall'] * (1 + i % 3) + ['news'] for i in range(3000)]
+	index = TfidfIndex(tweets, inverted_index(tweets))
+	assert index.search(['sad', 'wall'], 3, cleaned=True) == index.top_x(3, ['sad', 'wall'], cleaned=True)
+	assert index.postings_touched < len(tweets)
+
+
+def test_clean():
+	tweets = random_tweets()
+	index = TfidfIndex(tweets, inverted_index(tweets))
+	try:
+		index.scores('wall')
+	except ValueError:
+		pass
+	else:
+		raise AssertionError('a query was scored without a normalizer')
+
+
+if __name__ == '__main__':
+	for name, test in list(globals().items()):
+		if name.startswith('test_'):
+			test()
+			print(f'{name} passed')
@@ -0,0 +1,383 @@
+import heapq
+import math
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+from typing import *
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from indexer import TwitterIQ
+
+
+class TfidfIndex(object):
+	"""
+	Ranks tokenized tweets by the cosine similarity of their tf-idf vectors
+	to a query, with the same weights as the tfidf notebook:
+
+		1 + log10(tf) * log10(N / (df + 1))
+
+	where tf is the frequency of a term in a tweet, df its document frequency
+	in a `TwitterIQ` and N the number of tweets.
+
+	Instead of computing the weights of every (query, tweet) pair, the
+	weights of all tweets are computed once and stored as a sparse
+	tweet-term matrix in CSR format, together with the norm of every row.
+	Scoring a query is then a single sparse matrix-vector product, divided
+	by the norms; a batch of queries is a single sparse matrix product.
+
+	`search` finds the same top tweets without scoring all of them: it walks
+	the postings lists of the query terms document-at-a-time (MaxScore) and
+	skips the tweets which cannot make it into the top k anymore.
+
+	Attributes:
+		tweets: the tokenized tweets
+		texts: the tweets as strings, joined by spaces
+		vocabulary: Dictionary mapping each term to its column
+		idf: the log10 of the idf of each column
+		matrix: the sparse tweet-term matrix of tf-idf weights
+		norms: the length of each row of `matrix`
+		max_weights: the largest weight of each column, divided by the
+			norm of its row, which bounds what a term adds to a score
+		postings_touched: the number of postings read by the last `search`
+	"""
+
+	# slack when pruning by score bounds, so that rounding errors in the
+	# bounds never prune a tweet which ties with the k-th best
+	EPSILON = 1e-12
+	# the number of postings sharing a bound in `search`
+	BLOCK_SIZE = 64
+
+	def __init__(self, tweets: List[List[str]], inv_index: TwitterIQ, normalizer=None):
+		"""
+		Computes the tf-idf weights of all tweets.
+
+		:param list tweets: the tokenized tweets
+		:param TwitterIQ inv_index: the index the document frequencies are taken from
+		:param normalizer: optionally the `TweetNormalizer` used to clean
+			queries which are given as strings
+		"""
+		self.tweets = list(tweets)
+		self.texts = [' '.join(tweet) for tweet in self.tweets]
+		self.inv_index = inv_index
+		self.normalizer = normalizer
+		self.vocabulary = {}
+
+		indptr = [0]
+		indices = []
+		tfs = []
+		for tweet in self.tweets:
+			for term, tf in Counter(tweet).items():
+				indices.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+				tfs.append(tf)
+			indptr.append(len(indices))
+
+		self.idf = np.array([self._log_idf(term) for term in self.vocabulary])
+		indices = np.array(indices, dtype=np.int64)
+		data = 1 + np.log10(np.array(tfs, dtype=np.float64)) * self.idf[indices]
+		self.matrix = csr_matrix((data, indices, np.array(indptr, dtype=np.int64)),
+			shape=(len(self.tweets), len(self.vocabulary)))
+		self.norms = np.sqrt(np.asarray(self.matrix.multiply(self.matrix).sum(axis=1)).ravel())
+
+		# the postings lists for `search`: the columns of the matrix, with the
+		# weights divided by the norms of the tweets. The tweets are numbered
+		# by their norms, so that the weights mostly decrease along a postings
+		# list and its later blocks have low bounds
+		self._order = np.argsort(self.norms, kind='stable')
+		self._columns = self.matrix[self._order].tocsc()
+		self._columns.sort_indices()
+		rows = self._columns.indices
+		self._columns.data = self._columns.data / self.norms[self._order][rows]
+		self.max_weights = np.zeros(len(self.vocabulary))
+		if self._columns.nnz:
+			starts = self._columns.indptr[:-1]
+			self.max_weights = np.maximum.reduceat(self._columns.data, starts)
+		# postings lists converted to Python lists, which are faster to search,
+		# by column
+		self._postings = {}
+		# the tweets sorted by their text, descending, to fill up the results
+		# of `search` with tweets which do not contain any query term
+		self._by_text = None
+		self.postings_touched = 0
+
+	def _log_idf(self, term: str) -> float:
+		"""
+		Returns the log10 of the idf of a term, adding 1 to its document
+		frequency to avoid zero division.
+		"""
+		return math.log10(len(self.tweets) / (self.inv_index[term].freq + 1))
+
+	def _clean(self, q: Union[str, List[str]], cleaned: bool) -> List[str]:
+		if cleaned:
+			return q
+		if self.normalizer is None:
+			raise ValueError('Queries which are not cleaned need a normalizer.')
+		return self.normalizer.clean(q)
+
+	def query_vector(self, q: List[str]) -> Tuple[Dict[int, float], float]:
+		"""
+		Computes the tf-idf weights of a tokenized query.
+
+		:param list q: the tokens of the query
+		:return: the weights of the query's terms which occur in the tweets,
+			by column, and the length of the whole query vector
+		:rtype: tuple
+		"""
+		weights = {}
+		length = 0
+		for term, tf in Counter(q).items():
+			column = self.vocabulary.get(term)
+			log_idf = self.idf[column] if column is not None else self._log_idf(term)
+			weight = 1 + math.log10(tf) * log_idf
+			length += weight ** 2
+			if column is not None:
+				weights[column] = weight
+		return weights, math.sqrt(length)
+
+	def scores(self, q: Union[str, List[str]], cleaned: bool = False) -> np.ndarray:
+		"""
+		Computes the cosine similarity of a query to every tweet.
+
+		:param q: the query, a string or (if `cleaned`) a list of tokens
+		:param bool cleaned: whether `q` is cleaned
+		:return: the similarity of each tweet
+		:rtype: np.ndarray
+		"""
+		return self.scores_many([q], cleaned)[:, 0]
+
+	def scores_many(self, queries: List[Union[str, List[str]]], cleaned: bool = False) -> np.ndarray:
+		"""
+		Computes the cosine similarity of each of a batch of queries to every
+		tweet with one sparse matrix product.
+
+		:param list queries: the queries, strings or (if `cleaned`) lists of tokens
+		:param bool cleaned: whether the queries are cleaned
+		:return: a (tweets x queries) array of similarities
+		:rtype: np.ndarray
+		"""
+		rows, columns, data = [], [], []
+		lengths = np.zeros(len(queries))
+		for j, q in enumerate(queries):
+			weights, lengths[j] = self.query_vector(self._clean(q, cleaned))
+			rows.extend(weights)
+			columns.extend([j] * len(weights))
+			data.extend(weights.values())
+		query_matrix = csr_matrix((data, (rows, columns)), shape=(len(self.vocabulary), len(queries)))
+
+		dots = (self.matrix @ query_matrix).toarray()
+		denominators = np.outer(self.norms, lengths)
+		# like in the notebook, a tweet or query without weights scores 0
+		return np.divide(dots, denominators, out=np.zeros_like(dots), where=denominators != 0)
+
+	def top_x(self, x: int, q: Union[str, List[str]], cleaned: bool = False) -> List[Tuple[float, str]]:
+		"""
+		Returns the x tweets most similar to a query, in the same order as
+		the notebook's `top_x`: by similarity, then by text, both descending.
+
+		:param int x: top x number
+		:param q: the query, a string or (if `cleaned`) a list of tokens
+		:param bool cleaned: whether `q` is cleaned
+		:return: (similarity, tweet text) pairs
+		:rtype: list
+		"""
+		return self.top_x_many(x, [q], cleaned)[0]
+
+	def top_x_many(self, x: int, queries: List[Union[str, List[str]]],
+			cleaned: bool = False) -> List[List[Tuple[float, str]]]:
+		"""
+		Does the same as `top_x` for a batch of queries.
+
+		:param int x: top x number
+		:param list queries: the queries, strings or (if `cleaned`) lists of tokens
+		:param bool cleaned: whether the queries are cleaned
+		:return: the (similarity, tweet text) pairs of each query
+		:rtype: list
+		"""
+		scores = self.scores_many(queries, cleaned)
+		return [self._top(x, scores[:, j]) for j in range(len(queries))]
+
+	def _top(self, x: int, scores: np.ndarray) -> List[Tuple[float, str]]:
+		"""
+		Selects the x best tweets without sorting all of them. Every tweet
+		tied with the x-th best score is a candidate, so that ties are broken
+		by the text like when sorting all of them.
+		"""
+		x = min(x, len(scores))
+		if not x:
+			return []
+		threshold = np.partition(scores, len(scores) - x)[len(scores) - x]
+		candidates = np.flatnonzero(scores >= threshold)
+		return sorted(((float(scores[i]), self.texts[i]) for i in candidates), reverse=True)[:x]
+
+	def _term_postings(self, column: int) -> tuple:
+		"""
+		Returns the postings list of a term for `search`: the tweets containing
+		it (numbered by their norms), their normalized weights and the largest
+		weight of every block.
+		"""
+		try:
+			return self._postings[column]
+		except KeyError:
+			start, end = self._columns.indptr[column], self._columns.indptr[column + 1]
+			weights = self._columns.data[start:end]
+			block_max = np.maximum.reduceat(weights, np.arange(0, len(weights), self.BLOCK_SIZE))
+			postings = (self._columns.indices[start:end].tolist(), weights.tolist(), block_max.tolist())
+			self._postings[column] = postings
+			return postings
+
+	def search(self, q: Union[str, List[str]], k: int = 100,
+			cleaned: bool = False) -> List[Tuple[float, str]]:
+		"""
+		Returns the same k tweets with the same similarities as `top_x`, but
+		only scores the tweets which can still make it into the top k.
+
+		The query terms are sorted by the most they can add to a score. While
+		the k best tweets so far are kept in a heap, the terms whose bounds
+		add up to less than the k-th best score are non-essential: a tweet
+		which only contains those cannot make it into the top k. Candidates
+		are therefore only taken from the postings lists of the essential
+		terms (MaxScore). Since the bound of a term is usually reached by a
+		single short tweet, every block of a postings list has its own bound
+		too, and blocks which cannot reach the k-th best score are skipped.
+		The postings lists are sorted by the norms of the tweets, so that
+		these are mostly the later blocks.
+
+		:param q: the query, a string or (if `cleaned`) a list of tokens
+		:param int k: the number of tweets to return
+		:param bool cleaned: whether `q` is cleaned
+		:return: (similarity, tweet text) pairs
+		:rtype: list
+		"""
+		weights, length = self.query_vector(self._clean(q, cleaned))
+		self.postings_touched = 0
+		if k <= 0:
+			return []
+		heap = []
+		if length:
+			heap = self._max_score(weights, length, k)
+		result = sorted(((score, text) for score, text, _ in heap), reverse=True)
+
+		if len(result) < k:
+			# all other tweets score 0, and ties are broken by the text
+			if self._by_text is None:
+				self._by_text = sorted(range(len(self.texts)), key=self.texts.__getitem__, reverse=True)
+			found = set(tweet for _, _, tweet in heap)
+			rest = (self.texts[tweet] for tweet in self._by_text if tweet not in found)
+			result.extend((0.0, text) for text in islice(rest, k - len(result)))
+		return result
+
+	def _max_score(self, weights: Dict[int, float], length: float, k: int) -> list:
+		"""
+		Runs MaxScore (see `search`) over the postings lists of the query terms.
+
+		:return: the heap of the (score, text, tweet) triples of the k best
+			tweets containing a query term
+		"""
+		# (bound, weight, tweets, tweet weights, block bounds) of every term
+		terms = []
+		for column, weight in weights.items():
+			tweets, tweet_weights, block_max = self._term_postings(column)
+			weight /= length
+			terms.append((weight * float(self.max_weights[column]), weight, tweets, tweet_weights, block_max))
+		terms.sort(key=lambda term: term[0])
+		# cumulative[i] bounds the score from the terms up to i
+		cumulative = [0.0] + np.cumsum([term[0] for term in terms]).tolist()
+		positions = [0] * len(terms)
+		ends = [len(term[2]) for term in terms]
+		block_size = self.BLOCK_SIZE
+		order = self._order
+
+		heap = []
+		threshold = -math.inf
+		# the terms from here on are essential
+		essential = 0
+		touched = 0
+		while True:
+			candidate = None
+			for i in range(essential, len(terms)):
+				if positions[i] < ends[i]:
+					tweet = terms[i][2][positions[i]]
+					if candidate is None or tweet < candidate:
+						candidate = tweet
+			if candidate is None:
+				break
+
+			# the tweets before `limit` only occur in the current blocks of the
+			# essential terms whose postings lists are at the candidate and of
+			# the non-essential ones which are not past `limit`
+			bound = 0
+			limit = math.inf
+			for i in range(essential, len(terms)):
+				position = positions[i]
+				if position < ends[i]:
+					tweets = terms[i][2]
+					if tweets[position] == candidate:
+						block = position // block_size
+						bound += terms[i][1] * terms[i][4][block]
+						limit = min(limit, tweets[min((block + 1) * block_size, ends[i]) - 1] + 1)
+					else:
+						limit = min(limit, tweets[position])
+			for i in range(essential):
+				tweets = terms[i][2]
+				position = positions[i]
+				if position < ends[i] and tweets[position] < candidate:
+					position = positions[i] = bisect_left(tweets, candidate, position)
+					touched += 1
+				if position < ends[i] and tweets[position] < limit:
+					block = position // block_size
+					bound += terms[i][1] * terms[i][4][block]
+					limit = min(limit, tweets[min((block + 1) * block_size, ends[i]) - 1] + 1)
+			if bound < threshold - self.EPSILON:
+				for i in range(essential, len(terms)):
+					position = positions[i]
+					if position < ends[i] and terms[i][2][position] < limit:
+						positions[i] = bisect_left(terms[i][2], limit, position)
+						touched += 1
+				continue
+
+			score = 0
+			for i in range(essential, len(terms)):
+				position = positions[i]
+				if position < ends[i] and terms[i][2][position] == candidate:
+					score += terms[i][1] * terms[i][3][position]
+					positions[i] = position + 1
+					touched += 1
+
+			for i in range(essential - 1, -1, -1):
+				if score + cumulative[i + 1] < threshold - self.EPSILON:
+					break
+				# the non-essential postings lists are already at the candidate
+				position = positions[i]
+				if position < ends[i] and terms[i][2][position] == candidate:
+					score += terms[i][1] * terms[i][3][position]
+					touched += 1
+			else:
+				if score < threshold - self.EPSILON:
+					continue
+				tweet = order[candidate]
+				entry = (self._score(tweet, weights, length), self.texts[tweet], tweet)
+				if len(heap) < k:
+					heapq.heappush(heap, entry)
+				elif entry[:2] > heap[0][:2]:
+					heapq.heapreplace(heap, entry)
+				if len(heap) == k:
+					threshold = heap[0][0]
+					while essential < len(terms) and cumulative[essential + 1] < threshold - self.EPSILON:
+						essential += 1
+
+		self.postings_touched = touched
+		return heap
+
+	def _score(self, tweet: int, weights: Dict[int, float], length: float) -> float:
+		"""
+		Computes the similarity of a tweet to a query with the same floating
+		point operations as `scores`, so that ties are broken the same way.
+		"""
+		start, end = self.matrix.indptr[tweet], self.matrix.indptr[tweet + 1]
+		dot = 0.0
+		for column, weight in zip(self.matrix.indices[start:end].tolist(),
+				self.matrix.data[start:end].tolist()):
+			if column in weights:
+				dot += weight * weights[column]
+		return dot / (float(self.norms[tweet]) * length)
@@ -0,0 +1,173 @@
+"""
+A trained Naive Bayes classifier whose probabilities are computed once.
+
+`predict` in naive-bayes-classifier.ipynb sums up the frequencies of a class
+for every token of every document it classifies and takes the logarithm of
+every relative frequency. `NaiveBayes` instead freezes everything prediction
+needs when it is trained: the classes with their log priors, the vocabulary
+with a column for each term, the token total of each class and a table of
+the log likelihood of each term in each class. Classifying a document is
+then a lookup per token, and `predict_many` classifies a batch of documents
+with one sparse matrix product of their term counts and the table.
+"""
+from collections import Counter
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class NaiveBayes(object):
+    """
+    A multinomial Naive Bayes classifier on preprocessed documents (lists of
+    terms). Probabilities are in log10, like in the notebook.
+
+    Attributes:
+        classes: the classes, in the order of the rows of the tables
+        log_priors: the log probability of each class
+        vocabulary: a dictionary mapping each term to its column
+        totals: the number of tokens of each class in the training data
+        log_likelihoods: a (classes x terms) array of the log probability of
+            each term in each class
+        smoothing: the pseudo count added to each term of each class
+    """
+
+    def __init__(self, class_counts, term_counts, smoothing=1.0):
+        """
+        Freezes the parameters of a model.
+
+        Args:
+            class_counts: a dictionary mapping each class to its number of
+                documents (or its prior)
+            term_counts: a dictionary mapping each class to a `Counter` of
+                its terms
+            smoothing: the pseudo count added to each term of each class
+                (Laplace smoothing with 1). With 0 the probabilities are
+                the relative frequencies, and a class ignores the terms it
+                has not seen, like the notebook's `predict` does.
+        """
+        if smoothing < 0:
+            raise ValueError('The smoothing must not be negative.')
+        self.classes = list(class_counts)
+        self.smoothing = smoothing
+        priors = np.array([class_counts[class_] for class_ in self.classes], dtype=np.float64)
+        self.log_priors = np.log10(priors / priors.sum())
+
+        self.vocabulary = {}
+        for class_ in self.classes:
+            for term in term_counts[class_]:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+        counts = np.zeros((len(self.classes), len(self.vocabulary)))
+        for row, class_ in enumerate(self.classes):
+            for term, count in term_counts[class_].items():
+                counts[row, self.vocabulary[term]] = count
+        self.totals = counts.sum(axis=1)
+
+        if smoothing:
+            denominators = self.totals + smoothing * len(self.vocabulary)
+            self.log_likelihoods = np.log10((counts + smoothing) / denominators[:, None])
+        else:
+            self.log_likelihoods = np.zeros_like(counts)
+            seen = counts > 0
+            frequencies = counts / np.maximum(self.totals, 1)[:, None]
+            self.log_likelihoods[seen] = np.log10(frequencies[seen])
+
+    @classmethod
+    def fit(cls, docs, labels, smoothing=1.0):
+        """
+        Trains a model.
+
+        Args:
+            docs: an iterable of preprocessed documents (lists of terms)
+            labels: the class of each document
+            smoothing: see `__init__`
+
+        Returns:
+            the trained `NaiveBayes`
+        """
+        class_counts = Counter()
+        term_counts = {}
+        for doc, label in zip(docs, labels):
+            class_counts[label] += 1
+            term_counts.setdefault(label, Counter()).update(doc)
+        return cls(class_counts, term_counts, smoothing)
+
+    @classmethod
+    def from_parameters(cls, parameters, smoothing=1.0):
+        """
+        Freezes the parameters estimated by the notebook's `estimate_parameters`.
+
+        Args:
+            parameters: a dictionary mapping each class to a tuple of its
+                prior and a `Counter` of its terms
+            smoothing: see `__init__`
+
+        Returns:
+            the `NaiveBayes` with these parameters
+        """
+        return cls({class_: p_y for class_, (p_y, _) in parameters.items()},
+                   {class_: count for class_, (_, count) in parameters.items()},
+                   smoothing)
+
+    def log_probabilities(self, doc):
+        """
+        Computes the log probability of a document in each class (up to the
+        probability of the document itself). Terms which are not in the
+        vocabulary are ignored.
+
+        Args:
+            doc: a preprocessed document (a list of terms)
+
+        Returns:
+            an array of the log probability in each class
+        """
+        vocabulary = self.vocabulary
+        columns = [vocabulary[term] for term in doc if term in vocabulary]
+        return self.log_priors + self.log_likelihoods[:, columns].sum(axis=1)
+
+    def predict(self, doc):
+        """
+        Predicts the most probable class for a preprocessed document.
+
+        Args:
+            doc: a preprocessed document (a list of terms)
+
+        Returns:
+            the most probable class, the first one of `classes` if there is a tie
+        """
+        return self.classes[int(np.argmax(self.log_probabilities(doc)))]
+
+    def log_probabilities_many(self, docs):
+        """
+        Computes the log probability of each of a batch of documents in each
+        class with one sparse matrix product.
+
+        Args:
+            docs: an iterable of preprocessed documents (lists of terms)
+
+        Returns:
+            a (documents x classes) array of log probabilities
+        """
+        vocabulary = self.vocabulary
+        indptr = [0]
+        indices = []
+        for doc in docs:
+            indices.extend(vocabulary[term] for term in doc if term in vocabulary)
+            indptr.append(len(indices))
+        # repeated terms are duplicate entries, which are added up
+        counts = csr_matrix((np.ones(len(indices)), np.array(indices, dtype=np.int64),
+                             np.array(indptr, dtype=np.int64)),
+                            shape=(len(indptr) - 1, len(vocabulary)))
+        counts.sum_duplicates()
+        return counts @ self.log_likelihoods.T + self.log_priors
+
+    def predict_many(self, docs):
+        """
+        Predicts the most probable class for each of a batch of documents.
+
+        Args:
+            docs: an iterable of preprocessed documents (lists of terms)
+
+        Returns:
+            a list of the most probable class of each document
+        """
+        return [self.classes[i] for i in np.argmax(self.log_probabilities_many(docs), axis=1)]
@@ -0,0 +1,127 @@
+"""
+Batched preprocessing of German reviews with spaCy and IWNLP.
+
+`preprocess` in naive-bayes-classifier.ipynb runs the whole spaCy pipeline
+on one review at a time, loads the NLTK stop word list for every token and
+asks IWNLP for the lemma of every token. `Preprocessor` instead streams the
+reviews through `nlp.pipe` in batches (optionally in several processes),
+with the components lemmatization does not need (the parser and the named
+entity recognizer) disabled, checks the stop words in a set, and remembers
+the lemma of each (token, part of speech) pair.
+"""
+import string
+from collections import OrderedDict
+
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+# the pipeline components lemmatization does not need; the tagger is needed
+# for the part of speech
+UNUSED_COMPONENTS = ('parser', 'ner')
+
+
+class Preprocessor(object):
+    """
+    Cleans documents by
+    - ensuring that they are indeed strings
+    - converting them to lowercase
+    - removing punctuation
+    - removing stop words
+    and tokenizes and lemmatizes them.
+    """
+
+    def __init__(self, nlp, lemmatizer, stop_words=(), batch_size=1000, n_process=1,
+                 cache_size=100000):
+        """
+        Args:
+            nlp: the spaCy pipeline used for tokenization and tagging
+            lemmatizer: the `IWNLPWrapper`
+            stop_words: the (lowercase) stop words to remove
+            batch_size: the number of documents `nlp.pipe` processes at once
+            n_process: the number of processes `nlp.pipe` uses
+            cache_size: the maximum number of (token, part of speech) pairs
+                whose lemma is remembered
+        """
+        self.nlp = nlp
+        self.lemmatizer = lemmatizer
+        self.stop_words = frozenset(stop_words)
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.disable = [name for name in UNUSED_COMPONENTS if name in nlp.pipe_names]
+        self.cache_size = cache_size
+        # least recently used first
+        self._cache = OrderedDict()
+
+    @staticmethod
+    def clean(doc):
+        """
+        Converts a document to a lowercase string without punctuation.
+
+        Args:
+            doc: a given document, a string (or e.g. a number Pandas read)
+
+        Returns:
+            the cleaned string
+        """
+        return str(doc).lower().translate(PUNCTUATION_TABLE).strip()
+
+    def lemmatize(self, text, pos):
+        """
+        Looks up the lemma of a token with the lemmatizer. When the lemmatizer
+        cannot confidently predict a lemma, it returns None, and then the
+        token itself is returned. When it finds more than one possible lemma,
+        the first one is returned.
+
+        Args:
+            text: the text of the token
+            pos: the universal part of speech tag of the token
+
+        Returns:
+            the lemma
+        """
+        key = (text, pos)
+        try:
+            lemma = self._cache[key]
+        except KeyError:
+            lemmas = self.lemmatizer.lemmatize(text, pos_universal_google=pos)
+            lemma = self._cache[key] = lemmas[0] if lemmas else text
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return lemma
+
+    def _terms(self, parsed):
+        stop_words = self.stop_words
+        return [self.lemmatize(token.text, token.pos_) for token in parsed
+                if token.text not in stop_words]
+
+    def preprocess(self, doc):
+        """
+        Cleans, tokenizes and lemmatizes a document.
+
+        Args:
+            doc: a given string
+
+        Returns:
+            a list containing the lemmas of the cleaned terms of the document
+        """
+        return self._terms(self.nlp(self.clean(doc), disable=self.disable))
+
+    def preprocess_many(self, docs):
+        """
+        Cleans, tokenizes and lemmatizes a batch of documents, which are
+        streamed through the pipeline in batches of `batch_size`.
+
+        Args:
+            docs: an iterable of strings
+
+        Returns:
+            a list with the list of lemmas of every document
+        """
+        cleaned = (self.clean(doc) for doc in docs)
+        pipe = self.nlp.pipe(cleaned, batch_size=self.batch_size, n_process=self.n_process,
+                             disable=self.disable)
+        return [self._terms(parsed) for parsed in pipe]
+
+    def clear(self):
+        """Forgets the remembered lemmas."""
+        self._cache.clear()